@@ -0,0 +1,122 @@
+import base64
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Literal
+
+import httpx
+from playwright.async_api import Browser, BrowserContext, Route
+from pydantic import BaseModel
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+
+type FixtureMode = Literal["http", "browser"]
+"""
+Which implementation of each collection to exercise:
+- `http`: the plain HTTP fetchers (each collection's primary)
+- `browser`: the browser fallbacks, by failing every plain HTTP request (without triggering rate limit backoff)
+"""
+
+
+class RecordedResponse(BaseModel):
+    url: str
+    status: int
+    content_type: str | None
+    location: str | None = None
+    """Where a redirect points"""
+    body_base64: str
+    is_page: bool
+    """A page of search results (as opposed to e.g. a script), for per-page timings"""
+
+    @property
+    def body(self) -> bytes:
+        return base64.b64decode(self.body_base64)
+
+    @property
+    def headers(self) -> dict[str, str]:
+        headers = {}
+        if self.content_type is not None:
+            headers["content-type"] = self.content_type
+        if self.location is not None:
+            headers["location"] = self.location
+        return headers
+
+
+class CollectionFixture(BaseModel):
+    """Everything a collection's searches for `queries` loaded, recorded so they can be replayed offline"""
+
+    collection_id: str
+    queries: list[str]
+    recorded_at: str
+    responses: list[RecordedResponse]
+
+
+class FixtureStore:
+    """Serves recorded responses by URL, timing each request for a page of results"""
+
+    def __init__(self, fixtures: list[CollectionFixture], mode: FixtureMode):
+        self.fixtures = fixtures
+        self.mode = mode
+        self._responses: dict[str, tuple[str, RecordedResponse]] = {}
+        for fixture in fixtures:
+            for response in fixture.responses:
+                self._responses[response.url] = (fixture.collection_id, response)
+        self.page_requested_at: defaultdict[str, list[float]] = defaultdict(list)
+        """Monotonic times at which each collection's pages of results were requested"""
+        self.n_misses = 0
+
+    @classmethod
+    def load(cls, fixtures_dir: Path, mode: FixtureMode) -> "FixtureStore":
+        fixtures = [
+            CollectionFixture.model_validate_json(path.read_bytes()) for path in sorted(fixtures_dir.glob("*.json"))
+        ]
+        return cls(fixtures, mode)
+
+    def _lookup(self, url: str) -> RecordedResponse | None:
+        found = self._responses.get(url)
+        if found is None:
+            self.n_misses += 1
+            return None
+        collection_id, response = found
+        if response.is_page:
+            self.page_requested_at[collection_id].append(time.monotonic())
+        return response
+
+    def _handle_httpx(self, request: httpx.Request) -> httpx.Response:
+        if self.mode == "browser":
+            raise httpx.ConnectError("Plain HTTP is disabled in browser mode", request=request)
+        response = self._lookup(str(request.url))
+        if response is None:
+            return httpx.Response(404, request=request)
+        return httpx.Response(response.status, headers=response.headers, content=response.body, request=request)
+
+    def httpx_transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self._handle_httpx)
+
+    async def fulfill_route(self, route: Route):
+        response = self._lookup(route.request.url)
+        if response is None:
+            await route.abort("internetdisconnected")  # nothing leaves the machine during a benchmark
+            return
+        await route.fulfill(status=response.status, headers=response.headers, body=response.body)
+
+    def wrap_browser(self, browser: Browser) -> Browser:
+        """A stand-in for `browser` whose new contexts are served from the fixtures"""
+        return _FixtureBrowser(browser, self)  # type: ignore[return-value]
+
+
+class _FixtureBrowser:
+    """Stands in for `browser`, routing each new context to the fixtures"""
+
+    def __init__(self, browser: Browser, store: FixtureStore):
+        self._browser = browser
+        self._store = store
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._browser, name)
+
+    async def new_context(self, **kwargs: Any) -> BrowserContext:
+        context = await self._browser.new_context(**kwargs)
+        # registered first, so it runs after any routes the pool adds (e.g. resource blocking) fall back to it
+        await context.route("**/*", self._store.fulfill_route)
+        return context
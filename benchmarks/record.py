@@ -0,0 +1,182 @@
+"""
+Record fixtures for the benchmarks, by searching each collection live (with both its HTTP and browser implementations).
+
+Usage: `python -m benchmarks.record --query "civil rights" --query "immigration"`
+"""
+
+import argparse
+import asyncio
+import base64
+import functools
+import logging
+from collections.abc import Callable
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any, cast
+
+import httpx
+from playwright.async_api import Browser, BrowserContext, Playwright, Response, async_playwright
+
+from benchmarks.fixtures import FIXTURES_DIR, CollectionFixture, RecordedResponse
+from historical_sources_search.browser_pool import BrowserContextPool
+from historical_sources_search.browser_supervisor import BrowserSupervisor
+from historical_sources_search.collections.base import CollectionBase
+from historical_sources_search.collections.constitution_annotated import (
+    CollectionConstitutionAnnotatedBrowser,
+    CollectionConstitutionAnnotatedHttp,
+)
+from historical_sources_search.collections.facing_history import (
+    CollectionFacingHistoryBrowser,
+    CollectionFacingHistoryHttp,
+)
+from historical_sources_search.collections.library_of_congress import (
+    CollectionLibraryOfCongressBrowser,
+    CollectionLibraryOfCongressHttp,
+)
+from historical_sources_search.env import Env
+from historical_sources_search.rate_limit import HostRateLimiter
+from historical_sources_search.scheduler import PageScheduler
+
+LOGGER = logging.getLogger(__name__)
+
+_DEFAULT_QUERIES = ["civil rights", "immigration", "declaration of independence"]
+_IMPLEMENTATIONS: list[
+    tuple[
+        Callable[[httpx.AsyncClient], CollectionBase], Callable[[BrowserContextPool, HostRateLimiter], CollectionBase]
+    ]
+] = [
+    (CollectionFacingHistoryHttp, CollectionFacingHistoryBrowser),
+    (CollectionLibraryOfCongressHttp, CollectionLibraryOfCongressBrowser),
+    (CollectionConstitutionAnnotatedHttp, CollectionConstitutionAnnotatedBrowser),
+]
+
+
+def _is_redirect(status: int) -> bool:
+    return 300 <= status < 400
+
+
+class _Recorder:
+    """Collects every response to be replayed, by URL (the latest one wins)"""
+
+    def __init__(self):
+        self.responses: dict[str, RecordedResponse] = {}
+
+    def add(self, url: str, status: int, headers: dict[str, str], body: bytes, *, is_page: bool):
+        self.responses[url] = RecordedResponse(
+            url=url,
+            status=status,
+            content_type=headers.get("content-type"),
+            location=(headers.get("location") if _is_redirect(status) else None),
+            body_base64=base64.b64encode(body).decode(),
+            is_page=is_page,
+        )
+
+    async def on_httpx_response(self, response: httpx.Response):
+        await response.aread()
+        self.add(str(response.url), response.status_code, dict(response.headers), response.content, is_page=True)
+
+    async def on_browser_response(self, response: Response):
+        try:
+            body = b"" if _is_redirect(response.status) else await response.body()
+        except Exception:
+            LOGGER.debug(f"No body to record for {response.url}", exc_info=True)
+            return
+        headers = await response.all_headers()
+        self.add(response.url, response.status, headers, body, is_page=(response.request.resource_type == "document"))
+
+
+class _RecordingBrowser:
+    """Stands in for `browser`, recording what each new context loads"""
+
+    def __init__(self, browser: Browser, recorder: _Recorder):
+        self._browser = browser
+        self._recorder = recorder
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._browser, name)
+
+    async def new_context(self, **kwargs: Any) -> BrowserContext:
+        context = await self._browser.new_context(**kwargs)
+        context.on("response", self._recorder.on_browser_response)
+        return context
+
+
+async def _launch_browser(pw: Playwright, recorder: _Recorder) -> Browser:
+    browser = await pw.chromium.launch(channel="chromium")
+    return cast(Browser, _RecordingBrowser(browser, recorder))
+
+
+async def _record_collection(http: CollectionBase, browser: CollectionBase, queries: list[str]):
+    for query in queries:
+        for implementation in (http, browser):
+            n_results = 0
+            try:
+                async for _ in implementation.search(query):
+                    n_results += 1
+            except Exception:
+                LOGGER.exception(f"Recording {type(implementation).__name__} failed for query {query!r}")
+            else:
+                LOGGER.info(f"Recorded {type(implementation).__name__} for query {query!r}: {n_results} result(s)")
+
+
+async def record(queries: list[str]) -> list[CollectionFixture]:
+    env = Env.get()
+    scheduler = PageScheduler(max_pages=3, max_pages_per_collection=1, max_waiting=10, wait_timeout_seconds=60)
+    rate_limiter = HostRateLimiter(
+        requests_per_second=env.rate_limit_requests_per_second,
+        burst=env.rate_limit_burst,
+        requests_per_second_by_host=env.rate_limit_requests_per_second_by_host,
+        max_backoff_seconds=env.rate_limit_max_backoff_seconds,
+    )
+    recorded_at = datetime.now(UTC).isoformat()
+    fixtures = []
+
+    async with async_playwright() as pw:
+        for http_class, browser_class in _IMPLEMENTATIONS:
+            recorder = _Recorder()
+            hooks = rate_limiter.httpx_event_hooks()
+            hooks["response"].append(recorder.on_httpx_response)
+            async with (
+                httpx.AsyncClient(follow_redirects=True, event_hooks=hooks) as httpx_client,
+                BrowserSupervisor(
+                    functools.partial(_launch_browser, cast(Playwright, pw), recorder),
+                    max_contexts=None,
+                    max_memory_bytes=None,
+                    drain_timeout_seconds=0,
+                ) as browser_supervisor,
+                BrowserContextPool(
+                    browser_supervisor,
+                    scheduler,
+                    size_per_key=0,
+                    max_uses=1,
+                    block_resources=env.block_browser_resources,
+                ) as browser_pool,
+            ):
+                http = http_class(httpx_client)
+                await _record_collection(http, browser_class(browser_pool, rate_limiter), queries)
+
+            fixture = CollectionFixture(
+                collection_id=http.collection_info.id,
+                queries=queries,
+                recorded_at=recorded_at,
+                responses=list(recorder.responses.values()),
+            )
+            LOGGER.info(f"Recorded {len(fixture.responses)} response(s) for {fixture.collection_id!r}")
+            fixtures.append(fixture)
+    return fixtures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--query", action="append", dest="queries", help="may be given more than once")
+    parser.add_argument("--fixtures-dir", type=Path, default=FIXTURES_DIR)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    fixtures = asyncio.run(record(args.queries or _DEFAULT_QUERIES))
+    args.fixtures_dir.mkdir(parents=True, exist_ok=True)
+    for fixture in fixtures:
+        (args.fixtures_dir / f"{fixture.collection_id}.json").write_text(fixture.model_dump_json(indent=2))
+
+
+if __name__ == "__main__":
+    main()
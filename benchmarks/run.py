@@ -0,0 +1,336 @@
+"""
+Benchmark `search_all` against recorded fixtures (see `benchmarks.record`), served locally, at varying concurrency.
+Each run is saved as JSON under `benchmarks/results/`, and can be compared with an earlier one.
+
+Usage: `python -m benchmarks.run --mode browser --concurrency 1 4 8 --compare benchmarks/results/<earlier>.json`
+"""
+
+import argparse
+import asyncio
+import itertools
+import logging
+import statistics
+import subprocess
+import time
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import cast
+
+import httpx
+from playwright.async_api import Browser, Playwright, async_playwright
+from pydantic import BaseModel
+
+from benchmarks.fixtures import FIXTURES_DIR, FixtureMode, FixtureStore
+from historical_sources_search.browser_pool import BrowserContextPool
+from historical_sources_search.browser_supervisor import BrowserSupervisor, browser_memory_bytes
+from historical_sources_search.cache import SearchCache
+from historical_sources_search.coalesce import SearchCoalescer
+from historical_sources_search.collections.registry import CollectionRegistry
+from historical_sources_search.env import Env
+from historical_sources_search.index import SearchIndex
+from historical_sources_search.rate_limit import HostRateLimiter
+from historical_sources_search.scheduler import PageScheduler
+from historical_sources_search.search import search_all_events, warm_up_collections
+from historical_sources_search.search_event import SearchEventCollectionError, SearchEventResult
+
+LOGGER = logging.getLogger(__name__)
+
+RESULTS_DIR = Path(__file__).parent / "results"
+_MEMORY_SAMPLE_INTERVAL_SECONDS = 0.1
+
+
+class Percentiles(BaseModel):
+    p50: float
+    p95: float
+    max: float
+
+    @classmethod
+    def of(cls, values: list[float]) -> "Percentiles | None":
+        if not values:
+            return None
+        if len(values) == 1:
+            return cls(p50=values[0], p95=values[0], max=values[0])
+        quantiles = statistics.quantiles(values, n=20, method="inclusive")
+        return cls(p50=statistics.median(values), p95=quantiles[18], max=max(values))
+
+
+class SearchTiming(BaseModel):
+    time_to_first_result_seconds: float | None
+    total_seconds: float
+    n_results: int
+    n_collections_failed: int
+
+
+class LevelResult(BaseModel):
+    """The results of running `concurrency` searches at a time, `n_rounds` times"""
+
+    concurrency: int
+    n_rounds: int
+    n_searches: int
+    n_results: int
+    n_collections_failed: int
+    time_to_first_result_seconds: Percentiles | None
+    total_seconds: Percentiles | None
+    results_per_second: float
+    """Over the whole level, i.e. throughput"""
+    browser_peak_memory_mib: float | None
+    """Peak resident memory of all browser processes (Linux only)"""
+    page_seconds_by_collection: dict[str, Percentiles | None]
+    """Time from requesting one page of results to requesting the next (only measured without concurrency)"""
+
+
+class BenchmarkRun(BaseModel):
+    started_at: str
+    git_commit: str | None
+    mode: FixtureMode
+    queries: list[str]
+    levels: list[LevelResult]
+    n_fixture_misses: int
+    """Requests that had no recorded response (if many, the fixtures may need to be recorded again)"""
+
+
+def _git_commit() -> str | None:
+    try:
+        result = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True)  # noqa: S607
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+async def _sample_peak_memory(peak: list[int]):
+    while True:
+        memory = await asyncio.to_thread(browser_memory_bytes)
+        if memory is not None:
+            peak[0] = max(peak[0], memory)
+        await asyncio.sleep(_MEMORY_SAMPLE_INTERVAL_SECONDS)
+
+
+class _Benchmark:
+    def __init__(
+        self,
+        store: FixtureStore,
+        registry: CollectionRegistry,
+        index: SearchIndex,
+    ):
+        self.store = store
+        self.registry = registry
+        self.index = index
+
+    async def search(self, query: str) -> SearchTiming:
+        # nothing cached, and nothing shared with concurrent searches, so every search really scrapes
+        cache = SearchCache(
+            max_entries=0, ttl_seconds=0, ttl_seconds_by_collection={}, stale_seconds=0, sqlite_path=None
+        )
+        coalescer = SearchCoalescer(read_ahead=Env.get().coalesce_read_ahead)
+        started_at = time.monotonic()
+        time_to_first_result = None
+        n_results = 0
+        n_collections_failed = 0
+        events = search_all_events(query, self.registry, cache, coalescer, self.index)
+        async for event in events:
+            if isinstance(event, SearchEventResult):
+                if time_to_first_result is None:
+                    time_to_first_result = time.monotonic() - started_at
+                n_results += 1
+            elif isinstance(event, SearchEventCollectionError):
+                n_collections_failed += 1
+        return SearchTiming(
+            time_to_first_result_seconds=time_to_first_result,
+            total_seconds=(time.monotonic() - started_at),
+            n_results=n_results,
+            n_collections_failed=n_collections_failed,
+        )
+
+    def _take_page_seconds(self) -> dict[str, list[float]]:
+        page_seconds = {
+            collection_id: [later - earlier for earlier, later in itertools.pairwise(times)]
+            for collection_id, times in self.store.page_requested_at.items()
+        }
+        self.store.page_requested_at.clear()
+        return page_seconds
+
+    async def run_level(self, queries: list[str], concurrency: int, n_rounds: int) -> LevelResult:
+        timings: list[SearchTiming] = []
+        page_seconds: dict[str, list[float]] = {}
+        peak_memory = [0]
+        task_sample_memory = asyncio.create_task(_sample_peak_memory(peak_memory))
+        started_at = time.monotonic()
+        try:
+            for i_round in range(n_rounds):
+                self._take_page_seconds()
+                round_queries = [queries[(i_round * concurrency + i) % len(queries)] for i in range(concurrency)]
+                timings.extend(await asyncio.gather(*(self.search(query) for query in round_queries)))
+                if concurrency == 1:  # otherwise, pages of concurrent searches can't be told apart
+                    for collection_id, seconds in self._take_page_seconds().items():
+                        page_seconds.setdefault(collection_id, []).extend(seconds)
+        finally:
+            task_sample_memory.cancel()
+        elapsed = time.monotonic() - started_at
+
+        n_results = sum(timing.n_results for timing in timings)
+        return LevelResult(
+            concurrency=concurrency,
+            n_rounds=n_rounds,
+            n_searches=len(timings),
+            n_results=n_results,
+            n_collections_failed=sum(timing.n_collections_failed for timing in timings),
+            time_to_first_result_seconds=Percentiles.of(
+                [t.time_to_first_result_seconds for t in timings if t.time_to_first_result_seconds is not None]
+            ),
+            total_seconds=Percentiles.of([timing.total_seconds for timing in timings]),
+            results_per_second=(n_results / elapsed),
+            browser_peak_memory_mib=((peak_memory[0] / 2**20) if peak_memory[0] else None),
+            page_seconds_by_collection={
+                collection_id: Percentiles.of(seconds) for collection_id, seconds in page_seconds.items()
+            },
+        )
+
+
+async def _launch_browser(pw: Playwright, store: FixtureStore) -> Browser:
+    return store.wrap_browser(await pw.chromium.launch(channel="chromium"))
+
+
+async def run_benchmark(
+    store: FixtureStore, queries: list[str], concurrency_levels: list[int], n_rounds: int
+) -> BenchmarkRun:
+    env = Env.get()
+    started_at = datetime.now(UTC).isoformat()
+    scheduler = PageScheduler(
+        max_pages=env.max_browser_pages,
+        max_pages_per_collection=env.max_browser_pages_per_collection,
+        max_waiting=env.max_waiting_for_browser_page,
+        wait_timeout_seconds=env.browser_page_wait_timeout_seconds,
+    )
+    # the fixtures are served locally, so there's nothing to protect
+    rate_limiter = HostRateLimiter(
+        requests_per_second=1e6,
+        burst=1_000_000,
+        requests_per_second_by_host={},
+        max_backoff_seconds=0,
+    )
+    async with (
+        httpx.AsyncClient(
+            transport=store.httpx_transport(),
+            follow_redirects=True,
+            event_hooks=rate_limiter.httpx_event_hooks(),
+        ) as httpx_client,
+        async_playwright() as pw,
+        BrowserSupervisor(
+            lambda: _launch_browser(cast(Playwright, pw), store),
+            max_contexts=None,
+            max_memory_bytes=None,
+            drain_timeout_seconds=0,
+        ) as browser_supervisor,
+        BrowserContextPool(
+            browser_supervisor,
+            scheduler,
+            size_per_key=env.browser_contexts_per_collection,
+            max_uses=env.browser_context_max_uses,
+            block_resources=env.block_browser_resources,
+        ) as browser_pool,
+        SearchIndex(sqlite_path=None, min_results=1, reharvest_seconds=0, max_results=1) as index,
+    ):
+        registry = CollectionRegistry(httpx_client, browser_pool, rate_limiter)
+        benchmark = _Benchmark(store, registry, index)
+        if store.mode == "browser":
+            await warm_up_collections(registry)
+        await benchmark.search(queries[0])  # not measured; e.g. to load the collections' code paths
+
+        levels = []
+        for concurrency in concurrency_levels:
+            LOGGER.info(f"Running {n_rounds} round(s) of {concurrency} concurrent search(es)")
+            levels.append(await benchmark.run_level(queries, concurrency, n_rounds))
+
+    return BenchmarkRun(
+        started_at=started_at,
+        git_commit=_git_commit(),
+        mode=store.mode,
+        queries=queries,
+        levels=levels,
+        n_fixture_misses=store.n_misses,
+    )
+
+
+def _format_seconds(percentiles: Percentiles | None) -> str:
+    return "-" if percentiles is None else f"{percentiles.p50:.3f}s (p95 {percentiles.p95:.3f}s)"
+
+
+def _format_change(current: float | None, baseline: float | None) -> str:
+    if current is None or baseline is None or baseline == 0:
+        return ""
+    return f" [{(current - baseline) / baseline:+.0%}]"
+
+
+def print_report(run: BenchmarkRun, baseline: BenchmarkRun | None):
+    """Print each level's metrics, with the relative change from the same level of `baseline` (if given)"""
+    baseline_levels = {} if baseline is None else {level.concurrency: level for level in baseline.levels}
+    print(f"Benchmark of {run.git_commit or 'unknown commit'} ({run.mode} mode), started {run.started_at}")
+    if baseline is not None:
+        print(f"Compared with {baseline.git_commit or 'unknown commit'}, started {baseline.started_at}")
+    for level in run.levels:
+        base = baseline_levels.get(level.concurrency)
+
+        def _p50(percentiles: Percentiles | None) -> float | None:
+            return None if percentiles is None else percentiles.p50
+
+        lines = [
+            (
+                f"Concurrency {level.concurrency} ({level.n_searches} searches, {level.n_results} results, "
+                f"{level.n_collections_failed} collection failure(s)):"
+            ),
+            f"  time to first result: {_format_seconds(level.time_to_first_result_seconds)}"
+            + _format_change(
+                _p50(level.time_to_first_result_seconds),
+                None if base is None else _p50(base.time_to_first_result_seconds),
+            ),
+            f"  total time:           {_format_seconds(level.total_seconds)}"
+            + _format_change(_p50(level.total_seconds), None if base is None else _p50(base.total_seconds)),
+            f"  results/s:            {level.results_per_second:.1f}"
+            + _format_change(level.results_per_second, None if base is None else base.results_per_second),
+            "  browser peak memory:  "
+            + ("-" if level.browser_peak_memory_mib is None else f"{level.browser_peak_memory_mib:.0f} MiB")
+            + _format_change(level.browser_peak_memory_mib, None if base is None else base.browser_peak_memory_mib),
+        ]
+        for collection_id, page_seconds in level.page_seconds_by_collection.items():
+            base_page_seconds = None if base is None else base.page_seconds_by_collection.get(collection_id)
+            lines.append(
+                f"  per page, {collection_id}: {_format_seconds(page_seconds)}"
+                + _format_change(_p50(page_seconds), _p50(base_page_seconds))
+            )
+        print("\n".join(lines))
+    if run.n_fixture_misses:
+        print(f"{run.n_fixture_misses} request(s) had no recorded response")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["http", "browser"], default="http")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--rounds", type=int, default=3, help="rounds of concurrent searches per concurrency level")
+    parser.add_argument("--query", action="append", dest="queries", help="default: all queries recorded")
+    parser.add_argument("--fixtures-dir", type=Path, default=FIXTURES_DIR)
+    parser.add_argument("--results-dir", type=Path, default=RESULTS_DIR)
+    parser.add_argument("--compare", type=Path, help="an earlier run's results, to compare with")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    LOGGER.setLevel(logging.INFO)
+
+    store = FixtureStore.load(args.fixtures_dir, args.mode)
+    if not store.fixtures:
+        parser.error(f"No fixtures in {args.fixtures_dir}; record some with `python -m benchmarks.record`")
+    # only queries recorded for every collection
+    recorded_queries = set.intersection(*(set(fixture.queries) for fixture in store.fixtures))
+    queries = args.queries or sorted(recorded_queries)
+    baseline = None if args.compare is None else BenchmarkRun.model_validate_json(args.compare.read_bytes())
+
+    run = asyncio.run(run_benchmark(store, queries, args.concurrency, args.rounds))
+
+    args.results_dir.mkdir(parents=True, exist_ok=True)
+    results_path = args.results_dir / f"{run.started_at.replace(':', '')}-{run.mode}.json"
+    results_path.write_text(run.model_dump_json(indent=2))
+    print_report(run, baseline)
+    print(f"Saved results to {results_path}")
+
+
+if __name__ == "__main__":
+    main()
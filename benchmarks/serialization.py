@@ -0,0 +1,129 @@
+"""
+Benchmark serializing (and compressing) a response of `post_search`: its size, and the CPU time to produce it,
+the way FastAPI would by default versus straight to JSON, with and without `compact`.
+
+Usage: `python -m benchmarks.serialization --results 200 500 1000`
+"""
+
+import argparse
+import functools
+import json
+import random
+import time
+from collections.abc import Callable
+
+from historical_sources_search.api import SearchResponse, SearchResponseCompact
+from historical_sources_search.compression import ENCODINGS, compress
+from historical_sources_search.search_event import CollectionSearchSummary
+from historical_sources_search.search_result import CollectionInfo, SearchResult, SearchResultCompact
+
+_COLLECTIONS = [
+    CollectionInfo(id="library_of_congress", name="Library of Congress", url="https://www.loc.gov/"),
+    CollectionInfo(id="facing_history", name="Facing History & Ourselves", url="https://www.facinghistory.org/"),
+    CollectionInfo(
+        id="constitution_annotated",
+        name="Constitution Annotated",
+        url="https://constitution.congress.gov/",
+    ),
+]
+_WORDS = (  # noqa: SIM905 (easier to read as one string)
+    "the of and to in a letter from president congress act rights civil war union state court amendment speech "
+    "photograph map newspaper report declaration independence immigration labor women suffrage vote treaty "
+    "constitution article section clause justice federal government people liberty freedom history"
+).split(" ")
+
+
+def _make_response(n_results: int, detail_words: int, rng: random.Random) -> SearchResponse:
+    results = []
+    for i in range(n_results):
+        collection = _COLLECTIONS[i % len(_COLLECTIONS)]
+        title = " ".join(rng.choices(_WORDS, k=8)).capitalize()
+        results.append(
+            SearchResult(
+                url=f"{collection.url}item/{rng.getrandbits(48):x}/",
+                title=title,
+                detail=" ".join(rng.choices(_WORDS, k=detail_words)),
+                image_src=(f"/thumb?url=https%3A%2F%2Ftile.loc.gov%2Fimage%2F{i}.jpg" if i % 2 == 0 else None),
+                provided_by_collection=collection,
+            )
+        )
+    collections = [
+        CollectionSearchSummary(collection=collection, status="complete", n_results=n_results // len(_COLLECTIONS))
+        for collection in _COLLECTIONS
+    ]
+    return SearchResponse(query="civil rights", results=results, collections=collections)
+
+
+def _serialize_fastapi_default(response: SearchResponse) -> bytes:
+    """Roughly what FastAPI does with a returned model: dump it, validate it again, dump that, then `json.dumps`"""
+    validated = SearchResponse.model_validate(response.model_dump())
+    content = validated.model_dump(mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode()
+
+
+def _serialize_direct(response: SearchResponse) -> bytes:
+    return response.model_dump_json().encode()
+
+
+def _serialize_compact(response: SearchResponse) -> bytes:
+    collections_info: dict[str, CollectionInfo] = {}
+    for result in response.results:
+        collections_info.setdefault(result.provided_by_collection.id, result.provided_by_collection)
+    compact = SearchResponseCompact.model_construct(
+        query=response.query,
+        results=[SearchResultCompact.from_result(result) for result in response.results],
+        collections_info=collections_info,
+        collections=response.collections,
+        next_cursor=response.next_cursor,
+    )
+    return compact.model_dump_json().encode()
+
+
+def _time_ms(function: Callable[[], bytes], repeat: int) -> tuple[float, bytes]:
+    """Best of `repeat` runs, so other work on the machine affects it less"""
+    best = float("inf")
+    output = b""
+    for _ in range(repeat):
+        start = time.process_time()
+        output = function()
+        best = min(best, time.process_time() - start)
+    return best * 1000, output
+
+
+def run(n_results: int, detail_words: int, repeat: int):
+    response = _make_response(n_results, detail_words, random.Random(n_results))
+    print(f"\n{n_results} results, ~{detail_words} words of detail each")
+    print(f"{'serialization':<16} {'encoding':<9} {'bytes':>10} {'vs default':>11} {'CPU ms':>8}")
+
+    default_size = None
+    for name, serialize in [
+        ("fastapi default", _serialize_fastapi_default),
+        ("direct", _serialize_direct),
+        ("compact", _serialize_compact),
+    ]:
+        serialize_ms, body = _time_ms(functools.partial(serialize, response), repeat)
+        if default_size is None:
+            default_size = len(body)
+        print(f"{name:<16} {'identity':<9} {len(body):>10} {len(body) / default_size:>10.0%} {serialize_ms:>8.2f}")
+        if name == "fastapi default":
+            continue
+        for encoding in ENCODINGS:
+            compress_ms, compressed = _time_ms(functools.partial(compress, body, encoding), repeat)
+            print(
+                f"{'':<16} {encoding:<9} {len(compressed):>10} {len(compressed) / default_size:>10.0%} "
+                f"{serialize_ms + compress_ms:>8.2f}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--results", type=int, nargs="+", default=[100, 500, 1_000], help="results per response")
+    parser.add_argument("--detail-words", type=int, default=60)
+    parser.add_argument("--repeat", type=int, default=20, help="runs of each, of which the fastest is reported")
+    args = parser.parse_args()
+    for n_results in args.results:
+        run(n_results, args.detail_words, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
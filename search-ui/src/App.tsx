@@ -2,6 +2,7 @@ import { useState, useRef } from "react"
 import "./App.css"
 import { FaGithub } from "react-icons/fa"
 import api from "./services/api.ts"
+import type { Suggestion } from "./services/api.ts"
 import type { SearchStateI} from "./components/SearchResults.tsx"
 import { SearchStateError, SearchStatePending, SearchStateSuccess } from "./components/SearchResults.tsx"
 import SearchResults from "./components/SearchResults.tsx"
@@ -9,9 +10,27 @@ import SearchResults from "./components/SearchResults.tsx"
 function App() {
   const queryInputRef = useRef<HTMLInputElement | null>(null)
   const [searchState, setSearchState] = useState<SearchStateI | null>(null)
+  const [suggestions, setSuggestions] = useState<Suggestion[]>([])
+  const suggestionsAbortRef = useRef<AbortController | null>(null)
 
   const searchInProgress = searchState instanceof SearchStatePending
 
+  function updateSuggestions(prefix: string) {
+    // only the latest keystroke's suggestions matter
+    suggestionsAbortRef.current?.abort()
+    if (!prefix.trim()) {
+      setSuggestions([])
+      return
+    }
+    const abortController = new AbortController()
+    suggestionsAbortRef.current = abortController
+    api.getSuggestions(prefix, abortController.signal).then(setSuggestions).catch((error: unknown) => {
+      if (!(error instanceof DOMException && error.name === "AbortError")) {
+        console.error("Error occurred while getting suggestions:", error)
+      }
+    })
+  }
+
   function submitQuery() {
     const queryInput = queryInputRef.current
     if (!queryInput) {
@@ -48,8 +67,13 @@ function App() {
             ref={queryInputRef}
             id="search-query" aria-label="search-query"
             type="text" placeholder="Type your search query here"
+            list="search-query-suggestions" autoComplete="off"
+            onChange={(e) => { updateSuggestions(e.target.value) }}
             onKeyDown={(e) => { if (e.key === "Enter") submitQuery() }}
           />
+          <datalist id="search-query-suggestions">
+            {suggestions.map(suggestion => <option key={suggestion.text} value={suggestion.text} />)}
+          </datalist>
           <button id="search-query-submit" aria-label="search-query-submit" type="button" onClick={submitQuery} disabled={searchInProgress}>
             Search
           </button>
@@ -1,4 +1,5 @@
 export default interface CollectionInfo {
+  id: string
   name: string
   url: string
 }
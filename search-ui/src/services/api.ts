@@ -12,6 +12,11 @@ export interface SearchResponse {
     results: SearchResult[]
 }
 
+export interface Suggestion {
+    text: string
+    is_past_query: boolean
+}
+
 class API {
   async postSearch(query: string): Promise<SearchResponse> {
     const response = await fetch("/search", {
@@ -26,6 +31,14 @@ class API {
     }
     return (await response.json()) as SearchResponse
   }
+
+  async getSuggestions(prefix: string, signal?: AbortSignal): Promise<Suggestion[]> {
+    const response = await fetch(`/suggest?${new URLSearchParams({ q: prefix }).toString()}`, { signal })
+    if (!response.ok) {
+      throw new APIError(`API request "GET /suggest" failed with status ${response.status.toString()}`)
+    }
+    return (await response.json()) as Suggestion[]
+  }
 }
 
 const api = new API()
@@ -6,4 +6,5 @@ cd "$(dirname "$0")"
 uvicorn historical_sources_search.api:api \
     --log-config historical_sources_search/logging/config-dict.json \
     --host "0.0.0.0" \
+    --workers "${API_WORKERS:-1}" \
     "$@"
@@ -1,18 +1,59 @@
+import asyncio
 import logging
+import os
+from collections.abc import AsyncGenerator, AsyncIterable
 from contextlib import asynccontextmanager
 from pathlib import Path
 from typing import Annotated, cast
 
 import httpx
-from fastapi import Depends, FastAPI, Request
-from fastapi.responses import RedirectResponse
+from fastapi import Depends, FastAPI, Header, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, RedirectResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from playwright.async_api import Browser, Playwright, async_playwright
-from pydantic import BaseModel
+from playwright.async_api import Playwright, async_playwright
+from pydantic import BaseModel, Field
 
+from historical_sources_search.browser_pool import BrowserContextPool
+from historical_sources_search.browser_supervisor import BrowserSupervisor, BrowserSupervisorStats
+from historical_sources_search.cache import CacheStats, SearchCache
+from historical_sources_search.circuit_breaker import CircuitBreakers, CircuitBreakerStats
+from historical_sources_search.coalesce import CoalescerStats, SearchCoalescer
+from historical_sources_search.collections.registry import CollectionRegistry
+from historical_sources_search.compression import CompressionMiddleware
 from historical_sources_search.env import Env
-from historical_sources_search.search import search_all
-from historical_sources_search.search_result import SearchResult
+from historical_sources_search.exceptions import (
+    CapacityExceededError,
+    ImageFetchError,
+    InvalidCursorError,
+    InvalidImageUrlError,
+    UnknownCollectionError,
+)
+from historical_sources_search.index import IndexStats, SearchIndex
+from historical_sources_search.metrics import PROMETHEUS_CONTENT_TYPE, REGISTRY
+from historical_sources_search.rate_limit import HostRateLimiter, HostRateLimitStats
+from historical_sources_search.resource_blocking import ResourceBlockingStats
+from historical_sources_search.scheduler import PageScheduler, SchedulerStats
+from historical_sources_search.search import harvest_index, search_all_events, search_page_events, warm_up_collections
+from historical_sources_search.search_event import (
+    CollectionSearchSummary,
+    SearchEvent,
+    SearchEventCollectionInfo,
+    SearchEventCompact,
+    SearchEventPageEnd,
+    SearchEventResult,
+    SearchEventResultCompact,
+)
+from historical_sources_search.search_result import CollectionInfo, SearchResult, SearchResultCompact
+from historical_sources_search.search_session import SearchSessionStore
+from historical_sources_search.suggest import (
+    SearchPrefetcher,
+    Suggestion,
+    SuggestionIndex,
+    SuggestionStats,
+    seed_suggestions,
+)
+from historical_sources_search.thumbnails import ThumbnailStats, ThumbnailStore, get_thumbnail_url
+from historical_sources_search.timeouts import TimeoutStats, get_timeout_stats
 
 LOGGER = logging.getLogger(__name__)
 
@@ -20,31 +61,249 @@ LOGGER = logging.getLogger(__name__)
 @asynccontextmanager
 async def _lifespan(api_: FastAPI):
     env = Env.get()
+    scheduler = PageScheduler(
+        max_pages=env.max_browser_pages,
+        max_pages_per_collection=env.max_browser_pages_per_collection,
+        max_waiting=env.max_waiting_for_browser_page,
+        wait_timeout_seconds=env.browser_page_wait_timeout_seconds,
+    )
+    # each worker process has its own rate limiter, so together they stay within the configured limits
+    n_workers = env.api_workers
+    rate_limiter = HostRateLimiter(
+        requests_per_second=(env.rate_limit_requests_per_second / n_workers),
+        burst=max(1, env.rate_limit_burst // n_workers),
+        requests_per_second_by_host={
+            host: requests_per_second / n_workers
+            for host, requests_per_second in env.rate_limit_requests_per_second_by_host.items()
+        },
+        max_backoff_seconds=env.rate_limit_max_backoff_seconds,
+    )
+    # image fetches have their own limits, so thumbnails don't take turns away from (nor wait behind) scraping
+    thumbnail_rate_limiter = HostRateLimiter(
+        requests_per_second=(env.thumbnail_rate_limit_requests_per_second / n_workers),
+        burst=max(1, env.thumbnail_rate_limit_burst // n_workers),
+        requests_per_second_by_host={},
+        max_backoff_seconds=env.rate_limit_max_backoff_seconds,
+    )
+    if n_workers > 1 and env.cache_sqlite_path is None:
+        LOGGER.warning("Running several workers without `CACHE_SQLITE_PATH`; they won't share cached results")
     async with (
-        httpx.AsyncClient(follow_redirects=True) as httpx_client,
+        httpx.AsyncClient(follow_redirects=True, event_hooks=rate_limiter.httpx_event_hooks()) as httpx_client,
+        httpx.AsyncClient(event_hooks=thumbnail_rate_limiter.httpx_event_hooks()) as thumbnail_httpx_client,
         async_playwright() as pw,
-        await cast(Playwright, pw).chromium.launch(channel="chromium", headless=(not env.playwright_debug)) as browser,
+        BrowserSupervisor(
+            lambda: cast(Playwright, pw).chromium.launch(channel="chromium", headless=(not env.playwright_debug)),
+            max_contexts=env.browser_restart_after_contexts,
+            max_memory_bytes=(None if env.browser_restart_memory_mb is None else env.browser_restart_memory_mb << 20),
+            drain_timeout_seconds=env.browser_drain_timeout_seconds,
+        ) as browser_supervisor,
+        BrowserContextPool(
+            browser_supervisor,
+            scheduler,
+            size_per_key=env.browser_contexts_per_collection,
+            max_uses=env.browser_context_max_uses,
+            block_resources=env.block_browser_resources,
+        ) as browser_pool,
+        SearchCache(
+            max_entries=env.cache_max_entries,
+            ttl_seconds=env.cache_ttl_seconds,
+            ttl_seconds_by_collection=env.cache_ttl_seconds_by_collection,
+            stale_seconds=env.cache_stale_seconds,
+            sqlite_path=env.cache_sqlite_path,
+        ) as cache,
+        SearchIndex(
+            sqlite_path=env.index_sqlite_path,
+            min_results=env.index_min_results,
+            reharvest_seconds=env.index_reharvest_seconds,
+            max_results=env.index_max_results,
+        ) as index,
+        SearchCoalescer(read_ahead=env.coalesce_read_ahead) as coalescer,
+        SearchSessionStore(
+            ttl_seconds=env.search_session_ttl_seconds,
+            max_sessions=env.max_search_sessions,
+            live_seconds=env.search_session_live_seconds,
+            max_live_sessions=env.max_live_search_sessions,
+        ) as session_store,
+        ThumbnailStore(
+            thumbnail_httpx_client,
+            sqlite_path=env.thumbnail_sqlite_path,
+            max_bytes=env.thumbnail_max_bytes,
+            size_px=env.thumbnail_size_px,
+            revalidate_seconds=env.thumbnail_revalidate_seconds,
+            allowed_domains=env.thumbnail_allowed_domains,
+        ) as thumbnails,
+        CircuitBreakers(
+            failure_threshold=env.circuit_breaker_failure_threshold,
+            open_seconds=env.circuit_breaker_open_seconds,
+            max_open_seconds=env.circuit_breaker_max_open_seconds,
+            probe_query=env.circuit_breaker_probe_query,
+        ) as breakers,
     ):
-        api_.state.httpx_client = httpx_client
-        api_.state.browser = browser
-        yield
+        registry = CollectionRegistry(
+            httpx_client, browser_pool, rate_limiter, enabled_ids=env.enabled_collections, breakers=breakers
+        )
+        suggestions = SuggestionIndex(
+            max_entries=env.suggest_max_entries, query_min_clients=env.suggest_query_min_clients
+        )
+        async with SearchPrefetcher(
+            suggestions,
+            lambda query: search_all_events(query, registry, cache, coalescer, index),
+            scheduler,
+            max_in_flight=env.suggest_prefetch_max_in_flight,
+            min_prefix_chars=env.suggest_prefetch_min_prefix_chars,
+            repeat_seconds=env.suggest_prefetch_repeat_seconds,
+        ) as prefetcher:
+            api_.state.scheduler = scheduler
+            api_.state.rate_limiter = rate_limiter
+            api_.state.browser_pool = browser_pool
+            api_.state.registry = registry
+            api_.state.suggestions = suggestions
+            api_.state.prefetcher = prefetcher
+            api_.state.cache = cache
+            api_.state.index = index
+            api_.state.coalescer = coalescer
+            api_.state.session_store = session_store
+            api_.state.thumbnails = thumbnails
+            api_.state.breakers = breakers
+            # don't hold up startup; searches that come in before this finishes just create their own contexts
+            task_warm_up = asyncio.create_task(warm_up_collections(registry))
+            task_seed_suggestions = asyncio.create_task(
+                seed_suggestions(suggestions, index, env.index_seed_queries, max_titles=env.suggest_max_entries)
+            )
+            task_harvest = None
+            if index.is_enabled and env.index_seed_queries:
+                task_harvest = asyncio.create_task(harvest_index(index, registry))
+            yield
+            task_warm_up.cancel()
+            task_seed_suggestions.cancel()
+            if task_harvest is not None:
+                task_harvest.cancel()
 
 
-async def _httpx_client_dep(request: Request) -> httpx.AsyncClient:
-    return request.app.state.httpx_client
+async def _scheduler_dep(request: Request) -> PageScheduler:
+    return request.app.state.scheduler
 
 
-HttpxClientDep = Annotated[httpx.AsyncClient, Depends(_httpx_client_dep)]
+SchedulerDep = Annotated[PageScheduler, Depends(_scheduler_dep)]
 
 
-async def _browser_dep(request: Request) -> Browser:
-    return request.app.state.browser
+async def _rate_limiter_dep(request: Request) -> HostRateLimiter:
+    return request.app.state.rate_limiter
 
 
-BrowserDep = Annotated[Browser, Depends(_browser_dep)]
+RateLimiterDep = Annotated[HostRateLimiter, Depends(_rate_limiter_dep)]
+
+
+async def _registry_dep(request: Request) -> CollectionRegistry:
+    return request.app.state.registry
+
+
+RegistryDep = Annotated[CollectionRegistry, Depends(_registry_dep)]
+
+
+async def _suggestions_dep(request: Request) -> SuggestionIndex:
+    return request.app.state.suggestions
+
+
+SuggestionsDep = Annotated[SuggestionIndex, Depends(_suggestions_dep)]
+
+
+async def _prefetcher_dep(request: Request) -> SearchPrefetcher:
+    return request.app.state.prefetcher
+
+
+PrefetcherDep = Annotated[SearchPrefetcher, Depends(_prefetcher_dep)]
+
+
+async def _browser_pool_dep(request: Request) -> BrowserContextPool:
+    return request.app.state.browser_pool
+
+
+BrowserContextPoolDep = Annotated[BrowserContextPool, Depends(_browser_pool_dep)]
+
+
+async def _cache_dep(request: Request) -> SearchCache:
+    return request.app.state.cache
+
+
+CacheDep = Annotated[SearchCache, Depends(_cache_dep)]
+
+
+async def _index_dep(request: Request) -> SearchIndex:
+    return request.app.state.index
+
+
+IndexDep = Annotated[SearchIndex, Depends(_index_dep)]
+
+
+async def _coalescer_dep(request: Request) -> SearchCoalescer:
+    return request.app.state.coalescer
+
+
+CoalescerDep = Annotated[SearchCoalescer, Depends(_coalescer_dep)]
+
+
+async def _session_store_dep(request: Request) -> SearchSessionStore:
+    return request.app.state.session_store
+
+
+SessionStoreDep = Annotated[SearchSessionStore, Depends(_session_store_dep)]
+
+
+async def _thumbnails_dep(request: Request) -> ThumbnailStore:
+    return request.app.state.thumbnails
+
+
+ThumbnailsDep = Annotated[ThumbnailStore, Depends(_thumbnails_dep)]
+
+
+async def _breakers_dep(request: Request) -> CircuitBreakers:
+    return request.app.state.breakers
+
+
+BreakersDep = Annotated[CircuitBreakers, Depends(_breakers_dep)]
 
 
 api = FastAPI(lifespan=_lifespan)
+api.add_middleware(
+    CompressionMiddleware,
+    encodings=Env.get().response_compression_encodings,
+    minimum_size=Env.get().response_compression_min_bytes,
+)
+
+
+@api.exception_handler(CapacityExceededError)
+async def _handle_capacity_exceeded(request: Request, exc: CapacityExceededError) -> JSONResponse:
+    LOGGER.warning(f"Rejecting {request.method} {request.url.path}: {exc}")
+    return JSONResponse(
+        {"detail": str(exc)},
+        status_code=503,
+        headers={"Retry-After": str(round(exc.retry_after_seconds))},
+    )
+
+
+@api.exception_handler(InvalidCursorError)
+async def _handle_invalid_cursor(request: Request, exc: InvalidCursorError) -> JSONResponse:
+    LOGGER.warning(f"Rejecting {request.method} {request.url.path}: {exc}")
+    return JSONResponse({"detail": str(exc)}, status_code=400)
+
+
+@api.exception_handler(UnknownCollectionError)
+async def _handle_unknown_collection(request: Request, exc: UnknownCollectionError) -> JSONResponse:
+    LOGGER.warning(f"Rejecting {request.method} {request.url.path}: {exc}")
+    return JSONResponse({"detail": str(exc)}, status_code=400)
+
+
+@api.exception_handler(InvalidImageUrlError)
+async def _handle_invalid_image_url(request: Request, exc: InvalidImageUrlError) -> JSONResponse:
+    LOGGER.warning(f"Rejecting {request.method} {request.url.path}: {exc}")
+    return JSONResponse({"detail": str(exc)}, status_code=400)
+
+
+@api.exception_handler(ImageFetchError)
+async def _handle_image_fetch_error(request: Request, exc: ImageFetchError) -> JSONResponse:
+    LOGGER.warning(f"Failed {request.method} {request.url.path}: {exc}")
+    return JSONResponse({"detail": str(exc)}, status_code=502)
 
 
 api.mount("/app", StaticFiles(directory=Path(__file__).parent / "static"))
@@ -63,24 +322,332 @@ async def get_app() -> RedirectResponse:
     return _REDIRECT_TO_UI
 
 
+class StatusResponse(BaseModel):
+    status: str
+    worker_pid: int
+    """Which worker process answered; the other stats are only of this process"""
+    cache: CacheStats
+    index: IndexStats
+    coalescer: CoalescerStats
+    scheduler: SchedulerStats
+    browser: BrowserSupervisorStats
+    rate_limits: dict[str, HostRateLimitStats]
+    blocked_resources: dict[str, ResourceBlockingStats]
+    """Requests of each collection's browser pages blocked by its resource policy (bytes saved are an estimate)"""
+    thumbnails: ThumbnailStats
+    suggestions: SuggestionStats
+    timeouts: dict[str, dict[str, TimeoutStats]]
+    """Of each (loaded) collection's browser operations, adapted to their recent latency"""
+    collection_health: dict[str, CircuitBreakerStats]
+    """Of each (loaded) collection; while its circuit isn't closed, it isn't searched live"""
+
+
 @api.get("/status")
-async def get_status() -> dict[str, str]:
-    return {"status": "ok"}
+async def get_status(
+    cache: CacheDep,
+    index: IndexDep,
+    coalescer: CoalescerDep,
+    scheduler: SchedulerDep,
+    rate_limiter: RateLimiterDep,
+    browser_pool: BrowserContextPoolDep,
+    thumbnails: ThumbnailsDep,
+    prefetcher: PrefetcherDep,
+    breakers: BreakersDep,
+) -> StatusResponse:
+    return StatusResponse(
+        status="ok",
+        worker_pid=os.getpid(),
+        cache=cache.get_stats(),
+        index=index.get_stats(),
+        coalescer=coalescer.get_stats(),
+        scheduler=scheduler.get_stats(),
+        browser=browser_pool.supervisor.get_stats(),
+        rate_limits=rate_limiter.get_stats(),
+        blocked_resources=browser_pool.get_resource_stats(),
+        thumbnails=(await thumbnails.get_stats()),
+        suggestions=prefetcher.get_stats(),
+        timeouts=get_timeout_stats(),
+        collection_health=breakers.get_stats(),
+    )
+
+
+@api.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics() -> PlainTextResponse:
+    """Timings of the hot paths of searches (and a few other metrics), in Prometheus' text format"""
+    return PlainTextResponse(REGISTRY.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
+@api.get("/suggest")
+async def get_suggest(
+    q: str,
+    suggestions: SuggestionsDep,
+    prefetcher: PrefetcherDep,
+    limit: Annotated[int, Query(gt=0, le=50)] = 8,
+) -> list[Suggestion]:
+    """
+    Completions of a partly typed query, from past queries and the titles of results found.
+    The best one may be searched for in the background, so its results are ready sooner if it is then searched.
+    """
+    completions = suggestions.suggest(q, limit)
+    prefetcher.maybe_prefetch(q, completions)
+    return completions
+
+
+@api.get("/collections")
+async def get_collections(registry: RegistryDep) -> list[CollectionInfo]:
+    """The collections that can be searched (e.g. to choose some of them with `collections` in a search)"""
+    return [collection.collection_info for collection in registry.get_many()]
+
+
+@api.get("/thumb")
+async def get_thumb(
+    url: str,
+    thumbnails: ThumbnailsDep,
+    if_none_match: Annotated[str | None, Header()] = None,
+) -> Response:
+    """A small version of a result's image (from one of the collections' hosts), cached on disk"""
+    thumbnail = await thumbnails.get(url)
+    headers = {
+        "ETag": thumbnail.etag,
+        "Cache-Control": f"public, max-age={int(thumbnails.revalidate_seconds)}",
+    }
+    if if_none_match is not None and thumbnail.etag in {tag.strip() for tag in if_none_match.split(",")}:
+        return Response(status_code=304, headers=headers)
+    return Response(thumbnail.content, media_type=thumbnail.media_type, headers=headers)
 
 
 class SearchRequest(BaseModel):
     query: str
+    limit: Annotated[int, Field(gt=0, le=1_000)] | None = None
+    """If given (or if `cursor` is), only get a page of up to this many results, along with a cursor to the next page"""
+    cursor: str | None = None
+    """From the previous page of the same query"""
+    collections: Annotated[list[str], Field(min_length=1)] | None = None
+    """Ids of the collections to search (see `/collections`), if not all of them; a `cursor` keeps its own"""
+    compact: bool = False
+    """Refer to each result's collection by id, giving each collection's info only once (smaller responses)"""
+
+    @property
+    def is_paginated(self) -> bool:
+        return self.limit is not None or self.cursor is not None
 
 
 class SearchResponse(BaseModel):
     query: str
     results: list[SearchResult]
+    collections: list[CollectionSearchSummary]
+    """For a paginated search, only the collections that ran out during this page"""
+    next_cursor: str | None = None
 
 
-@api.post("/search")
-async def post_search(request: SearchRequest, httpx_client: HttpxClientDep, browser: BrowserDep) -> SearchResponse:
+class SearchResponseCompact(BaseModel):
+    query: str
+    results: list[SearchResultCompact]
+    collections_info: dict[str, CollectionInfo]
+    """Of every collection referred to by `results`, by id"""
+    collections: list[CollectionSearchSummary]
+    """For a paginated search, only the collections that ran out during this page"""
+    next_cursor: str | None = None
+
+
+def _get_client_id(http_request: Request) -> str:
+    return "unknown" if http_request.client is None else http_request.client.host
+
+
+def _search_events(
+    request: SearchRequest,
+    client_id: str,
+    registry: CollectionRegistry,
+    cache: SearchCache,
+    index: SearchIndex,
+    coalescer: SearchCoalescer,
+    session_store: SearchSessionStore,
+    thumbnails: ThumbnailStore,
+    suggestions: SuggestionIndex,
+) -> AsyncIterable[SearchEvent]:
+    if request.is_paginated:
+        events = search_page_events(
+            request.query,
+            request.limit or Env.get().search_page_default_limit,
+            request.cursor,
+            session_store,
+            registry,
+            cache,
+            coalescer,
+            index,
+            request.collections,
+        )
+    else:
+        events = search_all_events(request.query, registry, cache, coalescer, index, request.collections)
+    env = Env.get()
+    return _prepare_results(
+        events,
+        (thumbnails if env.thumbnail_image_src else None),
+        suggestions,
+        query=(None if request.cursor is not None or not env.suggest_past_queries else request.query),
+        client_id=client_id,
+    )
+
+
+async def _prepare_results(
+    events: AsyncIterable[SearchEvent],
+    thumbnails: ThumbnailStore | None,
+    suggestions: SuggestionIndex,
+    query: str | None,
+    client_id: str,
+) -> AsyncIterable[SearchEvent]:
+    """
+    Point results' `image_src` at thumbnails served by this API (if `thumbnails` is given), where the image's host
+    allows it. Results' titles are added to `suggestions`, as is `query` (searched by `client_id`)
+    once the search has found any results.
+    """
+    n_results = 0
+    try:
+        async for event in events:
+            if not isinstance(event, SearchEventResult):
+                yield event
+                continue
+            n_results += 1
+            suggestions.add_titles([event.result.title])
+            image_src = event.result.image_src
+            if thumbnails is not None and image_src is not None and thumbnails.is_allowed(image_src):
+                result = event.result.model_copy(update={"image_src": get_thumbnail_url(image_src)})
+                yield event.model_copy(update={"result": result})
+            else:
+                yield event
+        if query is not None and n_results > 0:
+            suggestions.add_query(query, client_id)
+    finally:
+        if isinstance(events, AsyncGenerator):
+            await events.aclose()  # so a search stopped early is cleaned up right away
+
+
+async def _compact_events(events: AsyncIterable[SearchEvent]) -> AsyncIterable[SearchEventCompact]:
+    """Refer to each result's collection by id, sending the collection's info just before its first result"""
+    collection_ids: set[str] = set()
+    try:
+        async for event in events:
+            if not isinstance(event, SearchEventResult):
+                yield event
+                continue
+            collection = event.result.provided_by_collection
+            if collection.id not in collection_ids:
+                collection_ids.add(collection.id)
+                yield SearchEventCollectionInfo(collection=collection)
+            yield SearchEventResultCompact.model_construct(result=SearchResultCompact.from_result(event.result))
+    finally:
+        if isinstance(events, AsyncGenerator):
+            await events.aclose()
+
+
+@api.post("/search", response_model=SearchResponse | SearchResponseCompact)
+async def post_search(
+    request: SearchRequest,
+    http_request: Request,
+    registry: RegistryDep,
+    cache: CacheDep,
+    index: IndexDep,
+    coalescer: CoalescerDep,
+    session_store: SessionStoreDep,
+    scheduler: SchedulerDep,
+    thumbnails: ThumbnailsDep,
+    suggestions: SuggestionsDep,
+) -> Response:
+    scheduler.check_admission()
     LOGGER.info(f"Starting search with query {request.query!r}")
-    results = [result async for result in search_all(request.query, httpx_client, browser)]
-    # TODO: stream results
+    results: list[SearchResult] = []
+    collections = []
+    next_cursor = None
+    events = _search_events(
+        request, _get_client_id(http_request), registry, cache, index, coalescer, session_store, thumbnails, suggestions
+    )
+    async for event in events:
+        match event:
+            case SearchEventResult():
+                results.append(event.result)
+            case SearchEventPageEnd():
+                next_cursor = event.next_cursor
+            case _:
+                collections.append(CollectionSearchSummary.from_event(event))
     LOGGER.info(f"Found {len(results)} result(s) for query {request.query!r}")
-    return SearchResponse(query=request.query, results=results)
+    # everything in the response was already validated, so it's built without validating it again
+    response: SearchResponse | SearchResponseCompact
+    if request.compact:
+        collections_info: dict[str, CollectionInfo] = {}
+        for result in results:
+            collections_info.setdefault(result.provided_by_collection.id, result.provided_by_collection)
+        response = SearchResponseCompact.model_construct(
+            query=request.query,
+            results=[SearchResultCompact.from_result(result) for result in results],
+            collections_info=collections_info,
+            collections=collections,
+            next_cursor=next_cursor,
+        )
+    else:
+        response = SearchResponse.model_construct(
+            query=request.query, results=results, collections=collections, next_cursor=next_cursor
+        )
+    # and serialized straight to JSON by pydantic, rather than by FastAPI's slower route through Python objects
+    return Response(response.model_dump_json(), media_type="application/json")
+
+
+_MEDIA_TYPE_NDJSON = "application/x-ndjson"
+_MEDIA_TYPE_SSE = "text/event-stream"
+
+
+def _format_event_ndjson(event: SearchEvent | SearchEventCompact) -> str:
+    return f"{event.model_dump_json()}\n"
+
+
+def _format_event_sse(event: SearchEvent | SearchEventCompact) -> str:
+    return f"event: {event.event}\ndata: {event.model_dump_json()}\n\n"
+
+
+@api.post("/search/stream")
+async def post_search_stream(
+    request: SearchRequest,
+    http_request: Request,
+    registry: RegistryDep,
+    cache: CacheDep,
+    index: IndexDep,
+    coalescer: CoalescerDep,
+    session_store: SessionStoreDep,
+    scheduler: SchedulerDep,
+    thumbnails: ThumbnailsDep,
+    suggestions: SuggestionsDep,
+    accept: Annotated[str | None, Header()] = None,
+) -> StreamingResponse:
+    """
+    Stream search events as they are found, instead of waiting for all collections to finish.
+    Responds with Server-Sent Events if the client accepts `text/event-stream`, otherwise with newline-delimited JSON.
+    """
+    scheduler.check_admission()
+    if accept is not None and _MEDIA_TYPE_SSE in accept:
+        media_type, format_event = _MEDIA_TYPE_SSE, _format_event_sse
+    else:
+        media_type, format_event = _MEDIA_TYPE_NDJSON, _format_event_ndjson
+
+    async def _stream() -> AsyncIterable[str]:
+        LOGGER.info(f"Starting streamed search with query {request.query!r}")
+        n_results = 0
+        events = _search_events(
+            request,
+            _get_client_id(http_request),
+            registry,
+            cache,
+            index,
+            coalescer,
+            session_store,
+            thumbnails,
+            suggestions,
+        )
+        events_out: AsyncIterable[SearchEvent | SearchEventCompact] = (
+            _compact_events(events) if request.compact else events
+        )
+        async for event in events_out:
+            if isinstance(event, SearchEventResult | SearchEventResultCompact):
+                n_results += 1
+            yield format_event(event)
+        LOGGER.info(f"Streamed {n_results} result(s) for query {request.query!r}")
+
+    return StreamingResponse(_stream(), media_type=media_type)
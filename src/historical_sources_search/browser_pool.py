@@ -0,0 +1,193 @@
+import asyncio
+import logging
+from collections import defaultdict
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager, suppress
+from dataclasses import dataclass
+from types import TracebackType
+from typing import Self
+
+from playwright.async_api import BrowserContext, Page
+
+from historical_sources_search.browser_supervisor import BrowserGeneration, BrowserSupervisor
+from historical_sources_search.exceptions import BrowserRestartedError
+from historical_sources_search.resource_blocking import ResourceBlocker, ResourceBlockingStats, ResourcePolicy
+from historical_sources_search.scheduler import PageScheduler
+
+LOGGER = logging.getLogger(__name__)
+
+type PrepareContext = Callable[[Page], Awaitable[None]]
+"""Called once on each newly created context's page, e.g. to load cookies or dismiss consent dialogs"""
+
+
+@dataclass
+class _PooledContext:
+    generation: BrowserGeneration
+    context: BrowserContext
+    page: Page
+    resources: ResourceBlockingStats
+    n_uses: int = 0
+
+
+class BrowserContextPool:
+    """
+    Keeps a number of warm (already prepared) browser contexts for each collection, and leases them out to searches.
+
+    Contexts are reset between leases, and closed (to be replaced by a fresh one) after `max_uses` leases.
+    If more contexts are leased at once than the pool keeps, extra ones are created and closed after use.
+    How many can be leased at once is limited by `scheduler`.
+    If `block_resources`, each context is created with its key's `ResourcePolicy` applied (keys being collection ids).
+    Contexts are created in the browser currently run by `supervisor`; those of a replaced browser aren't reused.
+    """
+
+    def __init__(
+        self,
+        supervisor: BrowserSupervisor,
+        scheduler: PageScheduler,
+        *,
+        size_per_key: int,
+        max_uses: int,
+        block_resources: bool,
+    ):
+        self.supervisor = supervisor
+        self.scheduler = scheduler
+        self.size_per_key = size_per_key
+        self.max_uses = max_uses
+        self.block_resources = block_resources
+        self._idle: defaultdict[str, list[_PooledContext]] = defaultdict(list)
+        self._resource_stats: defaultdict[str, ResourceBlockingStats] = defaultdict(ResourceBlockingStats)
+        self._background_tasks: set[asyncio.Task] = set()
+        self._closed = False
+
+    async def __aenter__(self) -> Self:
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ):
+        await self.close()
+
+    async def close(self):
+        self._closed = True
+        for task in self._background_tasks:
+            task.cancel()
+        idle = [pooled for pooled_list in self._idle.values() for pooled in pooled_list]
+        self._idle.clear()
+        await asyncio.gather(*(self._discard(pooled) for pooled in idle))
+
+    async def _create(self, key: str, prepare: PrepareContext, policy: ResourcePolicy) -> _PooledContext:
+        resources = ResourceBlockingStats()
+        # service workers would fetch around the routing
+        generation, context = await self.supervisor.new_context(
+            service_workers=("block" if self.block_resources else "allow")
+        )
+        try:
+            if self.block_resources:
+                await ResourceBlocker(key, policy, resources, self._resource_stats[key]).apply(context)
+            page = await context.new_page()
+            await prepare(page)
+        except BaseException:
+            await context.close()
+            raise
+        LOGGER.debug(f"Created browser context for {key!r}")
+        return _PooledContext(generation=generation, context=context, page=page, resources=resources)
+
+    @staticmethod
+    async def _discard(pooled: _PooledContext):
+        with suppress(Exception):  # the context may already be gone, e.g. if the browser crashed
+            await pooled.context.close()
+
+    async def _replenish(self, key: str, prepare: PrepareContext, policy: ResourcePolicy):
+        try:
+            pooled = await self._create(key, prepare, policy)
+        except Exception:
+            LOGGER.warning(f"Failed to create a warm browser context for {key!r}", exc_info=True)
+            return
+        if self._closed or not pooled.generation.is_usable or len(self._idle[key]) >= self.size_per_key:
+            await self._discard(pooled)
+        else:
+            self._idle[key].append(pooled)
+
+    def _replenish_in_background(self, key: str, prepare: PrepareContext, policy: ResourcePolicy):
+        task = asyncio.create_task(self._replenish(key, prepare, policy))
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    async def _take_idle(self, key: str) -> _PooledContext | None:
+        """Take a warm context for `key`, discarding any left over from a replaced browser"""
+        idle = self._idle[key]
+        stale = [pooled for pooled in idle if not pooled.generation.is_usable]
+        if stale:
+            idle[:] = [pooled for pooled in idle if pooled.generation.is_usable]
+            await asyncio.gather(*(self._discard(pooled) for pooled in stale))
+        return idle.pop() if idle else None
+
+    async def prewarm(self, key: str, prepare: PrepareContext, policy: ResourcePolicy):
+        """Fill the pool for `key` with warm contexts"""
+        n_missing = self.size_per_key - len(self._idle[key])
+        await asyncio.gather(*(self._replenish(key, prepare, policy) for _ in range(n_missing)))
+
+    @asynccontextmanager
+    async def lease(self, key: str, prepare: PrepareContext, policy: ResourcePolicy) -> AsyncIterator[Page]:
+        """
+        Borrow a warm page for the duration of the `async with` block, once the scheduler allows it.
+        `prepare` and `policy` are only used if a new context has to be created.
+        Raises `BrowserRestartedError` if the block fails because the browser was lost in the meantime.
+        """
+        async with self.scheduler.slot(key), self._lease(key, prepare, policy) as page:
+            yield page
+
+    @asynccontextmanager
+    async def _lease(self, key: str, prepare: PrepareContext, policy: ResourcePolicy) -> AsyncIterator[Page]:
+        idle = self._idle[key]
+        pooled = await self._take_idle(key) or await self._create(key, prepare, policy)
+        resources_before = pooled.resources.model_copy(deep=True)
+        clean_exit = False
+        self.supervisor.acquire(pooled.generation)
+        try:
+            yield pooled.page
+            clean_exit = True
+        except (GeneratorExit, asyncio.CancelledError):
+            # the user of the page stopped early (e.g. enough results, or a deadline), which leaves the context fine
+            clean_exit = True
+            raise
+        except Exception as e:
+            if pooled.generation.is_disconnected:
+                raise BrowserRestartedError(f"Browser #{pooled.generation.number} was lost during use") from e
+            raise
+        finally:
+            self.supervisor.release(pooled.generation)
+            if self.block_resources:
+                resources = pooled.resources.minus(resources_before)
+                LOGGER.debug(
+                    f"Lease of {key!r} blocked {resources.n_requests_blocked} request(s) "
+                    f"{resources.n_requests_blocked_by_type} (an estimated {resources.n_bytes_saved_estimate} byte(s)), "
+                    f"allowed {resources.n_requests_allowed} request(s)"
+                )
+            pooled.n_uses += 1
+            if (
+                clean_exit
+                and not self._closed
+                and pooled.generation.is_usable
+                and pooled.n_uses < self.max_uses
+                and len(idle) < self.size_per_key
+            ):
+                try:
+                    await pooled.page.goto("about:blank")  # reset, and free the memory of the last page
+                except Exception:
+                    LOGGER.warning(f"Failed to reset browser context for {key!r}", exc_info=True)
+                    await self._discard(pooled)
+                else:
+                    idle.append(pooled)
+            else:
+                # contexts that saw an error might be left in a bad state, so don't reuse them
+                await self._discard(pooled)
+                if not self._closed and len(idle) < self.size_per_key:
+                    self._replenish_in_background(key, prepare, policy)
+
+    def get_resource_stats(self) -> dict[str, ResourceBlockingStats]:
+        """Requests blocked and allowed by each key's contexts, since startup"""
+        return dict(self._resource_stats)
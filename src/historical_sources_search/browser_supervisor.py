@@ -0,0 +1,236 @@
+import asyncio
+import logging
+import os
+from collections.abc import Awaitable, Callable
+from contextlib import suppress
+from pathlib import Path
+from types import TracebackType
+from typing import Any, Self
+
+from playwright.async_api import Browser, BrowserContext
+from pydantic import BaseModel
+
+from historical_sources_search.metrics import BROWSER_RESTARTS
+
+LOGGER = logging.getLogger(__name__)
+
+_CHECK_INTERVAL_SECONDS = 10
+
+type LaunchBrowser = Callable[[], Awaitable[Browser]]
+
+
+def browser_memory_bytes() -> int | None:
+    """Total resident memory of the browser processes started by this process, from `/proc` (so Linux only)"""
+    proc = Path("/proc")
+    if not proc.is_dir():
+        return None
+    parents: dict[int, int] = {}
+    names: dict[int, str] = {}
+    for stat_path in proc.glob("[0-9]*/stat"):
+        try:
+            stat = stat_path.read_text()
+        except OSError:
+            continue  # the process already exited
+        pid = int(stat_path.parent.name)
+        # the name is in parentheses (and may contain spaces); the parent PID is the second field after it
+        names[pid] = stat[stat.index("(") + 1 : stat.rindex(")")]
+        parents[pid] = int(stat[stat.rindex(")") + 2 :].split()[1])
+
+    descendants = {os.getpid()}
+    changed = True
+    while changed:
+        new = {pid for pid, parent in parents.items() if parent in descendants} - descendants
+        descendants |= new
+        changed = bool(new)
+
+    total = 0
+    for pid in descendants:
+        if "chrom" not in names.get(pid, "") and "headless" not in names.get(pid, ""):
+            continue
+        try:
+            for line in (proc / str(pid) / "status").read_text().splitlines():
+                if line.startswith("VmRSS:"):
+                    total += int(line.split()[1]) * 1024
+        except OSError:
+            continue
+    return total
+
+
+class BrowserSupervisorStats(BaseModel):
+    generation: int
+    """How many browsers have been launched so far (including the current one)"""
+    n_contexts_created: int
+    """By the current browser"""
+    n_contexts_in_use: int
+    """Across all browsers, including ones being drained"""
+    n_draining: int
+    memory_bytes: int | None
+    """Of all browser processes, as of the last check (only checked if there's a limit)"""
+
+
+class BrowserGeneration:
+    """One launched browser, and how it is being used"""
+
+    def __init__(self, number: int, browser: Browser):
+        self.number = number
+        self.browser = browser
+        self.n_contexts_created = 0
+        self.n_in_use = 0
+        self.is_retired = False
+        """Replaced by a newer browser; contexts still in use may finish, but no new ones should be used"""
+        self.is_disconnected = False
+        self.drained = asyncio.Event()
+
+    @property
+    def is_usable(self) -> bool:
+        return not (self.is_retired or self.is_disconnected)
+
+
+class BrowserSupervisor:
+    """
+    Owns the browser, and replaces it with a freshly launched one when it disconnects (e.g. crashes),
+    has created `max_contexts` contexts, or when the browser processes use more than `max_memory_bytes`.
+
+    The old browser is closed once the contexts in use on it are given back (see `release`),
+    so searches in progress can finish; or after `drain_timeout_seconds`, failing any that haven't.
+    """
+
+    def __init__(
+        self,
+        launch: LaunchBrowser,
+        *,
+        max_contexts: int | None,
+        max_memory_bytes: int | None,
+        drain_timeout_seconds: float,
+    ):
+        self.launch = launch
+        self.max_contexts = max_contexts
+        self.max_memory_bytes = max_memory_bytes
+        self.drain_timeout_seconds = drain_timeout_seconds
+        self._current: BrowserGeneration | None = None
+        self._draining: set[BrowserGeneration] = set()
+        self._restart_lock = asyncio.Lock()
+        self._background_tasks: set[asyncio.Task] = set()
+        self._memory_bytes: int | None = None
+        self._n_generations = 0
+        self._closed = False
+
+    async def __aenter__(self) -> Self:
+        self._current = await self._launch()
+        if self.max_memory_bytes is not None:  # else there's nothing to check the memory against
+            self._run_in_background(self._monitor(self.max_memory_bytes))
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ):
+        self._closed = True
+        for task in self._background_tasks:
+            task.cancel()
+        generations = [*self._draining, *([] if self._current is None else [self._current])]
+        await asyncio.gather(*(self._close(generation) for generation in generations))
+
+    def _run_in_background(self, coroutine: Awaitable[Any]):
+        task = asyncio.ensure_future(coroutine)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    async def _launch(self) -> BrowserGeneration:
+        browser = await self.launch()
+        self._n_generations += 1
+        generation = BrowserGeneration(self._n_generations, browser)
+        browser.on("disconnected", lambda _: self._on_disconnected(generation))
+        LOGGER.info(f"Launched browser #{generation.number}")
+        return generation
+
+    @staticmethod
+    async def _close(generation: BrowserGeneration):
+        with suppress(Exception):  # it may already be gone
+            await generation.browser.close()
+
+    def _on_disconnected(self, generation: BrowserGeneration):
+        generation.is_disconnected = True
+        generation.drained.set()  # nothing left to wait for
+        if generation is self._current and not self._closed:
+            LOGGER.error(f"Browser #{generation.number} disconnected unexpectedly")
+            self._run_in_background(self.restart(generation, reason="disconnected"))
+
+    async def restart(self, generation: BrowserGeneration, reason: str):
+        """Replace `generation` with a freshly launched browser (unless it has been replaced already)"""
+        async with self._restart_lock:
+            if generation is not self._current:
+                return
+            try:
+                new_generation = await self._launch()
+            except Exception:
+                LOGGER.exception(f"Failed to launch a browser to replace #{generation.number}")
+                return
+            LOGGER.warning(f"Replaced browser #{generation.number} with #{new_generation.number} ({reason})")
+            BROWSER_RESTARTS.inc(reason=reason)
+            self._current = new_generation
+            generation.is_retired = True
+            self._draining.add(generation)
+            self._run_in_background(self._drain(generation))
+
+    async def _drain(self, generation: BrowserGeneration):
+        if generation.n_in_use == 0:
+            generation.drained.set()
+        try:
+            await asyncio.wait_for(generation.drained.wait(), self.drain_timeout_seconds)
+        except TimeoutError:
+            LOGGER.warning(f"Closing browser #{generation.number} with {generation.n_in_use} context(s) still in use")
+        await self._close(generation)
+        self._draining.discard(generation)
+
+    async def _monitor(self, max_memory_bytes: int):
+        while True:
+            await asyncio.sleep(_CHECK_INTERVAL_SECONDS)
+            self._memory_bytes = await asyncio.to_thread(browser_memory_bytes)
+            generation = self._current
+            if (
+                generation is not None
+                and not self._draining  # the memory of a browser being drained is still counted
+                and self._memory_bytes is not None
+                and self._memory_bytes > max_memory_bytes
+            ):
+                await self.restart(generation, reason="memory")
+
+    async def new_context(self, **kwargs: Any) -> tuple[BrowserGeneration, BrowserContext]:
+        """Create a new context in the current browser (relaunching it first, if it has disconnected)"""
+        generation = self._current
+        if generation is None:
+            raise RuntimeError("Browser supervisor must be entered before use")
+        if generation.is_disconnected:
+            await self.restart(generation, reason="disconnected")
+            generation = self._current
+            if generation is None or generation.is_disconnected:
+                raise RuntimeError("No browser is available")
+        context = await generation.browser.new_context(**kwargs)
+        generation.n_contexts_created += 1
+        if self.max_contexts is not None and generation.n_contexts_created >= self.max_contexts:
+            self._run_in_background(self.restart(generation, reason="contexts"))
+        return generation, context
+
+    @staticmethod
+    def acquire(generation: BrowserGeneration):
+        """Mark a context of `generation` as in use, so it isn't closed while draining"""
+        generation.n_in_use += 1
+
+    @staticmethod
+    def release(generation: BrowserGeneration):
+        generation.n_in_use -= 1
+        if generation.is_retired and generation.n_in_use == 0:
+            generation.drained.set()
+
+    def get_stats(self) -> BrowserSupervisorStats:
+        generations = [*self._draining, *([] if self._current is None else [self._current])]
+        return BrowserSupervisorStats(
+            generation=self._n_generations,
+            n_contexts_created=(0 if self._current is None else self._current.n_contexts_created),
+            n_contexts_in_use=sum(generation.n_in_use for generation in generations),
+            n_draining=len(self._draining),
+            memory_bytes=self._memory_bytes,
+        )
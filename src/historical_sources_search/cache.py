@@ -0,0 +1,280 @@
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from pathlib import Path
+from types import TracebackType
+from typing import Self
+
+from pydantic import BaseModel, TypeAdapter
+
+from historical_sources_search.search_result import SearchResult
+
+LOGGER = logging.getLogger(__name__)
+
+_RESULTS_ADAPTER = TypeAdapter(list[SearchResult])
+_CLAIM_POLL_SECONDS = 0.25
+
+
+def normalize_query(query: str) -> str:
+    """Queries that only differ in case or whitespace are considered the same query"""
+    return " ".join(query.casefold().split())
+
+
+@dataclass(frozen=True)
+class CacheEntry:
+    results: list[SearchResult]
+    created_at: float
+    """Unix timestamp"""
+    is_complete: bool = True
+    """Whether `results` are all of the search's results, rather than the first ones (if it was stopped early)"""
+
+
+@dataclass(frozen=True)
+class CacheLookup:
+    entry: CacheEntry
+    is_stale: bool
+    """The entry is past its TTL, but can still be served while it is refreshed"""
+
+
+class CacheStats(BaseModel):
+    hits: int
+    stale_hits: int
+    misses: int
+    n_entries_memory: int
+
+
+class _SqliteTier:
+    """On-disk tier of the cache, so entries survive restarts, and are shared by all worker processes"""
+
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            # readers don't block the writer (nor vice versa), so worker processes can share the file
+            self._connection.execute("PRAGMA journal_mode=WAL")
+        with self._lock, self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS search_cache ("
+                "collection_id TEXT NOT NULL, query TEXT NOT NULL, created_at REAL NOT NULL, results TEXT NOT NULL, "
+                "is_complete INTEGER NOT NULL DEFAULT 1, PRIMARY KEY (collection_id, query))"
+            )
+            columns = {row[1] for row in self._connection.execute("PRAGMA table_info(search_cache)")}
+            if "is_complete" not in columns:  # made before partial results were cached
+                self._connection.execute("ALTER TABLE search_cache ADD COLUMN is_complete INTEGER NOT NULL DEFAULT 1")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS search_claims ("
+                "collection_id TEXT NOT NULL, query TEXT NOT NULL, claimed_until REAL NOT NULL, "
+                "PRIMARY KEY (collection_id, query))"
+            )
+
+    def get(self, collection_id: str, query: str) -> CacheEntry | None:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT created_at, results, is_complete FROM search_cache WHERE collection_id = ? AND query = ?",
+                (collection_id, query),
+            ).fetchone()
+        if row is None:
+            return None
+        created_at, results_json, is_complete = row
+        return CacheEntry(
+            results=_RESULTS_ADAPTER.validate_json(results_json),
+            created_at=created_at,
+            is_complete=bool(is_complete),
+        )
+
+    def put(self, collection_id: str, query: str, entry: CacheEntry):
+        results_json = _RESULTS_ADAPTER.dump_json(entry.results).decode()
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO search_cache (collection_id, query, created_at, results, is_complete) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (collection_id, query, entry.created_at, results_json, entry.is_complete),
+            )
+
+    def delete_older_than(self, timestamp: float):
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM search_cache WHERE created_at < ?", (timestamp,))
+
+    def claim(self, collection_id: str, query: str, now: float, claim_seconds: float) -> bool:
+        """Claim the search, unless it's already claimed (atomically, across processes)"""
+        with self._lock, self._connection:
+            cursor = self._connection.execute(
+                "INSERT INTO search_claims (collection_id, query, claimed_until) VALUES (?, ?, ?) "
+                "ON CONFLICT (collection_id, query) DO UPDATE SET claimed_until = excluded.claimed_until "
+                "WHERE search_claims.claimed_until < ?",
+                (collection_id, query, now + claim_seconds, now),
+            )
+            return cursor.rowcount > 0
+
+    def is_claimed(self, collection_id: str, query: str, now: float) -> bool:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT 1 FROM search_claims WHERE collection_id = ? AND query = ? AND claimed_until >= ?",
+                (collection_id, query, now),
+            ).fetchone()
+        return row is not None
+
+    def release(self, collection_id: str, query: str):
+        with self._lock, self._connection:
+            self._connection.execute(
+                "DELETE FROM search_claims WHERE collection_id = ? AND query = ?", (collection_id, query)
+            )
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+class SearchCache:
+    """
+    Caches the full list of results of searching a collection for a (normalized) query,
+    or the first results, if the search was stopped early (e.g. at `MAX_RESULTS_PER_COLLECTION`).
+
+    Entries live in an in-memory LRU (capped at `max_entries`), and optionally also in a SQLite database on disk.
+    An entry is fresh for its collection's TTL, then stale for `stale_seconds` more;
+    stale entries are still served, but should be refreshed in the background (see `refresh_in_background`).
+
+    The database on disk may be shared by several worker processes;
+    each should `claim` a search before running it, so only one of them searches a collection for a query at a time.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_entries: int,
+        ttl_seconds: float,
+        ttl_seconds_by_collection: dict[str, float],
+        stale_seconds: float,
+        sqlite_path: Path | None,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.ttl_seconds_by_collection = ttl_seconds_by_collection
+        self.stale_seconds = stale_seconds
+        self._memory: OrderedDict[tuple[str, str], CacheEntry] = OrderedDict()
+        self._disk = None if sqlite_path is None else _SqliteTier(sqlite_path)
+        if self._disk is not None:
+            max_ttl = max([ttl_seconds, *ttl_seconds_by_collection.values()])
+            self._disk.delete_older_than(time.time() - max_ttl - stale_seconds)
+        self._refreshing: dict[tuple[str, str], asyncio.Task] = {}
+        self._hits = 0
+        self._stale_hits = 0
+        self._misses = 0
+
+    async def __aenter__(self) -> Self:
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ):
+        for task in self._refreshing.values():
+            task.cancel()
+        if self._disk is not None:
+            self._disk.close()
+
+    def _ttl_seconds(self, collection_id: str) -> float:
+        return self.ttl_seconds_by_collection.get(collection_id, self.ttl_seconds)
+
+    def _remember(self, key: tuple[str, str], entry: CacheEntry):
+        if self.max_entries <= 0:
+            return
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)  # least recently used
+
+    async def get(self, collection_id: str, query: str) -> CacheLookup | None:
+        key = (collection_id, normalize_query(query))
+        entry = self._memory.get(key)
+        if entry is not None and self._disk is not None and time.time() - entry.created_at > self._ttl_seconds(key[0]):
+            entry = None  # another process may have refreshed it on disk
+        if entry is not None:
+            self._memory.move_to_end(key)
+        elif self._disk is not None:
+            entry = await asyncio.to_thread(self._disk.get, *key)
+            if entry is not None:
+                self._remember(key, entry)
+
+        age = None if entry is None else (time.time() - entry.created_at)
+        ttl = self._ttl_seconds(collection_id)
+        if entry is None or age is None or age > ttl + self.stale_seconds:
+            self._misses += 1
+            return None
+        if age > ttl:
+            self._stale_hits += 1
+            return CacheLookup(entry=entry, is_stale=True)
+        self._hits += 1
+        return CacheLookup(entry=entry, is_stale=False)
+
+    async def put(self, collection_id: str, query: str, results: list[SearchResult], *, is_complete: bool = True):
+        key = (collection_id, normalize_query(query))
+        entry = CacheEntry(results=results, created_at=time.time(), is_complete=is_complete)
+        self._remember(key, entry)
+        if self._disk is not None:
+            await asyncio.to_thread(self._disk.put, *key, entry)
+
+    async def claim(self, collection_id: str, query: str, claim_seconds: float) -> bool:
+        """
+        Claim the search of a collection for `query`, before running it to fill the cache;
+        `False` if another process has already claimed it (see `wait_for_claim`).
+        The claim lasts for `claim_seconds` (as long as the search may take), in case the process holding it dies.
+        Always succeeds if there is no database on disk to share.
+        """
+        if self._disk is None:
+            return True
+        return await asyncio.to_thread(
+            self._disk.claim, collection_id, normalize_query(query), time.time(), claim_seconds
+        )
+
+    async def release(self, collection_id: str, query: str):
+        """Release a claimed search, once it has been cached (or has failed, or was stopped)"""
+        if self._disk is not None:
+            await asyncio.to_thread(self._disk.release, collection_id, normalize_query(query))
+
+    async def wait_for_claim(self, collection_id: str, query: str, timeout_seconds: float) -> CacheLookup | None:
+        """
+        Wait (for at most `timeout_seconds`) for the process that claimed a search to release it,
+        then look up what it cached (if anything)
+        """
+        if self._disk is not None:
+            key = (collection_id, normalize_query(query))
+            give_up_at = time.monotonic() + timeout_seconds
+            # another process releases the claim, so there's nothing to wait on but the database
+            while time.monotonic() < give_up_at and await asyncio.to_thread(  # noqa: ASYNC110
+                self._disk.is_claimed, *key, time.time()
+            ):
+                await asyncio.sleep(min(_CLAIM_POLL_SECONDS, max(give_up_at - time.monotonic(), 0)))
+        return await self.get(collection_id, query)
+
+    def refresh_in_background(self, collection_id: str, query: str, refresh: Callable[[], Awaitable[None]]):
+        """Run `refresh` in the background, unless a refresh for the same entry is already running"""
+        key = (collection_id, normalize_query(query))
+        if key in self._refreshing:
+            return
+
+        async def _refresh():
+            try:
+                await refresh()
+            except Exception:
+                LOGGER.warning(f"Background refresh of {key} failed", exc_info=True)
+            finally:
+                del self._refreshing[key]
+
+        self._refreshing[key] = asyncio.create_task(_refresh())
+
+    def get_stats(self) -> CacheStats:
+        return CacheStats(
+            hits=self._hits,
+            stale_hits=self._stale_hits,
+            misses=self._misses,
+            n_entries_memory=len(self._memory),
+        )
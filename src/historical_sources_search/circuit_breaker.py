@@ -0,0 +1,168 @@
+import asyncio
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from types import TracebackType
+from typing import Literal, Self
+
+from pydantic import BaseModel
+
+from historical_sources_search.exceptions import CollectionUnavailableError
+
+LOGGER = logging.getLogger(__name__)
+
+type CircuitState = Literal["closed", "open", "half_open"]
+
+
+def is_collection_unavailable(error: BaseException) -> bool:
+    """Whether `error` is (or was raised from) an open circuit, rather than a failed search"""
+    return isinstance(error, CollectionUnavailableError) or isinstance(error.__cause__, CollectionUnavailableError)
+
+
+class CircuitBreakerStats(BaseModel):
+    state: CircuitState
+    consecutive_failures: int
+    n_failures: int
+    n_rejected: int
+    """Searches that failed fast because the circuit wasn't closed"""
+    n_opened: int
+    retry_in_seconds: float | None
+    """Until the next probe, while open"""
+    last_error: str | None
+
+
+class CircuitBreaker:
+    """
+    Tracks the health of one collection.
+    After `failure_threshold` consecutive failures, the circuit opens: searches fail fast
+    (with `CollectionUnavailableError`) rather than each waiting out timeouts against a collection that is down.
+    While open, a probe search is run in the background every so often (half open while it runs):
+    first after `open_seconds`, then twice as long after each failed probe, up to `max_open_seconds`.
+    The circuit closes again as soon as a probe, or any other search, succeeds.
+    """
+
+    def __init__(self, collection_id: str, *, failure_threshold: int, open_seconds: float, max_open_seconds: float):
+        self.collection_id = collection_id
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.max_open_seconds = max_open_seconds
+        self.state: CircuitState = "closed"
+        self._consecutive_failures = 0
+        self._n_failures = 0
+        self._n_rejected = 0
+        self._n_opened = 0
+        self._last_error: str | None = None
+        self._retry_at: float | None = None
+        self._probe_task: asyncio.Task | None = None
+
+    def check(self):
+        """Raises `CollectionUnavailableError` unless the circuit is closed"""
+        if self.state == "closed":
+            return
+        self._n_rejected += 1
+        retry = "soon" if self._retry_at is None else f"in {max(self._retry_at - time.monotonic(), 0):.0f}s"
+        raise CollectionUnavailableError(
+            f"Collection {self.collection_id!r} is unavailable after repeated failures "
+            f"(last: {self._last_error}); checking again {retry}"
+        )
+
+    def record_success(self):
+        self._consecutive_failures = 0
+        if self.state != "closed":
+            LOGGER.info(f"Circuit of collection {self.collection_id!r} closed")
+            self.state = "closed"
+            self._retry_at = None
+            if self._probe_task is not None and self._probe_task is not asyncio.current_task():
+                self._probe_task.cancel()
+            self._probe_task = None
+
+    def record_failure(self, error: Exception, probe: Callable[[], Awaitable[None]]):
+        """Count a failure; if it opens the circuit, start probing the collection with `probe` until it recovers"""
+        self._consecutive_failures += 1
+        self._n_failures += 1
+        self._last_error = str(error) or type(error).__name__
+        if self.state != "closed" or self._consecutive_failures < self.failure_threshold:
+            return
+        LOGGER.warning(
+            f"Circuit of collection {self.collection_id!r} opened after {self._consecutive_failures} "
+            f"consecutive failures (last: {self._last_error})"
+        )
+        self.state = "open"
+        self._n_opened += 1
+        self._retry_at = time.monotonic() + self.open_seconds
+        self._probe_task = asyncio.create_task(self._probe_until_closed(probe))
+
+    async def _probe_until_closed(self, probe: Callable[[], Awaitable[None]]):
+        open_seconds = self.open_seconds
+        while self.state != "closed":
+            self._retry_at = time.monotonic() + open_seconds
+            await asyncio.sleep(open_seconds)
+            self.state = "half_open"
+            self._retry_at = None
+            try:
+                await probe()
+            except Exception as e:  # noqa: BLE001 (whatever went wrong, the collection is still down)
+                self._consecutive_failures += 1
+                self._n_failures += 1
+                self._last_error = str(e) or type(e).__name__
+                self.state = "open"
+                open_seconds = min(open_seconds * 2, self.max_open_seconds)
+                LOGGER.info(
+                    f"Probe of collection {self.collection_id!r} failed ({self._last_error}); "
+                    f"probing again in {open_seconds:.0f}s"
+                )
+            else:
+                self.record_success()
+
+    def cancel_probe(self):
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+
+    def get_stats(self) -> CircuitBreakerStats:
+        return CircuitBreakerStats(
+            state=self.state,
+            consecutive_failures=self._consecutive_failures,
+            n_failures=self._n_failures,
+            n_rejected=self._n_rejected,
+            n_opened=self._n_opened,
+            retry_in_seconds=(None if self._retry_at is None else max(self._retry_at - time.monotonic(), 0)),
+            last_error=self._last_error,
+        )
+
+
+class CircuitBreakers:
+    """A `CircuitBreaker` for each collection (made when first needed), all with the same settings"""
+
+    def __init__(self, *, failure_threshold: int, open_seconds: float, max_open_seconds: float, probe_query: str):
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.max_open_seconds = max_open_seconds
+        self.probe_query = probe_query
+        """Searched for by probes; any query the collections have results for will do"""
+        self._breakers: dict[str, CircuitBreaker] = {}
+
+    async def __aenter__(self) -> Self:
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ):
+        for breaker in self._breakers.values():
+            breaker.cancel_probe()
+
+    def get(self, collection_id: str) -> CircuitBreaker:
+        breaker = self._breakers.get(collection_id)
+        if breaker is None:
+            breaker = self._breakers[collection_id] = CircuitBreaker(
+                collection_id,
+                failure_threshold=self.failure_threshold,
+                open_seconds=self.open_seconds,
+                max_open_seconds=self.max_open_seconds,
+            )
+        return breaker
+
+    def get_stats(self) -> dict[str, CircuitBreakerStats]:
+        return {collection_id: breaker.get_stats() for collection_id, breaker in self._breakers.items()}
@@ -0,0 +1,159 @@
+import asyncio
+import logging
+from collections.abc import AsyncGenerator, AsyncIterable
+from types import TracebackType
+from typing import Self
+
+from pydantic import BaseModel
+
+from historical_sources_search.cache import normalize_query
+from historical_sources_search.collections.base import CollectionBase
+from historical_sources_search.exceptions import CollectionSearchError, CollectionUnavailableError
+from historical_sources_search.search_result import SearchResult
+
+LOGGER = logging.getLogger(__name__)
+
+
+class CoalescerStats(BaseModel):
+    n_runs_in_flight: int
+    n_subscriptions_joined: int
+    """How many searches were served by joining a run that was already in flight"""
+
+
+class _SharedRun:
+    """A single search of a single collection, whose results are shared by any number of subscribers"""
+
+    def __init__(self, read_ahead: int):
+        self.read_ahead = read_ahead
+        self.results: list[SearchResult] = []
+        self.done = False
+        self.error: Exception | None = None
+        self.n_subscribers = 0
+        self.n_wanted = 0
+        """How many results the furthest-along subscriber has asked for"""
+        self.changed = asyncio.Condition()
+        self.task: asyncio.Task | None = None
+
+    def _is_fetch_due(self) -> bool:
+        # once `read_ahead` results ahead, wait until subscribers are within half of that,
+        # so results are fetched a few at a time rather than each only once asked for
+        return len(self.results) - self.n_wanted < (self.read_ahead + 1) // 2
+
+    async def want(self, n_wanted: int):
+        """A subscriber has asked for `n_wanted` results"""
+        if n_wanted <= self.n_wanted:
+            return
+        async with self.changed:
+            self.n_wanted = max(self.n_wanted, n_wanted)
+            if self._is_fetch_due():
+                self.changed.notify_all()
+
+    async def run(self, collection: CollectionBase, query: str):
+        collection_id = collection.collection_info.id
+        results = collection.search(query)
+        try:
+            try:
+                async for result in results:
+                    async with self.changed:
+                        self.results.append(result)
+                        self.changed.notify_all()
+                        if len(self.results) - self.n_wanted >= self.read_ahead:
+                            # don't fetch further (e.g. turn to the next page) until some subscriber wants more
+                            await self.changed.wait_for(self._is_fetch_due)
+            finally:
+                if isinstance(results, AsyncGenerator):
+                    await results.aclose()  # now, even if cancelled, e.g. to release its cache claim
+        except Exception as e:
+            LOGGER.warning(
+                f"Shared search of {collection_id!r} failed for query {query!r}",
+                exc_info=not isinstance(e, CollectionUnavailableError),  # its message says it all
+            )
+            self.error = e
+        finally:
+            self.done = True
+            async with self.changed:
+                self.changed.notify_all()
+
+
+class SearchCoalescer:
+    """
+    Makes concurrent searches of the same collection for the same (normalized) query share one underlying search.
+    Each subscriber gets every result, including ones found before it subscribed.
+    A shared search only fetches up to `read_ahead` results beyond what its furthest-along subscriber has asked for
+    (so a subscriber rarely waits for the next result, nor does the search for the subscriber).
+    A shared search is cancelled if all of its subscribers leave before it finishes.
+    """
+
+    def __init__(self, *, read_ahead: int):
+        self.read_ahead = read_ahead
+        self._runs: dict[tuple[str, str], _SharedRun] = {}
+        self._n_subscriptions_joined = 0
+
+    async def __aenter__(self) -> Self:
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ):
+        for run in self._runs.values():
+            if run.task is not None:
+                run.task.cancel()
+
+    def _start(self, key: tuple[str, str], collection: CollectionBase, query: str) -> _SharedRun:
+        shared_run = _SharedRun(self.read_ahead)
+
+        async def _run():
+            try:
+                await shared_run.run(collection, query)
+            finally:
+                # later searches start over (and likely hit the cache), rather than joining a finished run
+                if self._runs.get(key) is shared_run:
+                    del self._runs[key]
+
+        shared_run.task = asyncio.create_task(_run())
+        self._runs[key] = shared_run
+        return shared_run
+
+    async def search(self, collection: CollectionBase, query: str) -> AsyncIterable[SearchResult]:
+        key = (collection.collection_info.id, normalize_query(query))
+        shared_run = self._runs.get(key)
+        if shared_run is None:
+            shared_run = self._start(key, collection, query)
+        else:
+            self._n_subscriptions_joined += 1
+            LOGGER.debug(f"Joining in-flight search of {key}")
+
+        shared_run.n_subscribers += 1
+        try:
+            i = 0
+            while True:
+                while i < len(shared_run.results):
+                    yield shared_run.results[i]
+                    i += 1
+                    await shared_run.want(i + 1)
+                if shared_run.done and i >= len(shared_run.results):
+                    break
+                async with shared_run.changed:
+                    shared_run.n_wanted = max(shared_run.n_wanted, i + 1)
+                    shared_run.changed.notify_all()
+                    await shared_run.changed.wait_for(lambda: shared_run.done or len(shared_run.results) > i)  # noqa: B023
+        finally:
+            shared_run.n_subscribers -= 1
+            if shared_run.n_subscribers == 0 and not shared_run.done and shared_run.task is not None:
+                LOGGER.debug(f"Cancelling search of {key}, which has no more subscribers")
+                shared_run.task.cancel()
+                if self._runs.get(key) is shared_run:
+                    del self._runs[key]
+
+        if shared_run.error is not None:
+            error = shared_run.error
+            raise CollectionSearchError(str(error) or type(error).__name__) from error
+
+    def get_stats(self) -> CoalescerStats:
+        return CoalescerStats(
+            n_runs_in_flight=len(self._runs),
+            n_subscriptions_joined=self._n_subscriptions_joined,
+        )
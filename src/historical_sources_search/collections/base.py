@@ -1,9 +1,41 @@
 from abc import ABC, abstractmethod
 from collections.abc import AsyncIterable
+from dataclasses import dataclass
+from urllib.parse import urljoin
 
+from historical_sources_search.exceptions import MissingInformationError
 from historical_sources_search.search_result import CollectionInfo, SearchResult
 
 
+@dataclass
+class RawSearchResult:
+    """
+    The fields of a single search result, as they were scraped.
+    URLs may be relative, and text may have surrounding whitespace.
+    """
+
+    url: str | None
+    title: str | None
+    detail: str | None
+    image_src: str | None
+
+
+@dataclass(frozen=True)
+class ResultSelectors:
+    """CSS selectors that locate the fields of search results on a page of results"""
+
+    result: str
+    """Each element matching this (relative to the whole page) contains a single result"""
+    url: str
+    """An element (relative to the result's element) whose `href` is the result's URL"""
+    title: str
+    """An element (relative to the result's element) whose text is the result's title"""
+    detail: str | None
+    """An element (relative to the result's element) whose text is the result's detail, if the collection has any"""
+    image: str | None
+    """An element (relative to the result's element) whose `src` is the result's image, if the collection has any"""
+
+
 class CollectionBase(ABC):
     def __init__(self, collection_info: CollectionInfo):
         super().__init__()
@@ -12,3 +44,23 @@ class CollectionBase(ABC):
     @abstractmethod
     def search(self, query: str) -> AsyncIterable[SearchResult]:
         raise NotImplementedError("Must be implemented by child class")
+
+    async def warm_up(self):  # noqa: B027 (intentionally empty, not abstract)
+        """Prepare any resources ahead of the first search, so that it is faster"""
+
+    def _build_result(self, raw_result: RawSearchResult, page_url: str) -> SearchResult:
+        """
+        Clean up scraped fields into a `SearchResult`, resolving relative URLs against `page_url`.
+        Raises `MissingInformationError` if a required field is missing.
+        """
+        if not raw_result.url:
+            raise MissingInformationError(f"Search result did not have a URL: {raw_result}")
+        if raw_result.title is None:
+            raise MissingInformationError(f"Search result did not have a title: {raw_result}")
+        return SearchResult(
+            url=urljoin(page_url, raw_result.url),
+            title=raw_result.title.strip(),
+            detail=(None if raw_result.detail is None else raw_result.detail.strip()),
+            image_src=(None if not raw_result.image_src else urljoin(page_url, raw_result.image_src)),
+            provided_by_collection=self.collection_info,
+        )
@@ -1,21 +1,68 @@
+import asyncio
 import logging
 from abc import abstractmethod
-from collections.abc import AsyncIterable
+from collections import deque
+from collections.abc import AsyncGenerator, AsyncIterable
+from contextlib import AsyncExitStack, aclosing, suppress
 from typing import override
-from urllib.parse import urljoin
+from urllib.parse import urlsplit
 
-from playwright.async_api import Browser, Locator, Page, expect as pw_expect
+from playwright.async_api import Locator, Page, Response, expect as pw_expect
 
-from historical_sources_search.collections.base import CollectionBase
-from historical_sources_search.exceptions import MissingInformationError
+from historical_sources_search.browser_pool import BrowserContextPool
+from historical_sources_search.collections.base import CollectionBase, RawSearchResult, ResultSelectors
+from historical_sources_search.env import Env
+from historical_sources_search.exceptions import BrowserRestartedError, MissingInformationError, NavigationError
+from historical_sources_search.metrics import SCRAPE_STEP_SECONDS
+from historical_sources_search.rate_limit import HostRateLimiter
+from historical_sources_search.resource_blocking import ResourcePolicy
 from historical_sources_search.search_result import CollectionInfo, SearchResult
+from historical_sources_search.timeouts import AdaptiveTimeouts
+
+# runs in the browser; extracts the fields of all (visible) results on the page in a single call
+_JS_EXTRACT_RESULTS = """
+(elements, selectors) => elements
+  .filter((element) => element.checkVisibility())
+  .map((element) => {
+    const find = (selector) => (selector === null ? null : element.querySelector(selector))
+    return {
+      url: find(selectors.url)?.getAttribute("href") ?? null,
+      title: find(selectors.title)?.innerText ?? null,
+      detail: find(selectors.detail)?.innerText ?? null,
+      image_src: find(selectors.image)?.getAttribute("src") ?? null,
+    }
+  })
+"""
+_MAX_ATTEMPTS = 2
+"""Searches are retried (on a fresh browser) if the browser is lost partway"""
 
 
 class CollectionBaseBrowserPaging(CollectionBase):
-    def __init__(self, browser: Browser, collection_info: CollectionInfo, logger: logging.Logger | None):
+    def __init__(
+        self,
+        browser_pool: BrowserContextPool,
+        rate_limiter: HostRateLimiter,
+        collection_info: CollectionInfo,
+        logger: logging.Logger | None,
+    ):
         super().__init__(collection_info=collection_info)
-        self.browser = browser
+        self.browser_pool = browser_pool
+        self.rate_limiter = rate_limiter
+        self.host = urlsplit(collection_info.url).hostname or ""
         self.logger = logger or logging.getLogger(__name__)
+        self.timeouts = AdaptiveTimeouts.from_env(collection_info.id)
+        self.resource_policy = ResourcePolicy.from_env(collection_info.id)
+        """Which requests this collection's pages don't need to make"""
+
+    async def _prepare_context(self, page: Page):
+        """
+        Prepare a new browser context (through its only page) before it is used for any searches.
+        By default, this loads the collection's home page, to get its cookies and fill the cache.
+        """
+        await self.rate_limiter.acquire(self.host)
+        response = await page.goto(self.collection_info.url)
+        if response is not None and not response.ok:
+            raise NavigationError(f"Navigation to `{self.collection_info.url}` failed with status {response.status}")
 
     @abstractmethod
     async def _enter_query(self, page: Page, query: str):
@@ -31,37 +78,8 @@ class CollectionBaseBrowserPaging(CollectionBase):
         raise NotImplementedError("Must be implemented by child class")
 
     @abstractmethod
-    def _get_locator_result_by_index(self, page: Page, index: int) -> Locator:
-        """
-        Construct a playwright locator to an element containing all the info for a single result on the current page.
-        Parameter `index` indicates which result from many, with `index=0` indicating the first result.
-        """
-        raise NotImplementedError("Must be implemented by child class")
-
-    @abstractmethod
-    async def _get_result_url(self, page: Page, result_locator: Locator) -> str:
-        """
-        Get the URL of a single result (pointed to by `result_locator`).
-        It's ok if the URL is relative.
-        """
-        raise NotImplementedError("Must be implemented by child class")
-
-    @abstractmethod
-    async def _get_result_title(self, page: Page, result_locator: Locator) -> str:
-        """Get the title of a single result (pointed to by `result_locator`)"""
-        raise NotImplementedError("Must be implemented by child class")
-
-    @abstractmethod
-    async def _get_result_detail(self, page: Page, result_locator: Locator) -> str | None:
-        """Get the detail of a single result (pointed to by `result_locator`), if any"""
-        raise NotImplementedError("Must be implemented by child class")
-
-    @abstractmethod
-    async def _get_result_image_src(self, page: Page, result_locator: Locator) -> str | None:
-        """
-        Get the source URL of a single result (pointed to by `result_locator`), if any.
-        It's ok if the URL is relative.
-        """
+    def _get_result_selectors(self) -> ResultSelectors:
+        """Declare where to find each result, and each field of a result, on a page of results"""
         raise NotImplementedError("Must be implemented by child class")
 
     @abstractmethod
@@ -71,71 +89,214 @@ class CollectionBaseBrowserPaging(CollectionBase):
         Parameter `current_page_index` indicates the current page displayed,
         with `current_page_index=0` indicating the first page of results is currently displayed.
 
-        NOTE: this method should do its best to ensure the new page is fully loaded.
+        NOTE: this method must ensure the new page's results are loaded,
+        since they are extracted immediately after this method returns.
 
         If there are no more pages of results, return `False`.
         If the next page of results was successfully loaded, return `True`.
+        Waits should take their timeouts from `self.timeouts` ("find_next_page" and "advance_page"),
+        so they adapt to how long the collection takes.
         """
         raise NotImplementedError("Must be implemented by child class")
 
+    async def _get_n_pages(self, page: Page) -> int | None:  # noqa: ARG002 (only used by overrides)
+        """
+        Opt into loading pages of results in parallel, by their URLs (see `_get_page_url`):
+        read how many pages of results there are (at least) from the first page.
+        By default, this returns `None`, and pages are turned through one by one with `_advance_page`.
+        Either way, `_advance_page` is used to carry on from the last page, in case there are more.
+        """
+        return None
+
+    def _get_page_url(self, query: str, page_index: int) -> str:
+        """
+        Construct the URL of a page of results for the query, with `page_index=0` indicating the first page.
+        Only used (and must be implemented) if `_get_n_pages` is.
+        """
+        raise NotImplementedError("Must be implemented by child class if `_get_n_pages` is")
+
+    async def _extract_results(self, page: Page, selectors: ResultSelectors) -> list[RawSearchResult]:
+        """Extract the fields of all results on the current page, using a single call into the browser"""
+        extracted: list[dict[str, str | None]] = await page.locator(selectors.result).evaluate_all(
+            _JS_EXTRACT_RESULTS,
+            {"url": selectors.url, "title": selectors.title, "detail": selectors.detail, "image": selectors.image},
+        )
+        return [RawSearchResult(**fields) for fields in extracted]
+
+    async def _prepare_context_timed(self, page: Page):
+        with SCRAPE_STEP_SECONDS.time(collection=self.collection_info.id, step="prepare_context"):
+            await self._prepare_context(page)
+
     @override
-    async def search(self, query: str) -> AsyncIterable[SearchResult]:
-        async with (
-            await self.browser.new_context() as browser_context,
-            await browser_context.new_page() as page,
-        ):
-            await self._enter_query(page, query)
+    async def warm_up(self):
+        await self.browser_pool.prewarm(self.collection_info.id, self._prepare_context_timed, self.resource_policy)
 
-            locator_first_result = self._get_locator_result_by_index(page, 0)
-            locator_no_results = self._get_locator_no_results(page)
+    def _report_response(self, response: Response):
+        """Let the rate limiter know how the host responded to a page load"""
+        if response.request.resource_type == "document":
+            host = urlsplit(response.url).hostname
+            if host:
+                self.rate_limiter.report(host, response.status, response.headers.get("retry-after"))
 
-            # wait for page to load either the first result or a "no result" element
-            await pw_expect(locator_first_result.or_(locator_no_results).first).to_be_visible(timeout=30_000)
-            if await locator_no_results.is_visible():
-                self.logger.info(f"No results found for query {query!r}")
+    @override
+    async def search(self, query: str) -> AsyncIterable[SearchResult]:
+        n_yielded = 0
+        for attempt in range(1, _MAX_ATTEMPTS + 1):
+            try:
+                async with self.browser_pool.lease(
+                    self.collection_info.id, self._prepare_context_timed, self.resource_policy
+                ) as page:
+                    page.on("response", self._report_response)
+                    try:
+                        n_seen = 0
+                        async for result in self._search_page(page, query):
+                            n_seen += 1
+                            if n_seen > n_yielded:  # skip what an earlier attempt already yielded
+                                yield result
+                                n_yielded += 1
+                    finally:
+                        page.remove_listener("response", self._report_response)
+            except BrowserRestartedError:
+                if attempt == _MAX_ATTEMPTS:
+                    raise
+                self.logger.warning(
+                    f"Browser was lost while searching for query {query!r}; retrying after {n_yielded} result(s)",
+                    exc_info=True,
+                )
+            else:
                 return
 
-            page_index = 0
-            while True:  # turn through all pages
-                self.logger.debug(f"Page number {page_index + 1} of query {query!r}")
-                page_url = page.url
+    def _build_page_results(
+        self, raw_results: list[RawSearchResult], page_url: str, page_index: int
+    ) -> list[SearchResult]:
+        results = []
+        for i, raw_result in enumerate(raw_results):
+            try:
+                results.append(self._build_result(raw_result, page_url))
+            except MissingInformationError:
+                self.logger.warning(f"Skipping {page_index=} {i=} because of missing information", exc_info=True)
+        return results
 
-                i = 0
-                while True:  # get all results from this page
-                    result_locator = self._get_locator_result_by_index(page, i)
-                    try:
-                        await pw_expect(result_locator).to_be_visible(timeout=500)
-                    except AssertionError:
-                        break  # no more results on this page
+    async def _goto_results(self, tab: Page, page_url: str, selectors: ResultSelectors):
+        """Navigate to a page of results by its URL, and wait for its results to show"""
+        await self.rate_limiter.acquire(self.host)
+        with SCRAPE_STEP_SECONDS.time(collection=self.collection_info.id, step="load_page"):
+            response = await tab.goto(page_url)
+            if response is not None and not response.ok:
+                raise NavigationError(f"Navigation to `{page_url}` failed with status {response.status}")
+            with self.timeouts.wait("load_page") as timeout_ms:
+                await pw_expect(tab.locator(selectors.result).first).to_be_visible(timeout=timeout_ms)
 
-                    try:
-                        result_url = await self._get_result_url(page, result_locator)
-                        result_url = urljoin(page_url, result_url)
-                        result_title = await self._get_result_title(page, result_locator)
-                        result_title = result_title.strip()
-                        result_detail = await self._get_result_detail(page, result_locator)
-                        if result_detail is not None:
-                            result_detail = result_detail.strip()
-                        result_image_src = await self._get_result_image_src(page, result_locator)
-                        if result_image_src is not None:
-                            result_image_src = urljoin(page_url, result_image_src)
-                    except MissingInformationError:
-                        self.logger.warning(
-                            f"Skipping {page_index=} {i=} because of missing information",
-                            exc_info=True,
-                        )
-                        # don't forget to increment `i` even though we're skipping this one
-                    else:
-                        yield SearchResult(
-                            url=result_url,
-                            title=result_title,
-                            detail=result_detail,
-                            image_src=result_image_src,
-                            provided_by_collection=self.collection_info,
-                        )
-                    i += 1
+    async def _load_page(
+        self, tab: Page, query: str, page_index: int, selectors: ResultSelectors
+    ) -> tuple[str, list[SearchResult]]:
+        """Load a page of results by its URL (see `_get_page_url`), and extract its results; also returns its URL"""
+        await self._goto_results(tab, self._get_page_url(query, page_index), selectors)
+        with SCRAPE_STEP_SECONDS.time(collection=self.collection_info.id, step="extract"):
+            raw_results = await self._extract_results(tab, selectors)
+        return tab.url, self._build_page_results(raw_results, tab.url, page_index)
+
+    async def _load_pages_in_parallel(
+        self, page: Page, query: str, page_indexes: range, selectors: ResultSelectors
+    ) -> AsyncGenerator[tuple[str, int, list[SearchResult]]]:
+        """
+        Load pages of results by their URLs, several at once (in `page` and extra tabs of its context),
+        yielding each page's results in page order, along with its URL.
+        The extra tabs are closed once done, and `page` may be left on any of the pages.
+        At most the collection's fan-out many pages are loaded (or waiting to be yielded) at once,
+        and each extra tab takes a page from the scheduler, so only as many are opened as it has to spare.
+        """
+        env = Env.get()
+        collection_id = self.collection_info.id
+        fan_out = env.browser_page_fan_out_by_collection.get(collection_id, env.browser_page_fan_out)
+        idle_tabs = [page]
+        extra_tabs: list[Page] = []
+
+        async def _take_tab(stack: AsyncExitStack) -> Page | None:
+            """An idle tab, or a new one if the scheduler has a page to spare for it (held until it's closed)"""
+            if idle_tabs:
+                return idle_tabs.pop()
+            if len(extra_tabs) >= fan_out - 1:
+                return None
+            if not await stack.enter_async_context(self.browser_pool.scheduler.slot_if_free(collection_id)):
+                return None
+            tab = await page.context.new_page()
+            stack.push_async_callback(_close_tab, tab)
+            tab.on("response", self._report_response)
+            extra_tabs.append(tab)
+            return tab
+
+        async def _close_tab(tab: Page):
+            with suppress(Exception):
+                await tab.close()
+
+        async def _load(tab: Page, page_index: int) -> tuple[str, int, list[SearchResult]]:
+            try:
+                page_url, results = await self._load_page(tab, query, page_index, selectors)
+                return page_url, page_index, results
+            finally:
+                idle_tabs.append(tab)
+
+        pending: deque[asyncio.Task[tuple[str, int, list[SearchResult]]]] = deque()
+        page_indexes_left = deque(page_indexes)
+        async with AsyncExitStack() as stack:
+            try:
+                while True:
+                    while page_indexes_left and len(pending) < fan_out and (tab := await _take_tab(stack)) is not None:
+                        pending.append(asyncio.create_task(_load(tab, page_indexes_left.popleft())))
+                    if not pending:
+                        break
+                    yield await pending.popleft()
+            finally:
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+
+    async def _search_page(self, page: Page, query: str) -> AsyncIterable[SearchResult]:
+        collection_id = self.collection_info.id
+        await self.rate_limiter.acquire(self.host)
+        with SCRAPE_STEP_SECONDS.time(collection=collection_id, step="enter_query"):
+            await self._enter_query(page, query)
+
+        selectors = self._get_result_selectors()
+        locator_first_result = page.locator(selectors.result).first
+        locator_no_results = self._get_locator_no_results(page)
+
+        # wait for page to load either the first result or a "no result" element
+        with (
+            SCRAPE_STEP_SECONDS.time(collection=collection_id, step="wait_for_results"),
+            self.timeouts.wait("wait_for_results") as timeout_ms,
+        ):
+            await pw_expect(locator_first_result.or_(locator_no_results).first).to_be_visible(timeout=timeout_ms)
+        if await locator_no_results.is_visible():
+            self.logger.info(f"No results found for query {query!r}")
+            return
+
+        page_index = 0
+        while True:  # turn through all pages
+            self.logger.debug(f"Page number {page_index + 1} of query {query!r}")
+            with SCRAPE_STEP_SECONDS.time(collection=collection_id, step="extract"):
+                raw_results = await self._extract_results(page, selectors)
+            for result in self._build_page_results(raw_results, page.url, page_index):
+                yield result
+
+            if page_index == 0 and (n_pages := await self._get_n_pages(page)) is not None and n_pages > 1:
+                self.logger.debug(f"Loading pages 2 to {n_pages} of query {query!r} in parallel")
+                last_page_url = None
+                # closed right away if the search stops early, so its extra tabs don't outlive the lease
+                async with aclosing(self._load_pages_in_parallel(page, query, range(1, n_pages), selectors)) as pages:
+                    async for loaded_page_url, loaded_page_index, results in pages:
+                        for result in results:
+                            yield result
+                        last_page_url, page_index = loaded_page_url, loaded_page_index
+                # in case the first page didn't show all pages, carry on from the last one,
+                # in `page` (since the tab that loaded it may have been closed)
+                if last_page_url is not None and page.url != last_page_url:
+                    await self._goto_results(page, last_page_url, selectors)
 
+            await self.rate_limiter.acquire(self.host)
+            with SCRAPE_STEP_SECONDS.time(collection=collection_id, step="advance_page"):
                 advance_success = await self._advance_page(page, page_index)
-                if not advance_success:
-                    break
-                page_index += 1
+            if not advance_success:
+                break
+            page_index += 1
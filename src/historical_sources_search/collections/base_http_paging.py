@@ -0,0 +1,106 @@
+import logging
+from abc import abstractmethod
+from collections.abc import AsyncIterable
+from dataclasses import dataclass
+from typing import override
+
+import httpx
+from selectolax.lexbor import LexborHTMLParser, LexborNode
+
+from historical_sources_search.collections.base import CollectionBase, RawSearchResult, ResultSelectors
+from historical_sources_search.exceptions import MissingInformationError, NavigationError
+from historical_sources_search.metrics import SCRAPE_STEP_SECONDS
+from historical_sources_search.search_result import CollectionInfo, SearchResult
+
+
+@dataclass
+class HttpPage:
+    """The contents of a single page of search results"""
+
+    results: list[RawSearchResult]
+    next_page_url: str | None
+
+
+def html_text(node: LexborNode | None) -> str | None:
+    """Get the text content of an HTML node (roughly like `innerText`), or `None` if there is no node"""
+    if node is None:
+        return None
+    return node.text(separator=" ", strip=True)
+
+
+def html_attribute(node: LexborNode | None, name: str) -> str | None:
+    """Get the value of an attribute of an HTML node, or `None` if there is no node or attribute"""
+    if node is None:
+        return None
+    return node.attributes.get(name)
+
+
+def extract_results_html(tree: LexborHTMLParser, selectors: ResultSelectors) -> list[RawSearchResult]:
+    """Extract the fields of all results in a page of results"""
+
+    def _find(node: LexborNode, selector: str | None) -> LexborNode | None:
+        return None if selector is None else node.css_first(selector)
+
+    return [
+        RawSearchResult(
+            url=html_attribute(_find(node, selectors.url), "href"),
+            title=html_text(_find(node, selectors.title)),
+            detail=html_text(_find(node, selectors.detail)),
+            image_src=html_attribute(_find(node, selectors.image), "src"),
+        )
+        for node in tree.css(selectors.result)
+    ]
+
+
+class CollectionBaseHttpPaging(CollectionBase):
+    """
+    Searches a collection by fetching pages of results directly over HTTP, without a browser.
+    Only works for collections whose search results are rendered server-side (or available as JSON).
+    """
+
+    def __init__(self, httpx_client: httpx.AsyncClient, collection_info: CollectionInfo, logger: logging.Logger | None):
+        super().__init__(collection_info=collection_info)
+        self.httpx_client = httpx_client
+        self.logger = logger or logging.getLogger(__name__)
+
+    @abstractmethod
+    def _get_first_page_url(self, query: str) -> str:
+        """Construct the URL of the first page of results for the query"""
+        raise NotImplementedError("Must be implemented by child class")
+
+    @abstractmethod
+    def _parse_page(self, response: httpx.Response, page_index: int) -> HttpPage:
+        """
+        Parse a fetched page of search results.
+        Parameter `page_index` indicates which page was fetched, with `page_index=0` indicating the first page.
+
+        If the page doesn't look like a page of results (not even a "no results" page),
+        raise `MissingInformationError` rather than returning an empty page.
+        """
+        raise NotImplementedError("Must be implemented by child class")
+
+    @override
+    async def search(self, query: str) -> AsyncIterable[SearchResult]:
+        page_url: str | None = self._get_first_page_url(query)
+        page_index = 0
+        while page_url is not None:  # turn through all pages
+            self.logger.debug(f"Page number {page_index + 1} of query {query!r}")
+            with SCRAPE_STEP_SECONDS.time(collection=self.collection_info.id, step="fetch_page"):
+                response = await self.httpx_client.get(page_url)
+            if not response.is_success:
+                raise NavigationError(f"Fetching `{page_url}` failed with status {response.status_code}")
+            with SCRAPE_STEP_SECONDS.time(collection=self.collection_info.id, step="parse_page"):
+                page = self._parse_page(response, page_index)
+            if page_index == 0 and not page.results:
+                self.logger.info(f"No results found for query {query!r}")
+
+            for i, raw_result in enumerate(page.results):
+                try:
+                    result = self._build_result(raw_result, str(response.url))
+                except MissingInformationError:
+                    self.logger.warning(f"Skipping {page_index=} {i=} because of missing information", exc_info=True)
+                else:
+                    yield result
+
+            page_url = page.next_page_url
+            page_index += 1
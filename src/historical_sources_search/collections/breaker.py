@@ -0,0 +1,96 @@
+import asyncio
+import logging
+import time
+from collections.abc import AsyncGenerator, AsyncIterable
+from typing import override
+
+import httpx
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+from historical_sources_search.circuit_breaker import CircuitBreaker
+from historical_sources_search.collections.base import CollectionBase
+from historical_sources_search.env import Env
+from historical_sources_search.exceptions import NavigationError, PageTimeoutError
+from historical_sources_search.search_result import SearchResult
+
+_UPSTREAM_FAILURES = (
+    NavigationError,
+    PageTimeoutError,
+    PlaywrightTimeoutError,
+    TimeoutError,
+    httpx.HTTPError,
+)
+"""Failures that suggest the collection itself is down (rather than e.g. the browser being replaced)"""
+_DEADLINE_SLACK = 0.1
+"""
+Of a deadline, the part a search may spend before it gets to the collection (e.g. checking the cache),
+so a collection that gets cancelled at the deadline may have been waited on for a little less than it
+"""
+
+
+class CollectionWithCircuitBreaker(CollectionBase):
+    """
+    Searches a collection only while its circuit breaker is closed, failing fast otherwise.
+    While the circuit is open, it's probed with searches for `probe_query` until one succeeds.
+    A search cancelled (e.g. at its deadline) after waiting as long as the collection's deadline for a result
+    counts as a failure, so a collection that hangs trips the breaker just like one that fails.
+    """
+
+    def __init__(
+        self,
+        collection: CollectionBase,
+        breaker: CircuitBreaker,
+        probe_query: str,
+        logger: logging.Logger | None = None,
+    ):
+        super().__init__(collection_info=collection.collection_info)
+        self.collection = collection
+        self.breaker = breaker
+        self.probe_query = probe_query
+        self.logger = logger or logging.getLogger(__name__)
+
+    def _get_deadline_seconds(self) -> float:
+        env = Env.get()
+        return min(
+            env.search_deadline_seconds,
+            env.collection_deadline_seconds_by_collection.get(self.collection_info.id, env.collection_deadline_seconds),
+        )
+
+    async def _probe(self):
+        results = self.collection.search(self.probe_query)
+        try:
+            # so a probe that hangs fails, rather than leaving the circuit half open
+            async with asyncio.timeout(self._get_deadline_seconds()):
+                async for _ in results:
+                    break  # getting any results at all is enough
+        finally:
+            if isinstance(results, AsyncGenerator):
+                await results.aclose()
+
+    @override
+    async def warm_up(self):
+        await self.collection.warm_up()
+
+    @override
+    async def search(self, query: str) -> AsyncIterable[SearchResult]:
+        self.breaker.check()
+        n_results = 0
+        waiting_since = time.monotonic()
+        try:
+            async for result in self.collection.search(query):
+                yield result
+                n_results += 1
+                waiting_since = time.monotonic()
+        except _UPSTREAM_FAILURES as e:
+            self.breaker.record_failure(e, self._probe)
+            raise
+        except asyncio.CancelledError:
+            waited_seconds = time.monotonic() - waiting_since
+            if waited_seconds >= (1 - _DEADLINE_SLACK) * self._get_deadline_seconds():
+                self.breaker.record_failure(TimeoutError(f"No results within {waited_seconds:.0f}s"), self._probe)
+            raise
+        except GeneratorExit:
+            if n_results > 0:  # stopped early, but the collection was answering
+                self.breaker.record_success()
+            raise
+        self.breaker.record_success()
@@ -0,0 +1,107 @@
+import logging
+from collections.abc import AsyncGenerator, AsyncIterable
+from typing import override
+
+from historical_sources_search.cache import SearchCache
+from historical_sources_search.collections.base import CollectionBase
+from historical_sources_search.env import Env
+from historical_sources_search.search_result import SearchResult
+
+
+class CollectionCached(CollectionBase):
+    """
+    Serves a collection's results from the cache when possible.
+    Stale results are served immediately while the collection is searched again in the background.
+    Searches that are stopped early (e.g. at `MAX_RESULTS_PER_COLLECTION`) cache the results found so far,
+    as partial; those are served first, and the search continues live past them only if more are wanted.
+    If another process is already searching the collection for the same query, waits for it to cache the results,
+    for up to half the collection's deadline, then searches it here too.
+    """
+
+    def __init__(self, collection: CollectionBase, cache: SearchCache, logger: logging.Logger | None = None):
+        super().__init__(collection_info=collection.collection_info)
+        self.collection = collection
+        self.cache = cache
+        self.logger = logger or logging.getLogger(__name__)
+
+    async def _search_and_cache(self, query: str, cached_results: list[SearchResult]) -> AsyncGenerator[SearchResult]:
+        """
+        Search the collection, continuing past the `cached_results` (its first results) if any, and cache the results;
+        those found so far if stopped early
+        """
+        for result in cached_results:
+            yield result
+        results = list(cached_results)
+        n_skip = len(cached_results)
+        is_stopped_early = False
+        live_results = self.collection.search(query)
+        try:
+            async for result in live_results:
+                if n_skip > 0:  # already yielded from the cache
+                    n_skip -= 1
+                    continue
+                results.append(result)
+                yield result
+        except GeneratorExit:
+            is_stopped_early = True
+            raise
+        finally:
+            if isinstance(live_results, AsyncGenerator):
+                await live_results.aclose()  # e.g. to give back its browser page before caching
+            if is_stopped_early and len(results) > len(cached_results):
+                await self.cache.put(self.collection_info.id, query, results, is_complete=False)
+        await self.cache.put(self.collection_info.id, query, results)
+
+    def _get_deadline_seconds(self) -> float:
+        env = Env.get()
+        return env.collection_deadline_seconds_by_collection.get(
+            self.collection_info.id, env.collection_deadline_seconds
+        )
+
+    async def _refresh(self, query: str):
+        if not await self.cache.claim(self.collection_info.id, query, self._get_deadline_seconds()):
+            return  # another process is already refreshing it
+        try:
+            async for _ in self._search_and_cache(query, []):
+                pass
+        finally:
+            await self.cache.release(self.collection_info.id, query)
+        self.logger.debug(f"Refreshed cached results of {self.collection_info.id!r} for query {query!r}")
+
+    @override
+    async def warm_up(self):
+        await self.collection.warm_up()
+
+    @override
+    async def search(self, query: str) -> AsyncIterable[SearchResult]:
+        collection_id = self.collection_info.id
+        deadline_seconds = self._get_deadline_seconds()
+        lookup = await self.cache.get(collection_id, query)
+        is_claimed = False
+        if lookup is None:
+            is_claimed = await self.cache.claim(collection_id, query, deadline_seconds)
+            if not is_claimed:
+                self.logger.debug(f"Waiting for another process to search {collection_id!r} for query {query!r}")
+                lookup = await self.cache.wait_for_claim(collection_id, query, timeout_seconds=(deadline_seconds / 2))
+                if lookup is None:
+                    self.logger.info(
+                        f"Another process hasn't cached {collection_id!r} for query {query!r}; searching it here"
+                    )
+                    is_claimed = await self.cache.claim(collection_id, query, deadline_seconds)
+        if lookup is not None and lookup.entry.is_complete:
+            if lookup.is_stale:
+                self.cache.refresh_in_background(collection_id, query, lambda: self._refresh(query))
+            for result in lookup.entry.results:
+                yield result
+            return
+
+        if lookup is not None:  # only the first results were cached; continue the search past them if need be
+            is_claimed = await self.cache.claim(collection_id, query, deadline_seconds)
+        results = self._search_and_cache(query, ([] if lookup is None else lookup.entry.results))
+        try:
+            async for result in results:
+                yield result
+        finally:
+            await results.aclose()  # now, so it caches what it found if stopped early
+            if is_claimed:  # also if the search failed or was stopped early, so no one waits on it in vain
+                await self.cache.release(collection_id, query)
@@ -0,0 +1,23 @@
+from collections.abc import AsyncIterable
+from typing import override
+
+from historical_sources_search.coalesce import SearchCoalescer
+from historical_sources_search.collections.base import CollectionBase
+from historical_sources_search.search_result import SearchResult
+
+
+class CollectionCoalesced(CollectionBase):
+    """Shares one search of a collection among all concurrent searches for the same query"""
+
+    def __init__(self, collection: CollectionBase, coalescer: SearchCoalescer):
+        super().__init__(collection_info=collection.collection_info)
+        self.collection = collection
+        self.coalescer = coalescer
+
+    @override
+    async def warm_up(self):
+        await self.collection.warm_up()
+
+    @override
+    def search(self, query: str) -> AsyncIterable[SearchResult]:
+        return self.coalescer.search(self.collection, query)
@@ -1,29 +1,100 @@
 import logging
+import re
 from typing import override
-from urllib.parse import quote as url_escape
+from urllib.parse import quote as url_escape, urljoin
 
-from playwright.async_api import Browser, Locator, Page, expect as pw_expect
+import httpx
+from playwright.async_api import Locator, Page, expect as pw_expect
+from selectolax.lexbor import LexborHTMLParser
 
+from historical_sources_search.browser_pool import BrowserContextPool
+from historical_sources_search.collections.base import ResultSelectors
 from historical_sources_search.collections.base_browser_paging import CollectionBaseBrowserPaging
+from historical_sources_search.collections.base_http_paging import (
+    CollectionBaseHttpPaging,
+    HttpPage,
+    extract_results_html,
+    html_attribute,
+    html_text,
+)
+from historical_sources_search.collections.fallback import CollectionWithFallback
 from historical_sources_search.exceptions import MissingInformationError, NavigationError
+from historical_sources_search.rate_limit import HostRateLimiter
 from historical_sources_search.search_result import CollectionInfo
 
+_COLLECTION_INFO = CollectionInfo(
+    id="constitution_annotated",
+    name="Constitution Annotated",
+    url="https://constitution.congress.gov/",
+)
 
-class CollectionConstitutionAnnotated(CollectionBaseBrowserPaging):
-    def __init__(self, browser: Browser):
+_RESULT_SELECTORS = ResultSelectors(
+    result="ul.search-results > li",
+    url=".search-results-title a",
+    title=".search-results-title",
+    detail=".search-results-summary",
+    image=None,
+)
+
+
+def _get_search_url(query: str) -> str:
+    query_escaped = url_escape(query, safe="")
+    return f"https://constitution.congress.gov/search/{query_escaped}"
+
+
+class CollectionConstitutionAnnotated(CollectionWithFallback):
+    def __init__(
+        self, httpx_client: httpx.AsyncClient, browser_pool: BrowserContextPool, rate_limiter: HostRateLimiter
+    ):
         super().__init__(
-            browser=browser,
-            collection_info=CollectionInfo(
-                name="Constitution Annotated",
-                url="https://constitution.congress.gov/",
-            ),
+            primary=CollectionConstitutionAnnotatedHttp(httpx_client),
+            fallback=CollectionConstitutionAnnotatedBrowser(browser_pool, rate_limiter),
+            logger=logging.getLogger(f"{__name__}.fallback"),
+        )
+
+
+class CollectionConstitutionAnnotatedHttp(CollectionBaseHttpPaging):
+    def __init__(self, httpx_client: httpx.AsyncClient):
+        super().__init__(
+            httpx_client=httpx_client,
+            collection_info=_COLLECTION_INFO,
+            logger=logging.getLogger(f"{__name__}.http"),
+        )
+
+    @override
+    def _get_first_page_url(self, query: str) -> str:
+        return _get_search_url(query)
+
+    @override
+    def _parse_page(self, response: httpx.Response, page_index: int) -> HttpPage:
+        tree = LexborHTMLParser(response.text)
+        results = extract_results_html(tree, _RESULT_SELECTORS)
+        if not results and tree.css_first("[title=no-results]") is None:
+            raise MissingInformationError(f"Page `{response.url}` has neither results nor a no-results indicator")
+
+        next_page_url = None
+        new_page_number = str(page_index + 2)
+        for link in tree.css(".search-results-control-pagination a"):
+            if (html_text(link) or "").strip() == new_page_number:
+                next_page_href = html_attribute(link, "href")
+                if next_page_href:
+                    next_page_url = urljoin(str(response.url), next_page_href)
+                break
+        return HttpPage(results=results, next_page_url=next_page_url)
+
+
+class CollectionConstitutionAnnotatedBrowser(CollectionBaseBrowserPaging):
+    def __init__(self, browser_pool: BrowserContextPool, rate_limiter: HostRateLimiter):
+        super().__init__(
+            browser_pool=browser_pool,
+            rate_limiter=rate_limiter,
+            collection_info=_COLLECTION_INFO,
             logger=logging.getLogger(f"{__name__}.paging"),
         )
 
     @override
     async def _enter_query(self, page: Page, query: str):
-        query_escaped = url_escape(query, safe="")
-        search_url = f"https://constitution.congress.gov/search/{query_escaped}"
+        search_url = _get_search_url(query)
         response = await page.goto(search_url)
         if response is not None and not response.ok:
             raise NavigationError(f"Navigation to `{search_url}` failed with status {response.status}")
@@ -33,29 +104,8 @@ class CollectionConstitutionAnnotated(CollectionBaseBrowserPaging):
         return page.get_by_title("no-results")
 
     @override
-    def _get_locator_result_by_index(self, page: Page, index: int) -> Locator:
-        return page.locator("ul.search-results > li").nth(index)
-
-    @override
-    async def _get_result_url(self, page: Page, result_locator: Locator) -> str:
-        item_title_link = result_locator.locator(".search-results-title").locator("a")
-        item_title_href = await item_title_link.get_attribute("href")
-        if not item_title_href:
-            item_title_link_html = await item_title_link.inner_html()
-            raise MissingInformationError(f"Search result did not have an href: {item_title_link_html}")
-        return item_title_href
-
-    @override
-    async def _get_result_title(self, page: Page, result_locator: Locator) -> str:
-        return await result_locator.locator(".search-results-title").inner_text()
-
-    @override
-    async def _get_result_detail(self, page: Page, result_locator: Locator) -> str | None:
-        return await result_locator.locator(".search-results-summary").inner_text()
-
-    @override
-    async def _get_result_image_src(self, page: Page, result_locator: Locator) -> str | None:
-        return None
+    def _get_result_selectors(self) -> ResultSelectors:
+        return _RESULT_SELECTORS
 
     @override
     async def _advance_page(self, page: Page, current_page_index: int) -> bool:
@@ -64,9 +114,16 @@ class CollectionConstitutionAnnotated(CollectionBaseBrowserPaging):
         locator_pagination = page.locator(".search-results-control-pagination")
         next_page_button = locator_pagination.get_by_role("link", name=str(new_page_number), exact=True)
         try:
-            await pw_expect(next_page_button).to_be_visible(timeout=1_000)
+            with self.timeouts.wait("find_next_page", timeout_is_expected=True) as timeout_ms:
+                await pw_expect(next_page_button).to_be_visible(timeout=timeout_ms)
         except AssertionError:
             return False  # no more pages
         await next_page_button.click()
-        await pw_expect(locator_pagination.locator(".pagination-item.active")).to_be_visible(timeout=30_000)
+        # make sure the new page is loaded
+        with self.timeouts.wait("advance_page") as timeout_ms:
+            await pw_expect(locator_pagination.locator(".pagination-item.active")).to_have_text(
+                re.compile(f"\\b{new_page_number}\\b"),
+                use_inner_text=True,
+                timeout=timeout_ms,
+            )
         return True
@@ -1,16 +1,58 @@
 import logging
 import re
 from typing import override
-from urllib.parse import urlencode
+from urllib.parse import parse_qs, urlencode, urljoin, urlsplit
 
-from playwright.async_api import Browser, Locator, Page, TimeoutError as PlaywrightTimeoutError, expect as pw_expect
+import httpx
+from playwright.async_api import Locator, Page, expect as pw_expect
+from selectolax.lexbor import LexborHTMLParser
 
+from historical_sources_search.browser_pool import BrowserContextPool
+from historical_sources_search.collections.base import ResultSelectors
 from historical_sources_search.collections.base_browser_paging import CollectionBaseBrowserPaging
+from historical_sources_search.collections.base_http_paging import (
+    CollectionBaseHttpPaging,
+    HttpPage,
+    extract_results_html,
+    html_attribute,
+)
+from historical_sources_search.collections.fallback import CollectionWithFallback
 from historical_sources_search.exceptions import MissingInformationError, NavigationError
+from historical_sources_search.rate_limit import HostRateLimiter
 from historical_sources_search.search_result import CollectionInfo
 
+_COLLECTION_INFO = CollectionInfo(
+    id="facing_history",
+    name="Facing History",
+    url="https://www.facinghistory.org/resource-library",
+)
 
-class CollectionFacingHistory(CollectionBaseBrowserPaging):
+_RESULT_SELECTORS = ResultSelectors(
+    result=".card-list .card",
+    url="a.card__link",
+    title=".card__header",
+    detail=".card__summary",
+    image=".card__image img",
+)
+
+
+def _get_search_url(query: str, *, page_index: int = 0) -> str:
+    url_params = {
+        "keys": query,
+        "sort_by": "search_api_relevance",
+        "items_per_page": "48",
+    }
+    if page_index > 0:
+        url_params["page"] = str(page_index)  # counted from 0
+    return f"https://www.facinghistory.org/resource-library?{urlencode(url_params)}"
+
+
+def _get_page_index(url: str) -> int | None:
+    values = parse_qs(urlsplit(url).query).get("page")
+    return int(values[0]) if values and values[0].isdigit() else None
+
+
+class CollectionFacingHistory(CollectionWithFallback):
     """
     https://www.facinghistory.org/robots.txt includes the following restriction:
 
@@ -25,78 +67,101 @@ class CollectionFacingHistory(CollectionBaseBrowserPaging):
     falls within the bounds of exception (1).
     """  # noqa: RUF002
 
-    def __init__(self, browser: Browser):
+    def __init__(
+        self, httpx_client: httpx.AsyncClient, browser_pool: BrowserContextPool, rate_limiter: HostRateLimiter
+    ):
+        super().__init__(
+            primary=CollectionFacingHistoryHttp(httpx_client),
+            fallback=CollectionFacingHistoryBrowser(browser_pool, rate_limiter),
+            logger=logging.getLogger(f"{__name__}.fallback"),
+        )
+
+
+class CollectionFacingHistoryHttp(CollectionBaseHttpPaging):
+    def __init__(self, httpx_client: httpx.AsyncClient):
         super().__init__(
-            browser=browser,
-            collection_info=CollectionInfo(
-                name="Facing History",
-                url="https://www.facinghistory.org/resource-library",
-            ),
+            httpx_client=httpx_client,
+            collection_info=_COLLECTION_INFO,
+            logger=logging.getLogger(f"{__name__}.http"),
+        )
+
+    @override
+    def _get_first_page_url(self, query: str) -> str:
+        return _get_search_url(query)
+
+    @override
+    def _parse_page(self, response: httpx.Response, page_index: int) -> HttpPage:
+        tree = LexborHTMLParser(response.text)
+        results = extract_results_html(tree, _RESULT_SELECTORS)
+        if not results and tree.css_first(".search-no-results-message") is None:
+            raise MissingInformationError(f"Page `{response.url}` has neither results nor a no-results indicator")
+
+        next_page_href = html_attribute(tree.css_first("li.pager__item--next a"), "href")
+        next_page_url = urljoin(str(response.url), next_page_href) if next_page_href else None
+        return HttpPage(results=results, next_page_url=next_page_url)
+
+
+class CollectionFacingHistoryBrowser(CollectionBaseBrowserPaging):
+    def __init__(self, browser_pool: BrowserContextPool, rate_limiter: HostRateLimiter):
+        super().__init__(
+            browser_pool=browser_pool,
+            rate_limiter=rate_limiter,
+            collection_info=_COLLECTION_INFO,
             logger=logging.getLogger(f"{__name__}.paging"),
         )
 
+    @override
+    async def _prepare_context(self, page: Page):
+        await super()._prepare_context(page)
+        # dismiss the dialog once per context; the site remembers it with a cookie
+        await page.get_by_role("button", name="Close").click()
+
     @override
     async def _enter_query(self, page: Page, query: str):
-        url_params = urlencode(
-            {
-                "keys": query,
-                "sort_by": "search_api_relevance",
-                "items_per_page": "48",
-            }
-        )
-        search_url = f"https://www.facinghistory.org/resource-library?{url_params}"
+        search_url = _get_search_url(query)
         response = await page.goto(search_url)
         if response is not None and not response.ok:
             raise NavigationError(f"Navigation to `{search_url}` failed with status {response.status}")
-        await page.get_by_role("button", name="Close").click()
+        close_button = page.get_by_role("button", name="Close")
+        if await close_button.is_visible():  # in case the dialog comes back anyway
+            await close_button.click()
 
     @override
     def _get_locator_no_results(self, page: Page) -> Locator:
         return page.locator(".search-no-results-message")
 
     @override
-    def _get_locator_result_by_index(self, page: Page, index: int) -> Locator:
-        return page.locator(".card-list").locator(".card").nth(index)
+    def _get_result_selectors(self) -> ResultSelectors:
+        return _RESULT_SELECTORS
 
     @override
-    async def _get_result_url(self, page: Page, result_locator: Locator) -> str:
-        card_link = result_locator.locator("a.card__link")
-        card_link_href = await card_link.get_attribute("href")
-        if not card_link_href:
-            card_link_html = await card_link.inner_html()
-            raise MissingInformationError(f"Search result did not have an href: {card_link_html}")
-        return card_link_href
-
-    @override
-    async def _get_result_title(self, page: Page, result_locator: Locator) -> str:
-        return await result_locator.locator(".card__header").inner_text(timeout=500)
-
-    @override
-    async def _get_result_detail(self, page: Page, result_locator: Locator) -> str | None:
-        return await result_locator.locator(".card__summary").inner_text(timeout=500)
+    async def _get_n_pages(self, page: Page) -> int | None:
+        hrefs: list[str] = await page.locator(".pager__item a").evaluate_all(
+            "(elements) => elements.map((element) => element.href)"
+        )
+        page_indexes = [page_index for href in hrefs if (page_index := _get_page_index(href)) is not None]
+        return max(page_indexes, default=0) + 1
 
     @override
-    async def _get_result_image_src(self, page: Page, result_locator: Locator) -> str | None:
-        card_image = result_locator.locator(".card__image").locator("img")
-        try:
-            return await card_image.get_attribute("src", timeout=500)
-        except PlaywrightTimeoutError:
-            return None
+    def _get_page_url(self, query: str, page_index: int) -> str:
+        return _get_search_url(query, page_index=page_index)
 
     @override
     async def _advance_page(self, page: Page, current_page_index: int) -> bool:
         current_page_number = current_page_index + 1
         next_page_button = page.locator("li.pager__item--next")
         try:
-            await pw_expect(next_page_button).to_be_visible(timeout=1_000)
+            with self.timeouts.wait("find_next_page", timeout_is_expected=True) as timeout_ms:
+                await pw_expect(next_page_button).to_be_visible(timeout=timeout_ms)
         except AssertionError:
             return False  # no more pages
         await next_page_button.click()
         # make sure the new page is loaded
         new_page_number = current_page_number + 1
-        await pw_expect(page.locator(".pager__link.is-active")).to_have_text(
-            re.compile(f"\\b{new_page_number}\\b"),
-            use_inner_text=True,
-            timeout=30_000,
-        )
+        with self.timeouts.wait("advance_page") as timeout_ms:
+            await pw_expect(page.locator(".pager__link.is-active")).to_have_text(
+                re.compile(f"\\b{new_page_number}\\b"),
+                use_inner_text=True,
+                timeout=timeout_ms,
+            )
         return True
@@ -0,0 +1,47 @@
+import asyncio
+import logging
+from collections.abc import AsyncIterable
+from typing import override
+
+from historical_sources_search.collections.base import CollectionBase
+from historical_sources_search.search_result import SearchResult
+
+
+class CollectionWithFallback(CollectionBase):
+    """
+    Searches using a primary implementation of a collection, switching to a fallback implementation if it fails.
+
+    If the primary implementation fails partway through, the fallback implementation's first results are skipped
+    (as many as the primary had already produced), since both implementations list results in the same order.
+    """
+
+    def __init__(self, primary: CollectionBase, fallback: CollectionBase, logger: logging.Logger | None):
+        super().__init__(collection_info=primary.collection_info)
+        self.primary = primary
+        self.fallback = fallback
+        self.logger = logger or logging.getLogger(__name__)
+
+    @override
+    async def warm_up(self):
+        await asyncio.gather(self.primary.warm_up(), self.fallback.warm_up())
+
+    @override
+    async def search(self, query: str) -> AsyncIterable[SearchResult]:
+        n_results = 0
+        try:
+            async for result in self.primary.search(query):
+                yield result
+                n_results += 1
+        except Exception:
+            self.logger.warning(
+                f"Primary search failed for query {query!r} after {n_results} result(s); using fallback",
+                exc_info=True,
+            )
+        else:
+            return
+
+        i = 0
+        async for result in self.fallback.search(query):
+            if i >= n_results:
+                yield result
+            i += 1
@@ -0,0 +1,74 @@
+import logging
+from collections.abc import AsyncGenerator, AsyncIterable
+from typing import override
+
+from historical_sources_search.collections.base import CollectionBase
+from historical_sources_search.index import SearchIndex
+from historical_sources_search.search_result import SearchResult
+
+
+class CollectionIndexed(CollectionBase):
+    """
+    Answers from the local index when the query was harvested and has enough matches,
+    otherwise searches the collection live.
+    Live searches' results are added to the index, as items only (not as a harvest of their query),
+    so that the cache's TTLs still decide how long their results are reused.
+    A query answered from the index is also searched live in the background if it hasn't been recently,
+    so that the index keeps up with the collection.
+    """
+
+    def __init__(self, collection: CollectionBase, index: SearchIndex, logger: logging.Logger | None = None):
+        super().__init__(collection_info=collection.collection_info)
+        self.collection = collection
+        self.index = index
+        self.logger = logger or logging.getLogger(__name__)
+
+    async def _search_and_index(self, query: str, *, is_harvest: bool) -> AsyncGenerator[SearchResult]:
+        results = []
+        is_stopped_early = False
+        live_results = self.collection.search(query)
+        try:
+            async for result in live_results:
+                results.append(result)
+                yield result
+        except GeneratorExit:
+            is_stopped_early = True
+            raise
+        finally:
+            if isinstance(live_results, AsyncGenerator):
+                await live_results.aclose()  # e.g. to give back its browser page before indexing
+            if is_stopped_early and results:
+                await self.index.add(self.collection_info.id, query, results, is_harvest=False)
+        await self.index.add(self.collection_info.id, query, results, is_harvest=is_harvest)
+
+    async def _refresh(self, query: str):
+        if not await self.index.claim_harvest(self.collection_info.id, query):
+            return  # another process is already refreshing it (or just did)
+        try:
+            async for _ in self._search_and_index(query, is_harvest=True):
+                pass
+        finally:
+            await self.index.release_harvest(self.collection_info.id, query)
+        self.logger.debug(f"Refreshed indexed results of {self.collection_info.id!r} for query {query!r}")
+
+    @override
+    async def warm_up(self):
+        await self.collection.warm_up()
+
+    @override
+    async def search(self, query: str) -> AsyncIterable[SearchResult]:
+        results = await self.index.search(self.collection_info, query)
+        if results is None:
+            live_results = self._search_and_index(query, is_harvest=False)
+            try:
+                async for result in live_results:
+                    yield result
+            finally:
+                await live_results.aclose()  # now, so it indexes what it found if stopped early
+            return
+
+        self.logger.debug(f"Answering {self.collection_info.id!r} from the index for query {query!r}")
+        if await self.index.is_harvest_due(self.collection_info.id, query):
+            self.index.refresh_in_background(self.collection_info.id, query, lambda: self._refresh(query))
+        for result in results:
+            yield result
@@ -1,36 +1,119 @@
 import logging
-from typing import override
+import re
+from typing import Any, override
 from urllib.parse import urlencode
 
-from playwright.async_api import Browser, Locator, Page, TimeoutError as PlaywrightTimeoutError, expect as pw_expect
+import httpx
+from playwright.async_api import Locator, Page, expect as pw_expect
 
+from historical_sources_search.browser_pool import BrowserContextPool
+from historical_sources_search.collections.base import RawSearchResult, ResultSelectors
 from historical_sources_search.collections.base_browser_paging import CollectionBaseBrowserPaging
+from historical_sources_search.collections.base_http_paging import CollectionBaseHttpPaging, HttpPage
+from historical_sources_search.collections.fallback import CollectionWithFallback
 from historical_sources_search.exceptions import MissingInformationError, NavigationError
+from historical_sources_search.rate_limit import HostRateLimiter
 from historical_sources_search.search_result import CollectionInfo
 
+_COLLECTION_INFO = CollectionInfo(
+    id="library_of_congress",
+    name="Classroom Materials at the Library of Congress",
+    url="https://www.loc.gov/classroom-materials/?fa=partof_type%3Aprimary+source+set",
+)
 
-class CollectionLibraryOfCongress(CollectionBaseBrowserPaging):
-    def __init__(self, browser: Browser):
+_RESULT_SELECTORS = ResultSelectors(
+    result="[id=results] li.item",
+    url=".item-description-title a",
+    title=".item-description-title a",
+    detail=".item-description-abstract",
+    image="figure img",
+)
+
+
+_PAGE_LABEL = re.compile(r"^Page (\d+)$")
+
+
+def _get_search_url(query: str, *, json: bool = False, page_number: int = 1) -> str:
+    url_params = {
+        "q": query,
+        "fa": "partof_type:primary source set",
+        "st": "list",
+        "c": "150",  # results per page
+    }
+    if page_number > 1:
+        url_params["sp"] = str(page_number)
+    if json:
+        url_params["fo"] = "json"
+    return f"https://www.loc.gov/classroom-materials/?{urlencode(url_params)}"
+
+
+def _first_str(value: Any) -> str | None:
+    """The loc.gov JSON API gives some fields as a list of strings; take the first"""
+    if isinstance(value, list):
+        value = value[0] if value else None
+    return value if isinstance(value, str) else None
+
+
+class CollectionLibraryOfCongress(CollectionWithFallback):
+    def __init__(
+        self, httpx_client: httpx.AsyncClient, browser_pool: BrowserContextPool, rate_limiter: HostRateLimiter
+    ):
         super().__init__(
-            browser=browser,
-            collection_info=CollectionInfo(
-                name="Classroom Materials at the Library of Congress",
-                url="https://www.loc.gov/classroom-materials/?fa=partof_type%3Aprimary+source+set",
-            ),
+            primary=CollectionLibraryOfCongressHttp(httpx_client),
+            fallback=CollectionLibraryOfCongressBrowser(browser_pool, rate_limiter),
+            logger=logging.getLogger(f"{__name__}.fallback"),
+        )
+
+
+class CollectionLibraryOfCongressHttp(CollectionBaseHttpPaging):
+    """Uses the JSON version of the search page (https://www.loc.gov/apis/json-and-yaml/)"""
+
+    def __init__(self, httpx_client: httpx.AsyncClient):
+        super().__init__(
+            httpx_client=httpx_client,
+            collection_info=_COLLECTION_INFO,
+            logger=logging.getLogger(f"{__name__}.http"),
+        )
+
+    @override
+    def _get_first_page_url(self, query: str) -> str:
+        return _get_search_url(query, json=True)
+
+    @override
+    def _parse_page(self, response: httpx.Response, page_index: int) -> HttpPage:
+        try:
+            content = response.json()
+        except ValueError:
+            raise MissingInformationError(f"Page `{response.url}` is not valid JSON")
+        if not isinstance(content, dict) or not isinstance(content.get("results"), list):
+            raise MissingInformationError(f"Page `{response.url}` does not have a list of results")
+        results = [
+            RawSearchResult(
+                url=_first_str(item.get("url")),
+                title=_first_str(item.get("title")),
+                detail=_first_str(item.get("description")),
+                image_src=_first_str(item.get("image_url")),
+            )
+            for item in content["results"]
+            if isinstance(item, dict)
+        ]
+        pagination = content.get("pagination")
+        next_page_url = _first_str(pagination.get("next")) if isinstance(pagination, dict) else None
+        return HttpPage(results=results, next_page_url=next_page_url)
+
+
+class CollectionLibraryOfCongressBrowser(CollectionBaseBrowserPaging):
+    def __init__(self, browser_pool: BrowserContextPool, rate_limiter: HostRateLimiter):
+        super().__init__(
+            browser_pool=browser_pool,
+            rate_limiter=rate_limiter,
+            collection_info=_COLLECTION_INFO,
             logger=logging.getLogger(f"{__name__}.paging"),
         )
 
     @override
     async def _enter_query(self, page: Page, query: str):
-        url_params = urlencode(
-            {
-                "q": query,
-                "fa": "partof_type:primary source set",
-                "st": "list",
-                "c": "150",  # results per page
-            }
-        )
-        search_url = f"https://www.loc.gov/classroom-materials/?{url_params}"
+        search_url = _get_search_url(query)
         response = await page.goto(search_url)
         if response is not None and not response.ok:
             raise NavigationError(f"Navigation to `{search_url}` failed with status {response.status}")
@@ -40,45 +123,34 @@ class CollectionLibraryOfCongress(CollectionBaseBrowserPaging):
         return page.locator(".noresults-for")
 
     @override
-    def _get_locator_result_by_index(self, page: Page, index: int) -> Locator:
-        return page.locator("[id=results]").locator("li.item").nth(index)
-
-    @override
-    async def _get_result_url(self, page: Page, result_locator: Locator) -> str:
-        item_title = result_locator.locator(".item-description-title").locator("a")
-        item_title_href = await item_title.get_attribute("href")
-        if not item_title_href:
-            item_title_html = await item_title.inner_html()
-            raise MissingInformationError(f"Search result did not have an href: {item_title_html}")
-        return item_title_href
-
-    @override
-    async def _get_result_title(self, page: Page, result_locator: Locator) -> str:
-        return await result_locator.locator(".item-description-title").locator("a").inner_text()
+    async def _get_n_pages(self, page: Page) -> int | None:
+        labels = await page.get_by_label(_PAGE_LABEL).evaluate_all(
+            "(elements) => elements.map((element) => element.getAttribute('aria-label'))"
+        )
+        page_numbers = [int(match[1]) for label in labels if label and (match := _PAGE_LABEL.match(label))]
+        return max(page_numbers, default=1)
 
     @override
-    async def _get_result_detail(self, page: Page, result_locator: Locator) -> str | None:
-        return await result_locator.locator(".item-description-abstract").inner_text()
+    def _get_page_url(self, query: str, page_index: int) -> str:
+        return _get_search_url(query, page_number=(page_index + 1))
 
     @override
-    async def _get_result_image_src(self, page: Page, result_locator: Locator) -> str | None:
-        item_image = result_locator.locator("figure").locator("img")
-        try:
-            return await item_image.get_attribute("src", timeout=500)
-        except PlaywrightTimeoutError:
-            return None
+    def _get_result_selectors(self) -> ResultSelectors:
+        return _RESULT_SELECTORS
 
     @override
     async def _advance_page(self, page: Page, current_page_index: int) -> bool:
         current_page_number = current_page_index + 1
         next_page_button = page.get_by_role("link", name="Next Page")
         try:
-            await pw_expect(next_page_button).to_be_visible(timeout=1_000)
+            with self.timeouts.wait("find_next_page", timeout_is_expected=True) as timeout_ms:
+                await pw_expect(next_page_button).to_be_visible(timeout=timeout_ms)
         except AssertionError:
             return False  # no more pages
         await next_page_button.click()
         new_page_number = current_page_number + 1
-        await pw_expect(
-            page.get_by_label(f"Page {new_page_number}", exact=True).and_(page.locator(".selected"))
-        ).to_be_visible(timeout=30_000)
+        with self.timeouts.wait("advance_page") as timeout_ms:
+            await pw_expect(
+                page.get_by_label(f"Page {new_page_number}", exact=True).and_(page.locator(".selected"))
+            ).to_be_visible(timeout=timeout_ms)
         return True
@@ -0,0 +1,101 @@
+import logging
+from collections.abc import Callable, Sequence
+from importlib.metadata import EntryPoint, entry_points
+
+import httpx
+
+from historical_sources_search.browser_pool import BrowserContextPool
+from historical_sources_search.circuit_breaker import CircuitBreakers
+from historical_sources_search.collections.base import CollectionBase
+from historical_sources_search.collections.breaker import CollectionWithCircuitBreaker
+from historical_sources_search.exceptions import UnknownCollectionError
+from historical_sources_search.rate_limit import HostRateLimiter
+
+LOGGER = logging.getLogger(__name__)
+
+type CollectionFactory = Callable[[httpx.AsyncClient, BrowserContextPool, HostRateLimiter], CollectionBase]
+
+ENTRY_POINT_GROUP = "historical_sources_search.collections"
+"""Other installed packages can add collections as entry points in this group, named by collection id"""
+
+_BUILT_IN_COLLECTIONS = {
+    "facing_history": "historical_sources_search.collections.facing_history:CollectionFacingHistory",
+    "library_of_congress": "historical_sources_search.collections.library_of_congress:CollectionLibraryOfCongress",
+    "constitution_annotated": (
+        "historical_sources_search.collections.constitution_annotated:CollectionConstitutionAnnotated"
+    ),
+}
+
+
+class CollectionRegistry:
+    """
+    The collections that can be searched, by id: the built-in ones, plus any that other installed packages add
+    (as entry points in `ENTRY_POINT_GROUP`, each referring to a `CollectionFactory`).
+    If `enabled_ids` is given, only those are available.
+    If `breakers` is given, each collection is searched through its circuit breaker.
+
+    Each collection's module is only imported when the collection is first needed,
+    and each collection is only built once, then shared by all searches.
+    """
+
+    def __init__(
+        self,
+        httpx_client: httpx.AsyncClient,
+        browser_pool: BrowserContextPool,
+        rate_limiter: HostRateLimiter,
+        *,
+        enabled_ids: Sequence[str] | None = None,
+        breakers: CircuitBreakers | None = None,
+    ):
+        self.httpx_client = httpx_client
+        self.browser_pool = browser_pool
+        self.rate_limiter = rate_limiter
+        self.breakers = breakers
+        entries = {
+            collection_id: EntryPoint(name=collection_id, value=value, group=ENTRY_POINT_GROUP)
+            for collection_id, value in _BUILT_IN_COLLECTIONS.items()
+        }
+        for entry in entry_points(group=ENTRY_POINT_GROUP):
+            if entry.name in entries:
+                LOGGER.warning(f"Collection {entry.name!r} from {entry.value!r} replaces {entries[entry.name].value!r}")
+            entries[entry.name] = entry
+        if enabled_ids is not None:
+            unknown_ids = set(enabled_ids) - entries.keys()
+            if unknown_ids:
+                raise UnknownCollectionError(f"Unknown collection(s) enabled: {sorted(unknown_ids)}")
+            entries = {collection_id: entries[collection_id] for collection_id in enabled_ids}
+        self._entries = entries
+        self._collections: dict[str, CollectionBase] = {}
+
+    @property
+    def ids(self) -> list[str]:
+        """Of all available collections, whether they have been built yet or not"""
+        return list(self._entries)
+
+    def get(self, collection_id: str) -> CollectionBase:
+        collection = self._collections.get(collection_id)
+        if collection is not None:
+            return collection
+        entry = self._entries.get(collection_id)
+        if entry is None:
+            raise UnknownCollectionError(f"Unknown collection {collection_id!r}; choose from {self.ids}")
+        factory: CollectionFactory = entry.load()
+        collection = factory(self.httpx_client, self.browser_pool, self.rate_limiter)
+        if collection.collection_info.id != collection_id:
+            raise ValueError(
+                f"Collection {entry.value!r} was registered as {collection_id!r}, "
+                f"but has id {collection.collection_info.id!r}"
+            )
+        if self.breakers is not None:
+            collection = CollectionWithCircuitBreaker(
+                collection, self.breakers.get(collection_id), self.breakers.probe_query
+            )
+        LOGGER.info(f"Loaded collection {collection_id!r}")
+        self._collections[collection_id] = collection
+        return collection
+
+    def get_many(self, collection_ids: Sequence[str] | None = None) -> list[CollectionBase]:
+        """The collections with `collection_ids` (without duplicates), or all available ones if not given"""
+        if collection_ids is None:
+            collection_ids = self.ids
+        return [self.get(collection_id) for collection_id in dict.fromkeys(collection_ids)]
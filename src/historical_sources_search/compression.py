@@ -0,0 +1,196 @@
+"""
+Compress responses with whichever of zstd, brotli or gzip the client prefers (see `CompressionMiddleware`).
+Streamed responses are flushed after every chunk, so each search event still reaches the client as soon as it's sent.
+"""
+
+import zlib
+from collections.abc import Callable, Sequence
+from typing import Literal, Protocol
+
+import brotli
+import zstandard
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+type Encoding = Literal["zstd", "br", "gzip"]
+
+ENCODINGS: tuple[Encoding, ...] = ("zstd", "br", "gzip")
+"""In order of preference, when the client accepts several equally: zstd and brotli compress JSON better than gzip"""
+
+_COMPRESSIBLE_MEDIA_TYPES = ("text/", "application/json", "application/x-ndjson", "application/javascript")
+
+
+class _Compressor(Protocol):
+    def compress(self, data: bytes) -> bytes: ...
+
+    def flush(self) -> bytes:
+        """Everything compressed so far, so the client can decode it without waiting for the rest"""
+        ...
+
+    def finish(self) -> bytes: ...
+
+
+class _GzipCompressor:
+    def __init__(self):
+        self._compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class _BrotliCompressor:
+    def __init__(self):
+        self._compressor = brotli.Compressor(mode=brotli.MODE_TEXT, quality=5)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class _ZstdCompressor:
+    def __init__(self):
+        self._compressor = zstandard.ZstdCompressor(level=3).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+
+_COMPRESSORS: dict[Encoding, Callable[[], _Compressor]] = {
+    "zstd": _ZstdCompressor,
+    "br": _BrotliCompressor,
+    "gzip": _GzipCompressor,
+}
+
+
+def compress(data: bytes, encoding: Encoding) -> bytes:
+    """Compress a whole body at once"""
+    compressor = _COMPRESSORS[encoding]()
+    return compressor.compress(data) + compressor.finish()
+
+
+def negotiate_encoding(accept_encoding: str, encodings: Sequence[Encoding] = ENCODINGS) -> Encoding | None:
+    """
+    The encoding (of `encodings`) the client prefers, according to its `Accept-Encoding` header;
+    ties go to whichever comes first in `encodings`.
+    `None` if it accepts none of them (in which case the response isn't compressed).
+    """
+    quality_by_coding: dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        coding, *params = (part.strip() for part in item.split(";"))
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        quality_by_coding[coding.lower()] = quality
+
+    best: Encoding | None = None
+    best_quality = 0.0
+    for encoding in encodings:
+        quality = quality_by_coding.get(encoding, quality_by_coding.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def _is_compressible(headers: Headers) -> bool:
+    if "content-encoding" in headers:
+        return False
+    media_type = headers.get("content-type", "")
+    return media_type.startswith(_COMPRESSIBLE_MEDIA_TYPES)
+
+
+class CompressionMiddleware:
+    """
+    Compresses responses with textual media types (e.g. JSON, not thumbnails) with the client's preferred encoding.
+    Responses sent all at once are only compressed if they have at least `minimum_size` bytes.
+    """
+
+    def __init__(self, app: ASGIApp, *, encodings: Sequence[Encoding] = ENCODINGS, minimum_size: int = 1_024):
+        self.app = app
+        self.encodings = encodings
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""), self.encodings)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, _CompressingSend(send, encoding, self.minimum_size))
+
+
+class _CompressingSend:
+    """Sends a single response, compressing its body (unless it turns out not to be worth it)"""
+
+    def __init__(self, send: Send, encoding: Encoding, minimum_size: int):
+        self._send = send
+        self._encoding = encoding
+        self._minimum_size = minimum_size
+        self._start_message: Message | None = None
+        self._compressor: _Compressor | None = None
+        self._is_passthrough = False
+
+    async def __call__(self, message: Message):
+        if message["type"] == "http.response.start":
+            # held back until the first chunk of the body shows whether to compress it
+            self._start_message = message
+            return
+        if message["type"] != "http.response.body" or self._is_passthrough:
+            await self._send(message)
+            return
+
+        body: bytes = message.get("body", b"")
+        more_body: bool = message.get("more_body", False)
+        if self._start_message is not None:
+            start_message, self._start_message = self._start_message, None
+            headers = MutableHeaders(raw=start_message["headers"])
+            if not _is_compressible(headers) or (not more_body and len(body) < self._minimum_size):
+                self._is_passthrough = True
+                await self._send(start_message)
+                await self._send(message)
+                return
+            headers["Content-Encoding"] = self._encoding
+            headers.add_vary_header("Accept-Encoding")
+            if more_body:
+                self._compressor = _COMPRESSORS[self._encoding]()
+                del headers["Content-Length"]
+                await self._send(start_message)
+            else:
+                body = compress(body, self._encoding)
+                headers["Content-Length"] = str(len(body))
+                await self._send(start_message)
+                await self._send({"type": "http.response.body", "body": body})
+                return
+
+        if self._compressor is None:
+            raise RuntimeError("Response body sent before the response started")
+        if more_body:
+            chunk = self._compressor.compress(body) + self._compressor.flush()
+        else:
+            chunk = self._compressor.compress(body) + self._compressor.finish()
+        await self._send({"type": "http.response.body", "body": chunk, "more_body": more_body})
@@ -1,6 +1,6 @@
 from functools import lru_cache
 from pathlib import Path
-from typing import Annotated, Self
+from typing import Annotated, Literal, Self
 
 from pydantic import Field
 from pydantic_settings import BaseSettings
@@ -12,7 +12,83 @@ PLAYWRIGHT_TRACES_DIR = MEDIA_DIR / "traces"
 class Env(BaseSettings):
     playwright_debug: bool = False
     api_port: int = 8000
+    api_workers: Annotated[int, Field(gt=0)] = 1
+    enabled_collections: list[str] | None = None
     n_search_workers: Annotated[int, Field(gt=0)] = 10
+    search_events_buffer_per_collection: Annotated[int, Field(gt=0)] = 30
+    search_events_weight_by_collection: dict[str, Annotated[int, Field(gt=0)]] = {}
+    search_deadline_seconds: Annotated[float, Field(gt=0)] = 60
+    collection_deadline_seconds: Annotated[float, Field(gt=0)] = 45
+    collection_deadline_seconds_by_collection: dict[str, Annotated[float, Field(gt=0)]] = {}
+    max_results_per_collection: Annotated[int, Field(gt=0)] | None = None
+    merge_window_size: Annotated[int, Field(ge=0)] = 10
+    merge_window_seconds: Annotated[float, Field(ge=0)] = 0.25
+    coalesce_read_ahead: Annotated[int, Field(ge=0)] = 5
+    dedup_max_exact_urls: Annotated[int, Field(ge=0)] = 100_000
+    search_page_default_limit: Annotated[int, Field(gt=0)] = 20
+    search_session_ttl_seconds: Annotated[float, Field(ge=0)] = 10 * 60
+    max_search_sessions: Annotated[int, Field(ge=0)] = 200
+    search_session_live_seconds: Annotated[float, Field(ge=0)] = 30
+    max_live_search_sessions: Annotated[int, Field(ge=0)] = 3
+    rate_limit_requests_per_second: Annotated[float, Field(gt=0)] = 2
+    rate_limit_burst: Annotated[int, Field(gt=0)] = 5
+    rate_limit_requests_per_second_by_host: dict[str, Annotated[float, Field(gt=0)]] = {}
+    rate_limit_max_backoff_seconds: Annotated[float, Field(ge=0)] = 60
+    max_browser_pages: Annotated[int, Field(gt=0)] = 12
+    max_browser_pages_per_collection: Annotated[int, Field(gt=0)] = 4
+    max_waiting_for_browser_page: Annotated[int, Field(ge=0)] = 50
+    browser_page_wait_timeout_seconds: Annotated[float, Field(gt=0)] = 30
+    browser_contexts_per_collection: Annotated[int, Field(ge=0)] = 2
+    browser_context_max_uses: Annotated[int, Field(gt=0)] = 50
+    block_browser_resources: bool = True
+    blocked_browser_resource_types_by_collection: dict[str, list[str]] = {}
+    allowed_browser_resource_urls_by_collection: dict[str, list[str]] = {}
+    browser_page_fan_out: Annotated[int, Field(gt=0)] = 3
+    browser_page_fan_out_by_collection: dict[str, Annotated[int, Field(gt=0)]] = {}
+    browser_restart_after_contexts: Annotated[int, Field(gt=0)] | None = 5_000
+    browser_restart_memory_mb: Annotated[int, Field(gt=0)] | None = None
+    browser_drain_timeout_seconds: Annotated[float, Field(ge=0)] = 60
+    adaptive_timeout_window: Annotated[int, Field(gt=0)] = 200
+    adaptive_timeout_min_samples: Annotated[int, Field(gt=0)] = 20
+    adaptive_timeout_percentile: Annotated[float, Field(gt=0, le=100)] = 99
+    adaptive_timeout_multiplier: Annotated[float, Field(gt=0)] = 2
+    adaptive_timeout_bounds_seconds: dict[str, tuple[Annotated[float, Field(gt=0)], Annotated[float, Field(gt=0)]]] = {
+        "wait_for_results": (5, 60),
+        "load_page": (5, 60),
+        "find_next_page": (0.5, 5),
+        "advance_page": (5, 60),
+    }
+    circuit_breaker_failure_threshold: Annotated[int, Field(gt=0)] = 3
+    circuit_breaker_open_seconds: Annotated[float, Field(gt=0)] = 30
+    circuit_breaker_max_open_seconds: Annotated[float, Field(gt=0)] = 10 * 60
+    circuit_breaker_probe_query: str = "constitution"
+    cache_max_entries: Annotated[int, Field(ge=0)] = 1_000
+    cache_ttl_seconds: Annotated[float, Field(ge=0)] = 60 * 60
+    cache_ttl_seconds_by_collection: dict[str, Annotated[float, Field(ge=0)]] = {}
+    cache_stale_seconds: Annotated[float, Field(ge=0)] = 24 * 60 * 60
+    cache_sqlite_path: Path | None = None
+    index_sqlite_path: Path | None = None
+    index_seed_queries: list[str] = []
+    index_min_results: Annotated[int, Field(gt=0)] = 10
+    index_max_results: Annotated[int, Field(gt=0)] = 200
+    index_reharvest_seconds: Annotated[float, Field(ge=0)] = 7 * 24 * 60 * 60
+    index_harvest_pause_seconds: Annotated[float, Field(ge=0)] = 60
+    thumbnail_image_src: bool = True
+    thumbnail_sqlite_path: Path = MEDIA_DIR / "thumbnails.sqlite3"
+    thumbnail_max_bytes: Annotated[int, Field(gt=0)] = 256 << 20
+    thumbnail_size_px: Annotated[int, Field(gt=0)] = 240
+    thumbnail_revalidate_seconds: Annotated[float, Field(ge=0)] = 7 * 24 * 60 * 60
+    thumbnail_allowed_domains: list[str] = ["loc.gov", "facinghistory.org", "congress.gov"]
+    thumbnail_rate_limit_requests_per_second: Annotated[float, Field(gt=0)] = 5
+    thumbnail_rate_limit_burst: Annotated[int, Field(gt=0)] = 10
+    suggest_max_entries: Annotated[int, Field(gt=0)] = 50_000
+    suggest_past_queries: bool = True
+    suggest_query_min_clients: Annotated[int, Field(gt=0)] = 3
+    suggest_prefetch_max_in_flight: Annotated[int, Field(ge=0)] = 2
+    suggest_prefetch_min_prefix_chars: Annotated[int, Field(gt=0)] = 3
+    suggest_prefetch_repeat_seconds: Annotated[float, Field(ge=0)] = 10 * 60
+    response_compression_encodings: list[Literal["zstd", "br", "gzip"]] = ["zstd", "br", "gzip"]
+    response_compression_min_bytes: Annotated[int, Field(ge=0)] = 1_024
 
     @classmethod
     @lru_cache(maxsize=1)
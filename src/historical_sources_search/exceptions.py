@@ -2,5 +2,45 @@ class NavigationError(Exception):
     """Failed to navigate to some URL"""
 
 
+class PageTimeoutError(Exception):
+    """A page of a collection didn't get to an expected state (e.g. showing results) within its timeout"""
+
+
 class MissingInformationError(Exception):
     """Required information is missing"""
+
+
+class CollectionSearchError(Exception):
+    """Searching a collection failed"""
+
+
+class CapacityExceededError(Exception):
+    """There isn't enough capacity to handle more work right now"""
+
+    def __init__(self, message: str, retry_after_seconds: float):
+        super().__init__(message)
+        self.retry_after_seconds = retry_after_seconds
+
+
+class InvalidCursorError(Exception):
+    """A pagination cursor could not be decoded, or doesn't match its request"""
+
+
+class BrowserRestartedError(Exception):
+    """The browser was lost (e.g. it crashed, or was replaced) while one of its pages was in use"""
+
+
+class InvalidImageUrlError(Exception):
+    """An image URL can't be used, e.g. for a thumbnail, because it isn't on an allowed host"""
+
+
+class ImageFetchError(Exception):
+    """Fetching (or reading) an image from its upstream host failed"""
+
+
+class UnknownCollectionError(Exception):
+    """No collection is available with a given id"""
+
+
+class CollectionUnavailableError(Exception):
+    """A collection isn't searched for now, because it has been failing (see `CircuitBreaker`)"""
@@ -0,0 +1,62 @@
+import asyncio
+from collections import deque
+from collections.abc import Hashable, Mapping
+
+
+class FairQueue[K: Hashable, T]:
+    """
+    A queue of items from several sources (e.g. collections), each buffered separately, up to `maxsize_per_source`.
+    Items are taken from the sources with any buffered in turn (up to a source's weight many in a row; 1 by default),
+    so a fast source can't crowd out the others at the head of the queue.
+    Putting an item from a source whose buffer is full waits until it's taken from, which pauses that source alone.
+
+    Like `asyncio.Queue`, after `shutdown`, putting raises `asyncio.QueueShutDown`,
+    and so does getting, once all buffered items have been taken.
+    """
+
+    def __init__(self, maxsize_per_source: int, weights: Mapping[K, int] | None = None):
+        self.maxsize_per_source = maxsize_per_source
+        self.weights = weights or {}
+        self._buffers: dict[K, deque[T]] = {}
+        self._turns: deque[K] = deque()
+        """Sources with any items buffered, in the order they get their turns (the first one's turn is now)"""
+        self._n_taken_in_turn = 0
+        self._changed = asyncio.Condition()
+        self._is_shut_down = False
+
+    async def put(self, source: K, item: T):
+        async with self._changed:
+            buffer = self._buffers.setdefault(source, deque())
+            await self._changed.wait_for(lambda: self._is_shut_down or len(buffer) < self.maxsize_per_source)
+            if self._is_shut_down:
+                raise asyncio.QueueShutDown
+            if not buffer:
+                self._turns.append(source)
+            buffer.append(item)
+            self._changed.notify_all()
+
+    async def get(self) -> T:
+        async with self._changed:
+            await self._changed.wait_for(lambda: self._is_shut_down or self._turns)
+            if not self._turns:
+                raise asyncio.QueueShutDown
+            source = self._turns[0]
+            buffer = self._buffers[source]
+            item = buffer.popleft()
+            self._n_taken_in_turn += 1
+            if not buffer:
+                self._turns.popleft()
+                self._n_taken_in_turn = 0
+            elif self._n_taken_in_turn >= self.weights.get(source, 1):
+                self._turns.rotate(-1)
+                self._n_taken_in_turn = 0
+            self._changed.notify_all()
+            return item
+
+    def qsize(self) -> int:
+        return sum(len(buffer) for buffer in self._buffers.values())
+
+    async def shutdown(self):
+        async with self._changed:
+            self._is_shut_down = True
+            self._changed.notify_all()
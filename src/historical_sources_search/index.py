@@ -0,0 +1,310 @@
+import asyncio
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections.abc import Awaitable, Callable, Sequence
+from pathlib import Path
+from types import TracebackType
+from typing import Self
+
+from pydantic import BaseModel
+
+from historical_sources_search.cache import normalize_query
+from historical_sources_search.collections.base import CollectionBase
+from historical_sources_search.search_result import CollectionInfo, SearchResult
+
+LOGGER = logging.getLogger(__name__)
+
+_HARVEST_CLAIM_SECONDS = 60 * 60
+"""How long a claim to harvest lasts, in case the process holding it dies"""
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    id INTEGER PRIMARY KEY,
+    collection_id TEXT NOT NULL,
+    url TEXT NOT NULL,
+    title TEXT NOT NULL,
+    detail TEXT,
+    image_src TEXT,
+    indexed_at REAL NOT NULL,
+    UNIQUE (collection_id, url)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5(title, detail, content='items', content_rowid='id');
+CREATE TRIGGER IF NOT EXISTS items_after_insert AFTER INSERT ON items BEGIN
+    INSERT INTO items_fts (rowid, title, detail) VALUES (new.id, new.title, new.detail);
+END;
+CREATE TRIGGER IF NOT EXISTS items_after_delete AFTER DELETE ON items BEGIN
+    INSERT INTO items_fts (items_fts, rowid, title, detail) VALUES ('delete', old.id, old.title, old.detail);
+END;
+CREATE TRIGGER IF NOT EXISTS items_after_update AFTER UPDATE ON items BEGIN
+    INSERT INTO items_fts (items_fts, rowid, title, detail) VALUES ('delete', old.id, old.title, old.detail);
+    INSERT INTO items_fts (rowid, title, detail) VALUES (new.id, new.title, new.detail);
+END;
+-- written before only harvester runs counted as harvests (live searches did too), so can't be trusted
+DROP TABLE IF EXISTS harvests;
+CREATE TABLE IF NOT EXISTS harvested_queries (
+    collection_id TEXT NOT NULL,
+    query TEXT NOT NULL,
+    harvested_at REAL NOT NULL,
+    PRIMARY KEY (collection_id, query)
+);
+CREATE TABLE IF NOT EXISTS harvest_claims (
+    collection_id TEXT NOT NULL,
+    query TEXT NOT NULL,
+    claimed_until REAL NOT NULL,
+    PRIMARY KEY (collection_id, query)
+);
+"""
+
+
+def _to_fts_query(query: str) -> str | None:
+    """Match items containing every word of `query` (as literal terms, so users can't inject FTS syntax)"""
+    words = re.findall(r"\w+", query)
+    if not words:
+        return None
+    return " ".join(f'"{word}"' for word in words)
+
+
+class IndexStats(BaseModel):
+    hits: int
+    misses: int
+    n_harvests: int
+    """Searches by the harvester (or background refreshes of them) that were added to the index by this process"""
+
+
+class _SqliteIndex:
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            # readers don't block the writer (nor vice versa), so worker processes can share the file
+            self._connection.execute("PRAGMA journal_mode=WAL")
+        with self._lock, self._connection:
+            self._connection.executescript(_SCHEMA)
+
+    def search(self, collection_info: CollectionInfo, fts_query: str, limit: int) -> list[SearchResult]:
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT items.url, items.title, items.detail, items.image_src "
+                "FROM items_fts JOIN items ON items.id = items_fts.rowid "
+                "WHERE items_fts MATCH ? AND items.collection_id = ? "
+                "ORDER BY bm25(items_fts) LIMIT ?",
+                (fts_query, collection_info.id, limit),
+            ).fetchall()
+        return [
+            SearchResult(
+                url=url,
+                title=title,
+                detail=detail,
+                image_src=image_src,
+                provided_by_collection=collection_info,
+            )
+            for url, title, detail, image_src in rows
+        ]
+
+    def add(self, collection_id: str, query: str, results: list[SearchResult], harvested_at: float, is_harvest: bool):
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT INTO items (collection_id, url, title, detail, image_src, indexed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (collection_id, url) DO UPDATE SET "
+                "title = excluded.title, detail = excluded.detail, image_src = excluded.image_src, "
+                "indexed_at = excluded.indexed_at",
+                [
+                    (collection_id, result.url, result.title, result.detail, result.image_src, harvested_at)
+                    for result in results
+                ],
+            )
+            if is_harvest:
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO harvested_queries (collection_id, query, harvested_at) VALUES (?, ?, ?)",
+                    (collection_id, query, harvested_at),
+                )
+
+    def get_recent_titles(self, limit: int) -> list[str]:
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT title FROM items ORDER BY indexed_at DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [title for (title,) in rows]
+
+    def get_harvested_at(self, collection_id: str, query: str) -> float | None:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT harvested_at FROM harvested_queries WHERE collection_id = ? AND query = ?",
+                (collection_id, query),
+            ).fetchone()
+        return None if row is None else row[0]
+
+    def claim(self, collection_id: str, query: str, now: float) -> bool:
+        """Claim the harvest, unless it's already claimed (atomically, across processes)"""
+        with self._lock, self._connection:
+            cursor = self._connection.execute(
+                "INSERT INTO harvest_claims (collection_id, query, claimed_until) VALUES (?, ?, ?) "
+                "ON CONFLICT (collection_id, query) DO UPDATE SET claimed_until = excluded.claimed_until "
+                "WHERE harvest_claims.claimed_until < ?",
+                (collection_id, query, now + _HARVEST_CLAIM_SECONDS, now),
+            )
+            return cursor.rowcount > 0
+
+    def release(self, collection_id: str, query: str):
+        with self._lock, self._connection:
+            self._connection.execute(
+                "DELETE FROM harvest_claims WHERE collection_id = ? AND query = ?", (collection_id, query)
+            )
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+class SearchIndex:
+    """
+    A local full-text index of collection items, stored in SQLite (FTS5), so queries can be answered without scraping.
+
+    Items are added by harvesting (searching collections for seed queries in the background, see `harvest`),
+    and by live searches that fall back to the collection; but only harvested queries are answered from the index,
+    so other queries are always searched live (subject to the cache and its TTLs).
+    The index is disabled (empty, and ignores additions) if `sqlite_path` is `None`.
+    It may be shared by several worker processes, which `claim_harvest` so each harvest is only done by one of them.
+    """
+
+    def __init__(self, *, sqlite_path: Path | None, min_results: int, reharvest_seconds: float, max_results: int):
+        self.min_results = min_results
+        """Fewer matches than this is a miss, which should be searched live instead"""
+        self.reharvest_seconds = reharvest_seconds
+        self.max_results = max_results
+        self._db = None if sqlite_path is None else _SqliteIndex(sqlite_path)
+        self._refreshing: dict[tuple[str, str], asyncio.Task] = {}
+        self._hits = 0
+        self._misses = 0
+        self._n_harvests = 0
+
+    async def __aenter__(self) -> Self:
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ):
+        for task in self._refreshing.values():
+            task.cancel()
+        if self._db is not None:
+            self._db.close()
+
+    @property
+    def is_enabled(self) -> bool:
+        return self._db is not None
+
+    async def search(self, collection_info: CollectionInfo, query: str) -> list[SearchResult] | None:
+        """
+        The indexed items of a collection that match `query`, best first; `None` on a miss.
+        Only a harvested query can hit, since matches from other queries' results may well be missing some of this
+        query's. Even so, these are the indexed items matching all of the query's words, ranked by full-text match
+        (up to `max_results`): not necessarily the same items, nor in the same order, as a live search would give.
+        """
+        fts_query = _to_fts_query(query)
+        if self._db is None or fts_query is None:
+            return None
+        harvested_at = await asyncio.to_thread(self._db.get_harvested_at, collection_info.id, normalize_query(query))
+        if harvested_at is None:
+            self._misses += 1
+            return None
+        results = await asyncio.to_thread(self._db.search, collection_info, fts_query, self.max_results)
+        if len(results) < self.min_results:
+            self._misses += 1
+            return None
+        self._hits += 1
+        return results
+
+    async def add(self, collection_id: str, query: str, results: list[SearchResult], *, is_harvest: bool):
+        """
+        Index the results of a search of a collection for `query`.
+        A harvest (a complete search by the harvester, or a refresh of one) also lets `query` be answered
+        from the index from then on; other searches' results are just indexed.
+        """
+        if self._db is None:
+            return
+        await asyncio.to_thread(self._db.add, collection_id, normalize_query(query), results, time.time(), is_harvest)
+        if is_harvest:
+            self._n_harvests += 1
+
+    async def get_recent_titles(self, max_titles: int) -> list[str]:
+        """The titles of the most recently indexed items (e.g. for suggestions)"""
+        if self._db is None:
+            return []
+        return await asyncio.to_thread(self._db.get_recent_titles, max_titles)
+
+    async def is_harvest_due(self, collection_id: str, query: str) -> bool:
+        """Whether a collection hasn't been searched for `query` (recently enough) to have its results indexed"""
+        if self._db is None:
+            return False
+        harvested_at = await asyncio.to_thread(self._db.get_harvested_at, collection_id, normalize_query(query))
+        return harvested_at is None or time.time() - harvested_at > self.reharvest_seconds
+
+    async def claim_harvest(self, collection_id: str, query: str) -> bool:
+        """
+        Claim the harvest of a collection's results for `query`, if it is due and no other process has claimed it.
+        A successful claim must be released (see `release_harvest`) once the harvest is done (or has failed).
+        """
+        if self._db is None:
+            return False
+        key = (collection_id, normalize_query(query))
+        if not await asyncio.to_thread(self._db.claim, *key, time.time()):
+            return False
+        # checked after claiming, in case another process finished the same harvest in the meantime
+        if not await self.is_harvest_due(collection_id, query):
+            await asyncio.to_thread(self._db.release, *key)
+            return False
+        return True
+
+    async def release_harvest(self, collection_id: str, query: str):
+        if self._db is not None:
+            await asyncio.to_thread(self._db.release, collection_id, normalize_query(query))
+
+    def refresh_in_background(self, collection_id: str, query: str, refresh: Callable[[], Awaitable[None]]):
+        """Run `refresh` in the background, unless a refresh for the same query is already running"""
+        key = (collection_id, normalize_query(query))
+        if key in self._refreshing:
+            return
+
+        async def _refresh():
+            try:
+                await refresh()
+            except Exception:
+                LOGGER.warning(f"Background refresh of indexed {key} failed", exc_info=True)
+            finally:
+                del self._refreshing[key]
+
+        self._refreshing[key] = asyncio.create_task(_refresh())
+
+    async def harvest(self, collections: Sequence[CollectionBase], seed_queries: Sequence[str], pause_seconds: float):
+        """
+        Keep the index filled with each collection's results for each seed query, searching them again once due.
+        Runs until cancelled, pausing between searches to go easy on the collections.
+        """
+        while True:
+            for query in seed_queries:
+                for collection in collections:
+                    collection_id = collection.collection_info.id
+                    if not await self.claim_harvest(collection_id, query):
+                        continue
+                    try:
+                        results = [result async for result in collection.search(query)]
+                    except Exception:
+                        LOGGER.warning(f"Harvest of {collection_id!r} failed for query {query!r}", exc_info=True)
+                    else:
+                        await self.add(collection_id, query, results, is_harvest=True)
+                        LOGGER.info(f"Harvested {len(results)} result(s) of {collection_id!r} for query {query!r}")
+                    finally:
+                        await self.release_harvest(collection_id, query)
+                    await asyncio.sleep(pause_seconds)
+            await asyncio.sleep(pause_seconds)  # until some harvest may be due again
+
+    def get_stats(self) -> IndexStats:
+        return IndexStats(hits=self._hits, misses=self._misses, n_harvests=self._n_harvests)
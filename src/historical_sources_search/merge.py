@@ -0,0 +1,161 @@
+import asyncio
+import hashlib
+import heapq
+import itertools
+import re
+from collections import Counter
+from collections.abc import AsyncGenerator, AsyncIterable, AsyncIterator
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from historical_sources_search.search_event import SearchEvent, SearchEventResult
+from historical_sources_search.search_result import SearchResult
+
+_TRACKING_PARAMS = re.compile(r"^(utm_\w+|fbclid|gclid|msclkid|mc_cid|mc_eid|_ga)$")
+_IGNORED_PARAMS_BY_HOST = {
+    # the search (and facets) an item was found through, not part of the item's identity
+    "loc.gov": frozenset({"q", "st", "r", "fa", "sb", "c"}),
+}
+_BLOOM_N_BITS = 1 << 24  # 2 MiB; about 1% false positives at 1.7 million URLs
+_BLOOM_N_HASHES = 7
+_RANK_WEIGHT = 0.5
+"""How much a collection's own ranking of a result counts, relative to the result matching all query words"""
+
+
+def canonicalize_url(url: str) -> str:
+    """A form of `url` that is the same for all URLs of the same item (ignoring scheme, `www.`, tracking, etc.)"""
+    parts = urlsplit(url)
+    host = (parts.hostname or "").removeprefix("www.")
+    ignored_params = _IGNORED_PARAMS_BY_HOST.get(host, frozenset())
+    params = sorted(
+        (key, value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if key not in ignored_params and not _TRACKING_PARAMS.match(key)
+    )
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit(("", host, path, urlencode(params), ""))
+
+
+class SeenUrls:
+    """
+    Remembers which items (by canonical URL) have been seen, in bounded memory.
+    The first `max_exact` are kept exactly (as 64-bit hashes);
+    any more go into a fixed-size Bloom filter, which may rarely mistake a new item for a seen one.
+    """
+
+    def __init__(self, max_exact: int):
+        self.max_exact = max_exact
+        self._exact: set[int] = set()
+        self._bloom: bytearray | None = None
+
+    def add(self, url: str) -> bool:
+        """Remember `url`; return whether it is new (i.e. not a duplicate)"""
+        digest = hashlib.blake2b(canonicalize_url(url).encode(), digest_size=(4 * _BLOOM_N_HASHES)).digest()
+        key = int.from_bytes(digest[:8])
+        if key in self._exact:
+            return False
+        if len(self._exact) < self.max_exact:
+            self._exact.add(key)
+            return True
+
+        if self._bloom is None:
+            self._bloom = bytearray(_BLOOM_N_BITS // 8)
+        is_new = False
+        for i in range(0, len(digest), 4):
+            bit = int.from_bytes(digest[i : i + 4]) % _BLOOM_N_BITS
+            byte_index, mask = bit >> 3, 1 << (bit & 7)
+            if not self._bloom[byte_index] & mask:
+                is_new = True
+                self._bloom[byte_index] |= mask
+        return is_new
+
+
+def _words(text: str | None) -> set[str]:
+    return set(re.findall(r"\w+", (text or "").casefold()))
+
+
+def score_relevance(result: SearchResult, query_words: set[str], rank: int) -> float:
+    """
+    How relevant `result` seems to be, from the query words in its title (counted double) and detail,
+    plus its `rank` (0-based) among its own collection's results.
+    """
+    rank_score = _RANK_WEIGHT / (1 + rank)
+    if not query_words:
+        return rank_score
+    n_in_title = len(query_words & _words(result.title))
+    n_in_detail = len(query_words & _words(result.detail))
+    return (2 * n_in_title + n_in_detail) / (3 * len(query_words)) + rank_score
+
+
+async def _next_or_none(iterator: AsyncIterator[SearchEvent]) -> SearchEvent | None:
+    return await anext(iterator, None)
+
+
+async def merge_events(
+    events: AsyncIterable[SearchEvent],
+    query: str,
+    *,
+    seen: SeenUrls | None,
+    window_size: int,
+    window_seconds: float,
+) -> AsyncIterable[SearchEvent]:
+    """
+    Drop results whose item was already seen (if `seen` is given),
+    and reorder the rest by relevance within a small window: the best of the buffered results is let out
+    whenever more than `window_size` are buffered, and all of them once the oldest has waited `window_seconds`.
+    Other events let out all buffered results first, so e.g. a collection's "done" still comes after its results.
+    """
+    query_words = _words(query)
+    rank_by_collection = Counter[str]()
+    n_buffered = itertools.count()  # tie-breaker, so equally relevant results keep their order
+    buffered: list[tuple[float, int, SearchEventResult]] = []
+    oldest_buffered_at: float | None = None
+    loop = asyncio.get_running_loop()
+
+    events_iterator = aiter(events)
+    next_event: asyncio.Task | None = None
+    try:
+        while True:
+            if next_event is None:
+                # not cancelled on a timeout, so the upstream search carries on while results are let out
+                next_event = asyncio.create_task(_next_or_none(events_iterator))
+            timeout = (
+                None if oldest_buffered_at is None else max(0.0, oldest_buffered_at + window_seconds - loop.time())
+            )
+            done, _ = await asyncio.wait({next_event}, timeout=timeout)
+            if not done:  # the window has passed
+                while buffered:
+                    yield heapq.heappop(buffered)[2]
+                oldest_buffered_at = None
+                continue
+
+            event = next_event.result()
+            next_event = None
+            if event is None:
+                break
+            if not isinstance(event, SearchEventResult):
+                while buffered:
+                    yield heapq.heappop(buffered)[2]
+                oldest_buffered_at = None
+                yield event
+                continue
+
+            collection_id = event.result.provided_by_collection.id
+            rank = rank_by_collection[collection_id]
+            rank_by_collection[collection_id] += 1
+            if seen is not None and not seen.add(event.result.url):
+                continue
+            score = score_relevance(event.result, query_words, rank)
+            heapq.heappush(buffered, (-score, next(n_buffered), event))
+            if oldest_buffered_at is None:
+                oldest_buffered_at = loop.time()
+            if len(buffered) > window_size:
+                yield heapq.heappop(buffered)[2]
+        while buffered:
+            yield heapq.heappop(buffered)[2]
+    finally:
+        # the consumer may stop early; stop the upstream search too
+        if next_event is not None:
+            next_event.cancel()
+            await asyncio.wait({next_event})
+        if isinstance(events, AsyncGenerator):
+            await events.aclose()
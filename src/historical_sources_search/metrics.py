@@ -0,0 +1,246 @@
+"""
+Timings (and a few other measurements) of the hot paths of a search, kept in memory for this process,
+and exported in Prometheus' text format (see `MetricsRegistry.render`).
+"""
+
+import bisect
+import math
+import time
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from contextlib import contextmanager
+from typing import ClassVar
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+_PREFIX = "historical_sources_search_"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+"""Upper bounds (in seconds) of histogram buckets, from a quick `evaluate` call up to a whole collection's search"""
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(label_names: Sequence[str], label_values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape_label_value(value)}"' for name, value in zip(label_names, label_values, strict=True)]
+    if extra:
+        pairs.append(extra)
+    return f"{{{','.join(pairs)}}}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return str(value)
+
+
+class _Metric:
+    type_name: ClassVar[str]
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        self.name = f"{_PREFIX}{name}"
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+
+    def _key(self, labels: dict[str, str]) -> tuple[str, ...]:
+        if labels.keys() != set(self.label_names):
+            raise ValueError(f"Metric {self.name!r} takes labels {self.label_names}, got {tuple(labels)}")
+        return tuple(labels[name] for name in self.label_names)
+
+    def _collect(self) -> Iterable[str]:
+        """Lines of samples, in Prometheus' text format"""
+        raise NotImplementedError("Must be implemented by child class")
+
+    def render(self) -> str:
+        header = f"# HELP {self.name} {self.documentation}\n# TYPE {self.name} {self.type_name}\n"
+        return header + "".join(f"{line}\n" for line in self._collect())
+
+
+class Counter(_Metric):
+    """A count that only goes up, e.g. of results found"""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        super().__init__(name, documentation, label_names)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def _collect(self) -> Iterable[str]:
+        for key, value in self._values.items():
+            yield f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+
+
+class Gauge(_Metric):
+    """A value that goes up and down; either set as it changes, or read by a function when exported"""
+
+    type_name = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: Sequence[str] = (),
+        function: Callable[[], float] | None = None,
+    ):
+        super().__init__(name, documentation, label_names)
+        self._values: dict[tuple[str, ...], float] = {}
+        self._function = function
+
+    def set(self, value: float, **labels: str):
+        self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: str):
+        self.inc(-amount, **labels)
+
+    def _collect(self) -> Iterable[str]:
+        if self._function is not None:
+            yield f"{self.name} {_format_value(self._function())}"
+            return
+        values = self._values if self._values or self.label_names else {(): 0.0}
+        for key, value in values.items():
+            yield f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+
+
+class _HistogramSeries:
+    def __init__(self, n_buckets: int):
+        self.bucket_counts = [0] * (n_buckets + 1)  # the last one is `+Inf`
+        self.sum = 0.0
+        self.count = 0
+
+
+class Histogram(_Metric):
+    """A distribution of durations (in seconds), counted into buckets"""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+        self._series: dict[tuple[str, ...], _HistogramSeries] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = _HistogramSeries(len(self.buckets))
+        series.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+        series.sum += value
+        series.count += 1
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Observe how long the `with` block takes (even if it raises)"""
+        self._key(labels)  # fail fast, rather than after the block
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _collect(self) -> Iterable[str]:
+        for key, series in self._series.items():
+            cumulative_count = 0
+            for bound, count in zip((*self.buckets, math.inf), series.bucket_counts, strict=True):
+                cumulative_count += count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative_count}"
+            labels = _format_labels(self.label_names, key)
+            yield f"{self.name}_sum{labels} {_format_value(series.sum)}"
+            yield f"{self.name}_count{labels} {series.count}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+
+    def register[M: _Metric](self, metric: M) -> M:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name!r} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """All metrics, in Prometheus' text exposition format"""
+        return "".join(metric.render() for metric in self._metrics.values())
+
+
+REGISTRY = MetricsRegistry()
+
+COLLECTION_SEARCH_SECONDS = REGISTRY.register(
+    Histogram(
+        "collection_search_seconds",
+        "Time from starting to search a collection until it ends, "
+        "including time paused while the client catches up; by how the search ended "
+        "(complete, truncated, timed_out, failed, unavailable, cancelled)",
+        ("collection", "outcome"),
+    )
+)
+COLLECTION_RESULTS = REGISTRY.register(
+    Counter("collection_results_total", "Results found in each collection", ("collection",))
+)
+SCRAPE_STEP_SECONDS = REGISTRY.register(
+    Histogram(
+        "scrape_step_seconds",
+        "Time spent in each step of getting a collection's pages of results "
+        "(browser: prepare_context, enter_query, wait_for_results, extract, advance_page, load_page; "
+        "HTTP: fetch_page, parse_page)",
+        ("collection", "step"),
+    )
+)
+RATE_LIMIT_WAIT_SECONDS = REGISTRY.register(
+    Histogram("rate_limit_wait_seconds", "Time waiting for the rate limit before a request to each host", ("host",))
+)
+BROWSER_PAGE_WAIT_SECONDS = REGISTRY.register(
+    Histogram("browser_page_wait_seconds", "Time waiting for a turn to use a browser page", ("collection",))
+)
+SEARCHES_IN_PROGRESS = REGISTRY.register(
+    Gauge("searches_in_progress", "Searches of all collections (or pages of them) currently running")
+)
+BROWSER_RESTARTS = REGISTRY.register(
+    Counter("browser_restarts_total", "Browsers replaced with a fresh one, by why", ("reason",))
+)
+BROWSER_TIMEOUT_SECONDS = REGISTRY.register(
+    Gauge(
+        "browser_timeout_seconds",
+        "Timeout currently used for each collection's browser operations, adapted to their recent latency "
+        "(wait_for_results, load_page, find_next_page, advance_page)",
+        ("collection", "operation"),
+    )
+)
+BROWSER_TIMEOUTS = REGISTRY.register(
+    Counter("browser_timeouts_total", "Browser operations that hit their timeout", ("collection", "operation"))
+)
+BROWSER_REQUESTS_BLOCKED = REGISTRY.register(
+    Counter(
+        "browser_requests_blocked_total",
+        "Requests of each collection's browser pages blocked by its resource policy, by resource type",
+        ("collection", "resource_type"),
+    )
+)
+BROWSER_REQUESTS_BLOCKED_BYTES_ESTIMATE = REGISTRY.register(
+    Counter(
+        "browser_requests_blocked_bytes_estimate_total",
+        "Estimate (from typical sizes of their resource types, not measured) of what blocked requests would have loaded",
+        ("collection",),
+    )
+)
+BROWSER_REQUESTS_ALLOWED = REGISTRY.register(
+    Counter(
+        "browser_requests_allowed_total",
+        "Requests of each collection's browser pages allowed by its resource policy",
+        ("collection",),
+    )
+)
@@ -0,0 +1,143 @@
+import asyncio
+import logging
+import time
+from datetime import UTC, datetime
+from email.utils import parsedate_to_datetime
+from typing import Any
+
+import httpx
+from pydantic import BaseModel
+
+from historical_sources_search.metrics import RATE_LIMIT_WAIT_SECONDS
+
+LOGGER = logging.getLogger(__name__)
+
+_STATUS_TOO_MANY_REQUESTS = 429
+_MIN_RATE_FRACTION = 1 / 16
+_RECOVERY_FRACTION = 0.1
+_BASE_BACKOFF_SECONDS = 1.0
+
+
+class HostRateLimitStats(BaseModel):
+    requests_per_second: float
+    blocked_for_seconds: float
+
+
+def _parse_retry_after(value: str | None) -> float | None:
+    """Parse a `Retry-After` header, which is either a number of seconds or an HTTP date"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=UTC)
+    return max(0.0, (retry_at - datetime.now(UTC)).total_seconds())
+
+
+class _HostBucket:
+    def __init__(self, requests_per_second: float, burst: int):
+        self.base_rate = requests_per_second
+        self.rate = requests_per_second
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+        self.n_consecutive_failures = 0
+        self.lock = asyncio.Lock()
+
+    def refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+
+class HostRateLimiter:
+    """
+    Token-bucket rate limiting of requests to each upstream host, shared by all collections and requests.
+
+    The rate backs off (multiplicatively) when a host responds with 429 or a 5xx status, and no more requests are sent
+    until its `Retry-After` has passed (or an exponential backoff, if it didn't say).
+    The rate then recovers gradually with each successful response.
+    """
+
+    def __init__(
+        self,
+        *,
+        requests_per_second: float,
+        burst: int,
+        requests_per_second_by_host: dict[str, float],
+        max_backoff_seconds: float,
+    ):
+        self.requests_per_second = requests_per_second
+        self.burst = burst
+        self.requests_per_second_by_host = requests_per_second_by_host
+        self.max_backoff_seconds = max_backoff_seconds
+        self._buckets: dict[str, _HostBucket] = {}
+
+    def _get_bucket(self, host: str) -> _HostBucket:
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            requests_per_second = self.requests_per_second_by_host.get(host, self.requests_per_second)
+            bucket = self._buckets[host] = _HostBucket(requests_per_second, self.burst)
+        return bucket
+
+    async def acquire(self, host: str):
+        """Wait until a request may be sent to `host`"""
+        bucket = self._get_bucket(host)
+        with RATE_LIMIT_WAIT_SECONDS.time(host=host):
+            async with bucket.lock:  # first come, first served
+                while True:
+                    now = time.monotonic()
+                    if bucket.blocked_until > now:
+                        await asyncio.sleep(bucket.blocked_until - now)
+                        continue
+                    bucket.refill(now)
+                    if bucket.tokens >= 1:
+                        bucket.tokens -= 1
+                        return
+                    await asyncio.sleep((1 - bucket.tokens) / bucket.rate)
+
+    def report(self, host: str, status_code: int, retry_after: str | None = None):
+        """Adapt the rate for `host` according to the status of a response from it"""
+        bucket = self._get_bucket(host)
+        if status_code == _STATUS_TOO_MANY_REQUESTS or status_code >= 500:
+            bucket.n_consecutive_failures += 1
+            bucket.rate = max(bucket.base_rate * _MIN_RATE_FRACTION, bucket.rate / 2)
+            backoff_seconds = _parse_retry_after(retry_after)
+            if backoff_seconds is None:
+                backoff_seconds = _BASE_BACKOFF_SECONDS * 2 ** (bucket.n_consecutive_failures - 1)
+            backoff_seconds = min(backoff_seconds, self.max_backoff_seconds)
+            bucket.blocked_until = max(bucket.blocked_until, time.monotonic() + backoff_seconds)
+            LOGGER.warning(
+                f"Host {host!r} responded with status {status_code}; "
+                f"backing off for {backoff_seconds:.1f}s, then {bucket.rate:.2f} request(s)/s"
+            )
+        elif status_code < 400:
+            bucket.n_consecutive_failures = 0
+            bucket.rate = min(bucket.base_rate, bucket.rate + bucket.base_rate * _RECOVERY_FRACTION)
+
+    def httpx_event_hooks(self) -> dict[str, list[Any]]:
+        """Event hooks that rate-limit every request sent by an `httpx.AsyncClient`"""
+
+        async def _on_request(request: httpx.Request):
+            await self.acquire(request.url.host)
+
+        async def _on_response(response: httpx.Response):
+            self.report(response.url.host, response.status_code, response.headers.get("Retry-After"))
+
+        return {"request": [_on_request], "response": [_on_response]}
+
+    def get_stats(self) -> dict[str, HostRateLimitStats]:
+        now = time.monotonic()
+        return {
+            host: HostRateLimitStats(
+                requests_per_second=bucket.rate,
+                blocked_for_seconds=max(0.0, bucket.blocked_until - now),
+            )
+            for host, bucket in self._buckets.items()
+        }
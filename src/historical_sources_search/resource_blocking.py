@@ -0,0 +1,150 @@
+import logging
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Self
+from urllib.parse import urlsplit
+
+from playwright.async_api import BrowserContext, Route
+from pydantic import BaseModel
+
+from historical_sources_search.env import Env
+from historical_sources_search.metrics import (
+    BROWSER_REQUESTS_ALLOWED,
+    BROWSER_REQUESTS_BLOCKED,
+    BROWSER_REQUESTS_BLOCKED_BYTES_ESTIMATE,
+)
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_BLOCKED_RESOURCE_TYPES = frozenset({"image", "media", "font"})
+"""
+Only the DOM's text and attributes are scraped, so none of these are needed to render it.
+Stylesheets are, since visibility checks (and `innerText`) depend on them.
+"""
+
+_TYPICAL_BYTES_BY_RESOURCE_TYPE = {
+    "image": 50_000,
+    "media": 500_000,
+    "font": 30_000,
+    "stylesheet": 20_000,
+    "script": 30_000,
+}
+"""Rough sizes of typical responses, to estimate what blocking saved (blocked requests are never sent)"""
+_TYPICAL_BYTES_OTHER = 5_000
+
+TRACKER_HOSTS = frozenset(
+    {
+        "doubleclick.net",
+        "facebook.net",
+        "google-analytics.com",
+        "googleadservices.com",
+        "googletagmanager.com",
+        "hotjar.com",
+        "newrelic.com",
+        "nr-data.net",
+        "quantserve.com",
+        "scorecardresearch.com",
+        "siteimproveanalytics.com",
+    }
+)
+"""Blocked along with all of their subdomains"""
+
+
+@dataclass(frozen=True)
+class ResourcePolicy:
+    """Which requests a collection's browser contexts don't need to make"""
+
+    blocked_resource_types: frozenset[str] = DEFAULT_BLOCKED_RESOURCE_TYPES
+    """Playwright resource types, e.g. `"image"` or `"stylesheet"`"""
+    blocked_hosts: frozenset[str] = TRACKER_HOSTS
+    allowed_url_patterns: tuple[re.Pattern[str], ...] = ()
+    """Requests whose URL matches any of these are never blocked"""
+
+    @classmethod
+    def from_env(cls, collection_id: str) -> Self:
+        """The default policy, with the collection's blocked resource types and allowed URLs (if any) from `Env`"""
+        env = Env.get()
+        blocked_resource_types = env.blocked_browser_resource_types_by_collection.get(collection_id)
+        return cls(
+            blocked_resource_types=(
+                DEFAULT_BLOCKED_RESOURCE_TYPES if blocked_resource_types is None else frozenset(blocked_resource_types)
+            ),
+            allowed_url_patterns=tuple(
+                re.compile(pattern)
+                for pattern in env.allowed_browser_resource_urls_by_collection.get(collection_id, [])
+            ),
+        )
+
+    def is_blocked(self, resource_type: str, url: str) -> bool:
+        if any(pattern.search(url) for pattern in self.allowed_url_patterns):
+            return False
+        if resource_type in self.blocked_resource_types:
+            return True
+        host = urlsplit(url).hostname or ""
+        return any(host == blocked or host.endswith(f".{blocked}") for blocked in self.blocked_hosts)
+
+
+class ResourceBlockingStats(BaseModel):
+    n_requests_allowed: int = 0
+    n_requests_blocked: int = 0
+    n_requests_blocked_by_type: dict[str, int] = {}
+    n_bytes_saved_estimate: int = 0
+    """
+    Roughly what the blocked requests would have loaded, estimated from typical sizes of their resource types
+    (blocked requests are never sent, so what they would have loaded can't be measured)
+    """
+
+    def minus(self, earlier: "ResourceBlockingStats") -> "ResourceBlockingStats":
+        """The counts since `earlier`, a snapshot of the same stats"""
+        return ResourceBlockingStats(
+            n_requests_allowed=(self.n_requests_allowed - earlier.n_requests_allowed),
+            n_requests_blocked=(self.n_requests_blocked - earlier.n_requests_blocked),
+            n_requests_blocked_by_type=dict(
+                Counter(self.n_requests_blocked_by_type) - Counter(earlier.n_requests_blocked_by_type)
+            ),
+            n_bytes_saved_estimate=(self.n_bytes_saved_estimate - earlier.n_bytes_saved_estimate),
+        )
+
+
+class ResourceBlocker:
+    """
+    Applies a collection's `ResourcePolicy` to a browser context through request routing, counting what it blocks.
+    Every count goes to both of `stats` (e.g. for one context) and `totals` (e.g. shared by a collection's contexts),
+    as well as to the metrics.
+
+    NOTE: routing disables the browser's HTTP cache for the context, so what is allowed is re-fetched on every page.
+    """
+
+    def __init__(
+        self,
+        collection_id: str,
+        policy: ResourcePolicy,
+        stats: ResourceBlockingStats,
+        totals: ResourceBlockingStats,
+    ):
+        self.collection_id = collection_id
+        self.policy = policy
+        self._all_stats = (stats, totals)
+
+    async def apply(self, context: BrowserContext):
+        await context.route("**/*", self._route)
+
+    async def _route(self, route: Route):
+        request = route.request
+        if self.policy.is_blocked(request.resource_type, request.url):
+            n_bytes_estimate = _TYPICAL_BYTES_BY_RESOURCE_TYPE.get(request.resource_type, _TYPICAL_BYTES_OTHER)
+            for stats in self._all_stats:
+                stats.n_requests_blocked += 1
+                stats.n_requests_blocked_by_type[request.resource_type] = (
+                    stats.n_requests_blocked_by_type.get(request.resource_type, 0) + 1
+                )
+                stats.n_bytes_saved_estimate += n_bytes_estimate
+            BROWSER_REQUESTS_BLOCKED.inc(collection=self.collection_id, resource_type=request.resource_type)
+            BROWSER_REQUESTS_BLOCKED_BYTES_ESTIMATE.inc(n_bytes_estimate, collection=self.collection_id)
+            await route.abort("blockedbyclient")
+        else:
+            for stats in self._all_stats:
+                stats.n_requests_allowed += 1
+            BROWSER_REQUESTS_ALLOWED.inc(collection=self.collection_id)
+            await route.fallback()
@@ -0,0 +1,138 @@
+import asyncio
+import logging
+import math
+import time
+from collections import defaultdict
+from collections.abc import AsyncIterator
+from contextlib import AsyncExitStack, asynccontextmanager
+
+from pydantic import BaseModel
+
+from historical_sources_search.exceptions import CapacityExceededError
+from historical_sources_search.metrics import BROWSER_PAGE_WAIT_SECONDS
+
+LOGGER = logging.getLogger(__name__)
+
+_EWMA_WEIGHT = 0.1
+
+
+class SchedulerStats(BaseModel):
+    n_active: int
+    n_active_by_collection: dict[str, int]
+    n_waiting: int
+    max_waiting: int
+    mean_wait_seconds: float
+    """Exponentially weighted moving average"""
+    mean_hold_seconds: float
+    """Exponentially weighted moving average"""
+    n_rejected: int
+    n_timed_out: int
+
+
+class PageScheduler:
+    """
+    Limits how many browser pages are in use at once, across all requests:
+    at most `max_pages` in total, and at most `max_pages_per_collection` for any one collection.
+
+    Callers wait (in a queue of at most `max_waiting`) for up to `wait_timeout_seconds` for their turn;
+    if the queue is full or the wait times out, `CapacityExceededError` is raised.
+    """
+
+    def __init__(self, *, max_pages: int, max_pages_per_collection: int, max_waiting: int, wait_timeout_seconds: float):
+        self.max_pages = max_pages
+        self.max_pages_per_collection = max_pages_per_collection
+        self.max_waiting = max_waiting
+        self.wait_timeout_seconds = wait_timeout_seconds
+        self._semaphore = asyncio.Semaphore(max_pages)
+        self._semaphores_by_collection: defaultdict[str, asyncio.Semaphore] = defaultdict(
+            lambda: asyncio.Semaphore(max_pages_per_collection)
+        )
+        self._n_active_by_collection: defaultdict[str, int] = defaultdict(int)
+        self._n_waiting = 0
+        self._mean_wait_seconds = 0.0
+        self._mean_hold_seconds = 0.0
+        self._n_rejected = 0
+        self._n_timed_out = 0
+
+    @property
+    def is_saturated(self) -> bool:
+        return self._n_waiting >= self.max_waiting
+
+    @property
+    def is_contended(self) -> bool:
+        """Whether anyone is waiting for a browser page right now"""
+        return self._n_waiting > 0
+
+    def _retry_after_seconds(self) -> float:
+        return max(1, math.ceil(self._mean_hold_seconds))
+
+    def check_admission(self):
+        """Reject new work up front (raising `CapacityExceededError`) if the wait queue is already full"""
+        if self.is_saturated:
+            self._n_rejected += 1
+            raise CapacityExceededError(
+                f"Too many searches waiting for a browser page ({self._n_waiting})",
+                retry_after_seconds=self._retry_after_seconds(),
+            )
+
+    @asynccontextmanager
+    async def slot(self, collection_id: str) -> AsyncIterator[None]:
+        """Wait for a turn to use a browser page for the given collection, and hold it for the `async with` block"""
+        self.check_admission()
+        async with AsyncExitStack() as stack:
+            self._n_waiting += 1
+            wait_start = time.monotonic()
+            try:
+                async with asyncio.timeout(self.wait_timeout_seconds):
+                    # per-collection first, so we don't hold a global slot while waiting on a busy collection
+                    await stack.enter_async_context(self._semaphores_by_collection[collection_id])
+                    await stack.enter_async_context(self._semaphore)
+            except TimeoutError:
+                self._n_timed_out += 1
+                raise CapacityExceededError(
+                    f"Timed out waiting for a browser page for {collection_id!r}",
+                    retry_after_seconds=self._retry_after_seconds(),
+                )
+            finally:
+                self._n_waiting -= 1
+                wait_seconds = time.monotonic() - wait_start
+                self._mean_wait_seconds += _EWMA_WEIGHT * (wait_seconds - self._mean_wait_seconds)
+                BROWSER_PAGE_WAIT_SECONDS.observe(wait_seconds, collection=collection_id)
+
+            self._n_active_by_collection[collection_id] += 1
+            hold_start = time.monotonic()
+            try:
+                yield
+            finally:
+                self._n_active_by_collection[collection_id] -= 1
+                hold_seconds = time.monotonic() - hold_start
+                self._mean_hold_seconds += _EWMA_WEIGHT * (hold_seconds - self._mean_hold_seconds)
+
+    @asynccontextmanager
+    async def slot_if_free(self, collection_id: str) -> AsyncIterator[bool]:
+        """
+        Hold a slot for the `async with` block if one is free right now, without waiting (nor jumping the queue);
+        yields whether it got one.
+        """
+        semaphore_collection = self._semaphores_by_collection[collection_id]
+        if self.is_contended or semaphore_collection.locked() or self._semaphore.locked():
+            yield False
+            return
+        async with semaphore_collection, self._semaphore:  # free, so these don't wait
+            self._n_active_by_collection[collection_id] += 1
+            try:
+                yield True
+            finally:
+                self._n_active_by_collection[collection_id] -= 1
+
+    def get_stats(self) -> SchedulerStats:
+        return SchedulerStats(
+            n_active=sum(self._n_active_by_collection.values()),
+            n_active_by_collection=dict(self._n_active_by_collection),
+            n_waiting=self._n_waiting,
+            max_waiting=self.max_waiting,
+            mean_wait_seconds=self._mean_wait_seconds,
+            mean_hold_seconds=self._mean_hold_seconds,
+            n_rejected=self._n_rejected,
+            n_timed_out=self._n_timed_out,
+        )
@@ -1,59 +1,281 @@
 import asyncio
 import logging
+import time
 from collections import deque
-from collections.abc import AsyncIterable
-
-import httpx
-from playwright.async_api import Browser
+from collections.abc import AsyncGenerator, AsyncIterable, Sequence
+from typing import Literal
 
+from historical_sources_search.cache import SearchCache
+from historical_sources_search.circuit_breaker import is_collection_unavailable
+from historical_sources_search.coalesce import SearchCoalescer
 from historical_sources_search.collections.base import CollectionBase
-from historical_sources_search.collections.constitution_annotated import CollectionConstitutionAnnotated
-from historical_sources_search.collections.facing_history import CollectionFacingHistory
-from historical_sources_search.collections.library_of_congress import CollectionLibraryOfCongress
+from historical_sources_search.collections.cached import CollectionCached
+from historical_sources_search.collections.coalesced import CollectionCoalesced
+from historical_sources_search.collections.indexed import CollectionIndexed
+from historical_sources_search.collections.registry import CollectionRegistry
 from historical_sources_search.env import Env
+from historical_sources_search.fair_queue import FairQueue
+from historical_sources_search.index import SearchIndex
+from historical_sources_search.merge import SeenUrls, merge_events
+from historical_sources_search.metrics import (
+    COLLECTION_RESULTS,
+    COLLECTION_SEARCH_SECONDS,
+    REGISTRY,
+    SEARCHES_IN_PROGRESS,
+    Gauge,
+)
+from historical_sources_search.search_event import (
+    SearchEvent,
+    SearchEventCollectionDone,
+    SearchEventCollectionError,
+    SearchEventPageEnd,
+    SearchEventResult,
+)
 from historical_sources_search.search_result import SearchResult
+from historical_sources_search.search_session import SearchSessionStore
 
 LOGGER = logging.getLogger(__name__)
 
+type _EventsQueue = FairQueue[str, SearchEvent]
+"""Events of each collection (by id), buffered separately"""
+
+_events_queues: set[_EventsQueue] = set()
+"""The results queues of all searches in progress"""
+REGISTRY.register(
+    Gauge(
+        "search_events_queue_depth",
+        "Search events found but not yet taken by clients, across all searches in progress",
+        function=lambda: sum(queue.qsize() for queue in _events_queues),
+    )
+)
+
+
+async def _search_collection(query: str, collection: CollectionBase, *, events_queue: _EventsQueue, deadline: float):
+    """Search a single collection until it runs out of results, reaches `deadline` (loop time), or fails"""
+    collection_info = collection.collection_info
+    max_results = Env.get().max_results_per_collection
+    n_results = 0
+    status: Literal["complete", "truncated", "timed_out"] = "complete"
+    outcome = "cancelled"  # unless it gets to end on its own
+    start = time.perf_counter()
+    results = collection.search(query)
+    try:
+        async with asyncio.timeout_at(deadline):
+            async for result in results:
+                if max_results is not None and n_results >= max_results:
+                    status = "truncated"
+                    break
+                # blocks while this collection's buffer is full, which pauses its search (down to turning pages)
+                # until the consumer catches up
+                await events_queue.put(collection_info.id, SearchEventResult(result=result))
+                n_results += 1
+                COLLECTION_RESULTS.inc(collection=collection_info.id)
+            if isinstance(results, AsyncGenerator):
+                await results.aclose()  # stop searching right away, e.g. to give back its browser page
+        outcome = status
+    except TimeoutError:
+        LOGGER.warning(f"Search of collection {collection_info.name!r} timed out for query {query!r}")
+        status = outcome = "timed_out"
+    except Exception as e:
+        if is_collection_unavailable(e):
+            outcome = "unavailable"
+            LOGGER.info(f"Skipped search of collection {collection_info.name!r} for query {query!r}: {e}")
+        else:
+            outcome = "failed"
+            LOGGER.exception(f"Search of collection {collection_info.name!r} failed for query {query!r}")
+        await events_queue.put(
+            collection_info.id,
+            SearchEventCollectionError(
+                collection=collection_info,
+                message=(str(e) or type(e).__name__),
+                n_results=n_results,
+            ),
+        )
+        return
+    finally:
+        COLLECTION_SEARCH_SECONDS.observe(time.perf_counter() - start, collection=collection_info.id, outcome=outcome)
+    await events_queue.put(
+        collection_info.id, SearchEventCollectionDone(collection=collection_info, status=status, n_results=n_results)
+    )
+
 
-async def _search_worker(query: str, *, collections: deque[CollectionBase], results_queue: asyncio.Queue[SearchResult]):
+async def _search_worker(
+    query: str,
+    *,
+    collections: deque[CollectionBase],
+    events_queue: _EventsQueue,
+    overall_deadline: float,
+):
+    env = Env.get()
+    loop = asyncio.get_running_loop()
     while True:
         try:
             collection = collections.popleft()
         except IndexError:  # `collections` is empty
             break
-        async for result in collection.search(query):
-            await results_queue.put(result)
+        collection_deadline_seconds = env.collection_deadline_seconds_by_collection.get(
+            collection.collection_info.id, env.collection_deadline_seconds
+        )
+        deadline = min(overall_deadline, loop.time() + collection_deadline_seconds)
+        await _search_collection(query, collection, events_queue=events_queue, deadline=deadline)
+
+
+async def warm_up_collections(registry: CollectionRegistry):
+    """Prepare resources for all collections ahead of the first search"""
+    collections = registry.get_many()
+    await asyncio.gather(*(collection.warm_up() for collection in collections))
+    LOGGER.info("Finished warming up collections")
+
+
+async def harvest_index(index: SearchIndex, registry: CollectionRegistry):
+    """Keep the local index filled with all collections' results for the seed queries, until cancelled"""
+    env = Env.get()
+    collections = registry.get_many()
+    await index.harvest(collections, env.index_seed_queries, env.index_harvest_pause_seconds)
+
 
+def _build_search_collections(
+    registry: CollectionRegistry,
+    cache: SearchCache,
+    coalescer: SearchCoalescer,
+    index: SearchIndex,
+    collection_ids: Sequence[str] | None,
+) -> list[CollectionBase]:
+    return [
+        CollectionCoalesced(CollectionCached(CollectionIndexed(collection, index), cache), coalescer)
+        for collection in registry.get_many(collection_ids)
+    ]
 
-async def search_all(query: str, httpx_client: httpx.AsyncClient, browser: Browser) -> AsyncIterable[SearchResult]:
-    LOGGER.debug(f"{httpx_client = }")
 
-    collections: deque[CollectionBase] = deque(
-        [
-            CollectionFacingHistory(browser),
-            CollectionLibraryOfCongress(browser),
-            CollectionConstitutionAnnotated(browser),
-            # TODO: add more collections
-        ]
+async def _search_collections_events(query: str, collections: deque[CollectionBase]) -> AsyncIterable[SearchEvent]:
+    env = Env.get()
+    # the first results represent every collection, rather than whichever is fastest
+    events_queue = FairQueue[str, SearchEvent](
+        env.search_events_buffer_per_collection, weights=env.search_events_weight_by_collection
     )
-    results_queue = asyncio.Queue[SearchResult]()
+    overall_deadline = asyncio.get_running_loop().time() + env.search_deadline_seconds
 
     async def _run_workers():
-        n_workers = min(len(collections), Env.get().n_search_workers)
+        n_workers = min(len(collections), env.n_search_workers)
         async with asyncio.TaskGroup() as tg:
             for _ in range(n_workers):
-                tg.create_task(_search_worker(query, collections=collections, results_queue=results_queue))
+                tg.create_task(
+                    _search_worker(
+                        query,
+                        collections=collections,
+                        events_queue=events_queue,
+                        overall_deadline=overall_deadline,
+                    )
+                )
             # the `asyncio.TaskGroup` context manager waits for workers to finish before closing
-        results_queue.shutdown()
+        await events_queue.shutdown()
 
     task_run_workers = asyncio.create_task(_run_workers())
+    _events_queues.add(events_queue)
+    SEARCHES_IN_PROGRESS.inc()
 
-    while True:
-        try:
-            result = await results_queue.get()
-        except asyncio.QueueShutDown:
-            break
-        yield result
+    try:
+        while True:
+            try:
+                event = await events_queue.get()
+            except asyncio.QueueShutDown:
+                break
+            yield event
+    finally:
+        # the consumer may stop early (e.g. a streaming client disconnected); don't keep searching for nobody
+        task_run_workers.cancel()
+        _events_queues.discard(events_queue)
+        SEARCHES_IN_PROGRESS.dec()
 
     task_run_workers.result()
+
+
+def search_all_events(
+    query: str,
+    registry: CollectionRegistry,
+    cache: SearchCache,
+    coalescer: SearchCoalescer,
+    index: SearchIndex,
+    collection_ids: Sequence[str] | None = None,
+) -> AsyncIterable[SearchEvent]:
+    """
+    Search all collections (or only those with `collection_ids`), yielding each result soon after it is found
+    (skipping duplicates, and reordered by relevance within a short window),
+    plus a "done" or "error" event as each collection finishes.
+    Collections that don't finish by their deadline (or the overall deadline) are cut off, keeping what they found.
+    """
+    env = Env.get()
+    collections = deque(_build_search_collections(registry, cache, coalescer, index, collection_ids))
+    return merge_events(
+        _search_collections_events(query, collections),
+        query,
+        seen=SeenUrls(env.dedup_max_exact_urls),
+        window_size=env.merge_window_size,
+        window_seconds=env.merge_window_seconds,
+    )
+
+
+async def search_page_events(
+    query: str,
+    limit: int,
+    cursor: str | None,
+    session_store: SearchSessionStore,
+    registry: CollectionRegistry,
+    cache: SearchCache,
+    coalescer: SearchCoalescer,
+    index: SearchIndex,
+    collection_ids: Sequence[str] | None = None,
+) -> AsyncIterable[SearchEvent]:
+    """
+    Search all collections (or only those with `collection_ids`) for one page of up to `limit` results,
+    starting where `cursor` left off (if given; it continues with the collections its search started with).
+    Ends with a "page_end" event, whose `next_cursor` continues the search (unless it has no more results).
+    """
+    async with session_store.open(
+        query,
+        cursor,
+        lambda cursor_collection_ids: _build_search_collections(
+            registry,
+            cache,
+            coalescer,
+            index,
+            (collection_ids if cursor_collection_ids is None else cursor_collection_ids),
+        ),
+    ) as session:
+        env = Env.get()
+        completed = False
+        SEARCHES_IN_PROGRESS.inc()
+        try:
+            # duplicates are already skipped by the session, across pages
+            events = merge_events(
+                session.next_page(limit),
+                query,
+                seen=None,
+                window_size=env.merge_window_size,
+                window_seconds=env.merge_window_seconds,
+            )
+            async for event in events:
+                yield event
+            completed = True
+        finally:
+            SEARCHES_IN_PROGRESS.dec()
+            if completed:
+                await session_store.release(session)
+            else:
+                # results may have been taken from the session but not delivered; don't continue from there
+                await session_store.discard(session)
+        yield SearchEventPageEnd(next_cursor=session.get_cursor())
+
+
+async def search_all(
+    query: str,
+    registry: CollectionRegistry,
+    cache: SearchCache,
+    coalescer: SearchCoalescer,
+    index: SearchIndex,
+    collection_ids: Sequence[str] | None = None,
+) -> AsyncIterable[SearchResult]:
+    """Search all collections, yielding only the results (including partial results of collections that failed)"""
+    async for event in search_all_events(query, registry, cache, coalescer, index, collection_ids):
+        if isinstance(event, SearchEventResult):
+            yield event.result
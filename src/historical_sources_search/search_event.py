@@ -0,0 +1,91 @@
+from typing import Literal
+
+from pydantic import BaseModel
+
+from historical_sources_search.search_result import CollectionInfo, SearchResult, SearchResultCompact
+
+type CollectionSearchStatus = Literal["complete", "truncated", "timed_out", "failed"]
+"""
+How the search of a collection ended:
+- `complete`: all of the collection's results were found
+- `truncated`: stopped after the maximum number of results per collection
+- `timed_out`: stopped at the deadline; results found before then were still returned
+- `failed`: stopped by an error; results found before then were still returned
+"""
+
+
+class SearchEventResult(BaseModel):
+    """A single search result was found"""
+
+    event: Literal["result"] = "result"
+    result: SearchResult
+
+
+class SearchEventResultCompact(BaseModel):
+    """A single search result was found; its collection's info was sent before, in a `SearchEventCollectionInfo`"""
+
+    event: Literal["result"] = "result"
+    result: SearchResultCompact
+
+
+class SearchEventCollectionInfo(BaseModel):
+    """A collection's info, sent (in compact mode) just before the first result that refers to it by id"""
+
+    event: Literal["collection"] = "collection"
+    collection: CollectionInfo
+
+
+class SearchEventCollectionDone(BaseModel):
+    """A collection has finished producing results"""
+
+    event: Literal["done"] = "done"
+    collection: CollectionInfo
+    status: Literal["complete", "truncated", "timed_out"]
+    n_results: int
+
+
+class SearchEventCollectionError(BaseModel):
+    """A collection failed partway through its search; no more results will come from it"""
+
+    event: Literal["error"] = "error"
+    collection: CollectionInfo
+    message: str
+    n_results: int
+
+
+class SearchEventPageEnd(BaseModel):
+    """The end of a page of results; pass `next_cursor` (if any) in a follow-up search to get the next page"""
+
+    event: Literal["page_end"] = "page_end"
+    next_cursor: str | None
+
+
+type SearchEvent = SearchEventResult | SearchEventCollectionDone | SearchEventCollectionError | SearchEventPageEnd
+type SearchEventCompact = (
+    SearchEventResultCompact
+    | SearchEventCollectionInfo
+    | SearchEventCollectionDone
+    | SearchEventCollectionError
+    | SearchEventPageEnd
+)
+"""The events of a search in compact mode, where results refer to their collections by id"""
+
+
+class CollectionSearchSummary(BaseModel):
+    collection: CollectionInfo
+    status: CollectionSearchStatus
+    n_results: int
+    message: str | None = None
+
+    @classmethod
+    def from_event(cls, event: SearchEventCollectionDone | SearchEventCollectionError) -> "CollectionSearchSummary":
+        match event:
+            case SearchEventCollectionDone():
+                return cls(collection=event.collection, status=event.status, n_results=event.n_results)
+            case SearchEventCollectionError():
+                return cls(
+                    collection=event.collection,
+                    status="failed",
+                    n_results=event.n_results,
+                    message=event.message,
+                )
@@ -2,6 +2,7 @@ from pydantic import BaseModel
 
 
 class CollectionInfo(BaseModel):
+    id: str
     name: str
     url: str
 
@@ -12,3 +13,24 @@ class SearchResult(BaseModel):
     detail: str | None
     image_src: str | None
     provided_by_collection: CollectionInfo
+
+
+class SearchResultCompact(BaseModel):
+    """A `SearchResult` that refers to the collection that provided it by id, rather than repeating its info"""
+
+    url: str
+    title: str
+    detail: str | None
+    image_src: str | None
+    collection_id: str
+
+    @classmethod
+    def from_result(cls, result: SearchResult) -> "SearchResultCompact":
+        # already validated as a `SearchResult`, so there's no need to do it again
+        return cls.model_construct(
+            url=result.url,
+            title=result.title,
+            detail=result.detail,
+            image_src=result.image_src,
+            collection_id=result.provided_by_collection.id,
+        )
@@ -0,0 +1,401 @@
+import asyncio
+import base64
+import binascii
+import json
+import logging
+import math
+import secrets
+import time
+from collections import OrderedDict, deque
+from collections.abc import AsyncGenerator, AsyncIterable, AsyncIterator, Callable
+from contextlib import asynccontextmanager
+from types import TracebackType
+from typing import Self
+
+from pydantic import BaseModel, ValidationError
+
+from historical_sources_search.circuit_breaker import is_collection_unavailable
+from historical_sources_search.collections.base import CollectionBase
+from historical_sources_search.env import Env
+from historical_sources_search.exceptions import InvalidCursorError
+from historical_sources_search.merge import SeenUrls
+from historical_sources_search.search_event import (
+    CollectionSearchStatus,
+    SearchEvent,
+    SearchEventCollectionDone,
+    SearchEventCollectionError,
+    SearchEventResult,
+)
+from historical_sources_search.search_result import SearchResult
+
+LOGGER = logging.getLogger(__name__)
+
+
+class _Cursor(BaseModel):
+    """What's encoded (opaquely, to clients) in a pagination cursor"""
+
+    session_id: str
+    query: str
+    n_returned_by_collection: dict[str, int]
+    """
+    Only for collections that may have more results; enough to re-derive the session
+    if it has expired (or has moved on, e.g. if the cursor is used again)
+    """
+
+
+def _encode_cursor(cursor: _Cursor) -> str:
+    return base64.urlsafe_b64encode(cursor.model_dump_json().encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> _Cursor:
+    try:
+        return _Cursor.model_validate_json(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, ValueError, ValidationError, json.JSONDecodeError) as e:
+        raise InvalidCursorError("Malformed cursor") from e
+
+
+class _CollectionProgress:
+    """How far along a paginated search is in a single collection"""
+
+    def __init__(self, collection: CollectionBase, query: str, n_skip: int, seen: SeenUrls):
+        self.collection = collection
+        self.query = query
+        self._seen = seen
+        self._results: AsyncIterator[SearchResult] | None = None
+        """Started when results are first needed, and stopped again while parked"""
+        self._n_skip = n_skip
+        self.buffered: deque[SearchResult] = deque()
+        self.n_returned = n_skip
+        self.status: CollectionSearchStatus | None = None
+        """Set once the collection will produce no more results"""
+        self.message: str | None = None
+        self.is_end_reported = False
+
+    @property
+    def is_exhausted(self) -> bool:
+        return self.status is not None and not self.buffered
+
+    async def _finish(self, status: CollectionSearchStatus, message: str | None = None):
+        self.status = status
+        self.message = message
+        await self.close()
+
+    @property
+    def is_live(self) -> bool:
+        return self._results is not None
+
+    async def close(self):
+        results, self._results = self._results, None
+        if isinstance(results, AsyncGenerator):
+            await results.aclose()  # e.g. to give back its browser page
+
+    async def park(self):
+        """
+        Stop the collection's search (giving back what it holds) but keep what's buffered;
+        filling again restarts the search and skips past everything fetched so far
+        """
+        if self.status is not None or self._results is None:
+            return
+        await self.close()
+        self._n_skip = self.n_returned + len(self.buffered)
+
+    async def fill(self, n_wanted: int, deadline: float):
+        """Fetch results until `n_wanted` are buffered, the collection runs out, or `deadline` (loop time) passes"""
+        collection_info = self.collection.collection_info
+        max_results = Env.get().max_results_per_collection
+        try:
+            async with asyncio.timeout_at(deadline):
+                while len(self.buffered) < n_wanted:
+                    if self._results is None:
+                        self._results = aiter(self.collection.search(self.query))
+                    try:
+                        result = await anext(self._results)
+                    except StopAsyncIteration:
+                        await self._finish("complete")
+                        return
+                    if self._n_skip > 0:  # already fetched before the session was re-derived (or parked)
+                        if self._n_skip > len(self.buffered):
+                            # already returned, not just buffered; so duplicates of it (from other collections)
+                            # are skipped, even in a re-derived session
+                            self._seen.add(result.url)
+                        self._n_skip -= 1
+                        continue
+                    if max_results is not None and self.n_returned + len(self.buffered) >= max_results:
+                        await self._finish("truncated")
+                        return
+                    self.buffered.append(result)
+        except TimeoutError:
+            LOGGER.warning(f"Search of collection {collection_info.name!r} timed out for query {self.query!r}")
+            await self._finish("timed_out")
+        except Exception as e:
+            if is_collection_unavailable(e):
+                LOGGER.info(f"Skipped search of collection {collection_info.name!r} for query {self.query!r}: {e}")
+            else:
+                LOGGER.exception(f"Search of collection {collection_info.name!r} failed for query {self.query!r}")
+            await self._finish("failed", str(e) or type(e).__name__)
+
+    def end_event(self) -> SearchEventCollectionDone | SearchEventCollectionError:
+        collection_info = self.collection.collection_info
+        if self.status == "failed":
+            return SearchEventCollectionError(
+                collection=collection_info,
+                message=(self.message or ""),
+                n_results=self.n_returned,
+            )
+        if self.status is None:
+            raise RuntimeError(f"Search of collection {collection_info.name!r} hasn't ended")
+        return SearchEventCollectionDone(collection=collection_info, status=self.status, n_results=self.n_returned)
+
+
+class SearchSession:
+    """
+    A search whose results are handed out a page at a time.
+    Between pages, each collection's search is left suspended where it stopped,
+    so the next page continues from there instead of starting over;
+    until the session is parked, which stops the searches (so they don't hold browser pages and the like)
+    and leaves the next page to restart them, skipping what was already fetched.
+    """
+
+    def __init__(
+        self,
+        session_id: str,
+        query: str,
+        collections: list[CollectionBase],
+        n_skip_by_collection: dict[str, int] | None = None,
+    ):
+        """If `n_skip_by_collection` is given, only those collections are searched, skipping that many results each"""
+        self.session_id = session_id
+        self.query = query
+        self._seen = SeenUrls(Env.get().dedup_max_exact_urls)
+        """
+        Items already handed out (on any page), so that duplicates (e.g. from other collections) are skipped.
+        A re-derived session only knows those of the collections it searches again
+        (not of those that had already run out).
+        """
+        self._progress = [
+            _CollectionProgress(
+                collection,
+                query,
+                n_skip=(0 if n_skip_by_collection is None else n_skip_by_collection[collection.collection_info.id]),
+                seen=self._seen,
+            )
+            for collection in collections
+            if n_skip_by_collection is None or collection.collection_info.id in n_skip_by_collection
+        ]
+        self.lock = asyncio.Lock()
+        """Held while a page is being produced (see `SearchSessionStore.open`)"""
+        self.last_used_at = time.monotonic()
+
+    @property
+    def has_more(self) -> bool:
+        return any(not progress.is_exhausted for progress in self._progress)
+
+    def get_cursor(self) -> str | None:
+        """A cursor to continue this session from its current position, or `None` if it has no more results"""
+        if not self.has_more:
+            return None
+        return _encode_cursor(
+            _Cursor(session_id=self.session_id, query=self.query, n_returned_by_collection=self._get_position())
+        )
+
+    def _get_position(self) -> dict[str, int]:
+        return {
+            progress.collection.collection_info.id: progress.n_returned
+            for progress in self._progress
+            if not progress.is_exhausted
+        }
+
+    def is_at(self, cursor: _Cursor) -> bool:
+        """Whether this session is still where `cursor` left it (i.e. hasn't handed out more pages since)"""
+        return cursor.session_id == self.session_id and cursor.n_returned_by_collection == self._get_position()
+
+    @property
+    def is_live(self) -> bool:
+        """Whether any collection's search is suspended (rather than parked or finished)"""
+        return any(progress.is_live for progress in self._progress)
+
+    async def park(self):
+        await asyncio.gather(*(progress.park() for progress in self._progress))
+
+    async def close(self):
+        await asyncio.gather(*(progress.close() for progress in self._progress))
+
+    async def next_page(self, limit: int) -> AsyncIterable[SearchEvent]:
+        """
+        Yield up to `limit` more results, taken from the collections in turn,
+        plus a "done" or "error" event for each collection that runs out along the way.
+        Each collection only fetches (e.g. turns upstream pages) until it has its share of the results buffered.
+        """
+        self.last_used_at = time.monotonic()
+        env = Env.get()
+        loop = asyncio.get_running_loop()
+        overall_deadline = loop.time() + env.search_deadline_seconds
+        n_yielded = 0
+        while True:
+            for progress in self._progress:
+                if progress.is_exhausted and not progress.is_end_reported:
+                    progress.is_end_reported = True
+                    yield progress.end_event()
+            remaining = [progress for progress in self._progress if not progress.is_exhausted]
+            if n_yielded >= limit or not remaining:
+                break
+
+            # each collection's share of the rest of this page
+            n_wanted = math.ceil((limit - n_yielded) / len(remaining))
+            now = loop.time()
+            await asyncio.gather(
+                *(
+                    progress.fill(
+                        n_wanted,
+                        deadline=min(
+                            overall_deadline,
+                            now
+                            + env.collection_deadline_seconds_by_collection.get(
+                                progress.collection.collection_info.id, env.collection_deadline_seconds
+                            ),
+                        ),
+                    )
+                    for progress in remaining
+                    if progress.status is None
+                )
+            )
+
+            # take results round-robin, so that no one collection crowds out the others
+            while n_yielded < limit and any(progress.buffered for progress in remaining):
+                for progress in remaining:
+                    if n_yielded < limit and progress.buffered:
+                        result = progress.buffered.popleft()
+                        progress.n_returned += 1
+                        if not self._seen.add(result.url):
+                            continue
+                        n_yielded += 1
+                        yield SearchEventResult(result=result)
+        self.last_used_at = time.monotonic()
+
+
+class SearchSessionStore:
+    """
+    Keeps paginated searches alive between pages, so that a cursor can resume one where it left off.
+    Sessions expire after `ttl_seconds` unused, and the least recently used ones are closed beyond `max_sessions`.
+    An expired session's cursor still works, by re-deriving its position (which re-fetches the skipped results);
+    as does a cursor used again, once its session has moved on to later pages.
+
+    Suspended searches hold browser pages (and the like), so only the `max_live_sessions` most recently used
+    sessions keep theirs, and only for `live_seconds` unused; other sessions are parked (see `SearchSession`).
+    """
+
+    def __init__(self, *, ttl_seconds: float, max_sessions: int, live_seconds: float, max_live_sessions: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self.live_seconds = live_seconds
+        self.max_live_sessions = max_live_sessions
+        self._sessions: OrderedDict[str, SearchSession] = OrderedDict()
+        self._park_task: asyncio.Task | None = None
+
+    async def __aenter__(self) -> Self:
+        self._park_task = asyncio.create_task(self._park_idle_periodically())
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ):
+        if self._park_task is not None:
+            self._park_task.cancel()
+        sessions = list(self._sessions.values())
+        self._sessions.clear()
+        await asyncio.gather(*(session.close() for session in sessions))
+
+    async def _evict(self):
+        expire_before = time.monotonic() - self.ttl_seconds
+        n_over = len(self._sessions) - self.max_sessions
+        evicted = [
+            session
+            for i, session in enumerate(self._sessions.values())
+            if (session.last_used_at < expire_before or i < n_over) and not session.lock.locked()
+        ]
+        for session in evicted:
+            del self._sessions[session.session_id]
+        await asyncio.gather(*(session.close() for session in evicted))
+
+    async def _park_idle(self, releasing: SearchSession | None = None):
+        """Park sessions beyond the limits, except those in use (apart from `releasing`, whose page is done)"""
+        park_before = time.monotonic() - self.live_seconds
+        n_live_allowed = self.max_live_sessions
+        parked = []
+        for session in reversed(self._sessions.values()):  # most recently used first
+            if (session.lock.locked() and session is not releasing) or not session.is_live:
+                continue
+            if n_live_allowed > 0 and session.last_used_at >= park_before:
+                n_live_allowed -= 1
+            else:
+                parked.append(session)
+        await asyncio.gather(*(session.park() for session in parked))
+
+    async def _park_idle_periodically(self):
+        while True:
+            await asyncio.sleep(max(self.live_seconds / 2, 1))
+            try:
+                await self._park_idle()
+            except Exception:
+                LOGGER.exception("Failed to park idle search sessions")
+
+    @asynccontextmanager
+    async def open(
+        self,
+        query: str,
+        cursor: str | None,
+        build_collections: Callable[[list[str] | None], list[CollectionBase]],
+    ) -> AsyncIterator[SearchSession]:
+        """
+        Get the session that `cursor` continues, or start a new one if there's no cursor; holding its lock,
+        so that concurrent requests with the same cursor take turns.
+        If the session has moved on from `cursor` (e.g. a page is requested again, after a dropped response),
+        or has expired, a new session is re-derived from `cursor`, so the same cursor always gives the same page.
+        To re-derive a session, `build_collections` is given the ids of the collections it needs; otherwise `None`.
+        """
+        await self._evict()
+        decoded = None if cursor is None else _decode_cursor(cursor)
+        if decoded is not None and decoded.query != query:
+            raise InvalidCursorError("Cursor is for a different query")
+
+        session = None if decoded is None else self._sessions.get(decoded.session_id)
+        if session is not None and decoded is not None:
+            self._sessions.move_to_end(session.session_id)
+            await session.lock.acquire()
+            # it may have been discarded (closed) or moved on while waiting for its turn
+            if self._sessions.get(session.session_id) is not session or not session.is_at(decoded):
+                session.lock.release()
+                LOGGER.info(f"Search session {decoded.session_id!r} has moved on; re-deriving it from its cursor")
+                session = None
+        elif decoded is not None:
+            LOGGER.info(f"Search session {decoded.session_id!r} has expired; re-deriving it from its cursor")
+
+        if session is None:
+            n_skip_by_collection = None if decoded is None else decoded.n_returned_by_collection
+            collections = build_collections(None if n_skip_by_collection is None else list(n_skip_by_collection))
+            session = SearchSession(secrets.token_urlsafe(16), query, collections, n_skip_by_collection)
+            self._sessions[session.session_id] = session
+            await session.lock.acquire()  # new, so not held by anyone else
+        try:
+            yield session
+        finally:
+            session.lock.release()
+
+    async def release(self, session: SearchSession):
+        """Done with a page of `session`; close it now if there's nothing left for a cursor to continue"""
+        if not session.has_more:
+            await self.discard(session)
+        else:
+            await self._park_idle(releasing=session)
+
+    async def discard(self, session: SearchSession):
+        """
+        Close `session` and forget it, e.g. if a page was abandoned partway through.
+        Its last cursor can still re-derive it.
+        """
+        if self._sessions.get(session.session_id) is session:
+            del self._sessions[session.session_id]
+        await session.close()
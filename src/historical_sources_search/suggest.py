@@ -0,0 +1,230 @@
+import asyncio
+import bisect
+import heapq
+import logging
+import time
+from collections import OrderedDict
+from collections.abc import AsyncIterable, Callable, Iterable, Sequence
+from dataclasses import dataclass
+from types import TracebackType
+from typing import Any, Self
+
+from pydantic import BaseModel
+
+from historical_sources_search.cache import normalize_query
+from historical_sources_search.index import SearchIndex
+from historical_sources_search.scheduler import PageScheduler
+
+LOGGER = logging.getLogger(__name__)
+
+_QUERY_WEIGHT = 3.0
+"""A past query counts for more than a result's title, since it's likelier to be searched (again)"""
+_TITLE_WEIGHT = 1.0
+_MAX_TEXT_CHARS = 100
+_MAX_SCANNED = 1_000
+"""Most completions of a prefix considered for ranking, so a short prefix doesn't scan the whole index"""
+
+
+class Suggestion(BaseModel):
+    text: str
+    is_past_query: bool
+    """Searched for exactly this before (otherwise, it's the title of a result)"""
+
+
+class SuggestionStats(BaseModel):
+    n_entries: int
+    n_prefetches: int
+    n_prefetches_in_flight: int
+
+
+@dataclass(slots=True)
+class _Entry:
+    text: str
+    weight: float
+    is_past_query: bool
+
+
+class SuggestionIndex:
+    """
+    Completions of query prefixes, from past queries and the titles of results found, ranked by how often each was seen
+    (past queries counting for more). Kept in memory as a sorted list, searched by bisection.
+    Once there are more than `max_entries`, the lowest ranked are dropped.
+
+    A query searched for by clients is only suggested once `query_min_clients` different clients have searched for it,
+    so one client's searches aren't shown to others, and one client can't plant suggestions.
+    """
+
+    def __init__(self, max_entries: int, *, query_min_clients: int):
+        self.max_entries = max_entries
+        self.query_min_clients = query_min_clients
+        self._keys: list[str] = []
+        """Normalized (see `normalize_query`), sorted"""
+        self._new_keys: list[str] = []
+        """Added since `_keys` was last sorted; merged in when suggestions are next asked for"""
+        self._entries: dict[str, _Entry] = {}
+        self._pending_queries: OrderedDict[str, set[str]] = OrderedDict()
+        """Clients that searched for each query (by key) that hasn't been searched for by enough of them yet"""
+
+    def add_query(self, query: str, client_id: str | None = None):
+        """
+        Count a search for `query` by the client `client_id`,
+        or by no client in particular if `None` (e.g. a seed query, which is suggested right away)
+        """
+        key = normalize_query(query)
+        entry = self._entries.get(key)
+        if client_id is None or (entry is not None and entry.is_past_query):
+            self._add(query, _QUERY_WEIGHT, is_past_query=True)
+            return
+        client_ids = self._pending_queries.pop(key, set())
+        client_ids.add(client_id)
+        if len(client_ids) < self.query_min_clients:
+            self._pending_queries[key] = client_ids  # as the most recently searched
+            if len(self._pending_queries) > self.max_entries:
+                self._pending_queries.popitem(last=False)
+            return
+        self._add(query, _QUERY_WEIGHT * len(client_ids), is_past_query=True)
+
+    def add_titles(self, titles: Iterable[str]):
+        for title in titles:
+            self._add(title, _TITLE_WEIGHT, is_past_query=False)
+
+    def _add(self, text: str, weight: float, *, is_past_query: bool):
+        text = " ".join(text.split())[:_MAX_TEXT_CHARS]
+        key = normalize_query(text)
+        if not key:
+            return
+        entry = self._entries.get(key)
+        if entry is None:
+            self._entries[key] = _Entry(text, weight, is_past_query)
+            self._new_keys.append(key)
+            if len(self._entries) > self.max_entries * 5 // 4:  # some slack, so pruning is rare
+                self._prune()
+            return
+        entry.weight += weight
+        if is_past_query and not entry.is_past_query:
+            entry.text, entry.is_past_query = text, True  # as it was typed, rather than as a title
+
+    def _prune(self):
+        kept = heapq.nlargest(self.max_entries, self._entries.items(), key=lambda item: item[1].weight)
+        self._entries = dict(kept)
+        self._keys = sorted(self._entries)
+        self._new_keys = []
+
+    def _merge_new_keys(self):
+        if self._new_keys:
+            self._keys += self._new_keys
+            self._keys.sort()  # cheap for Timsort, since all but the new keys are already a sorted run
+            self._new_keys = []
+
+    def suggest(self, prefix: str, limit: int) -> list[Suggestion]:
+        """The best ranked completions of `prefix` (including itself, if it was seen)"""
+        key = normalize_query(prefix)
+        if not key:
+            return []
+        if prefix[-1].isspace():
+            key += " "  # the last word is complete, so e.g. "civil " doesn't suggest "civilization"
+        self._merge_new_keys()
+        start = bisect.bisect_left(self._keys, key)
+        matches = []
+        for candidate in self._keys[start : start + _MAX_SCANNED]:
+            if not candidate.startswith(key):
+                break
+            matches.append(self._entries[candidate])
+        best = heapq.nlargest(limit, matches, key=lambda entry: entry.weight)
+        return [Suggestion(text=entry.text, is_past_query=entry.is_past_query) for entry in best]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+async def seed_suggestions(
+    suggestions: SuggestionIndex, index: SearchIndex, seed_queries: Sequence[str], *, max_titles: int
+):
+    """
+    Start suggestions off with the seed queries, and the titles harvested into the local index
+    (not the queries harvested, which include clients' searches that fell back to the collections)
+    """
+    titles = await index.get_recent_titles(max_titles)
+    suggestions.add_titles(titles)
+    queries = {normalize_query(query): query for query in seed_queries}
+    for query in queries.values():
+        suggestions.add_query(query)
+    LOGGER.info(f"Seeded suggestions with {len(titles)} title(s) and {len(queries)} query(ies)")
+
+
+class SearchPrefetcher:
+    """
+    Speculatively searches for the query a user is likely typing (the best suggestion that is a past query),
+    so its results are already cached (or being searched for) by the time the user actually searches.
+
+    To stay within budget: at most `max_in_flight` prefetches run at once, none start while anyone is waiting
+    for a browser page, prefixes need at least `min_prefix_chars`, and a query is prefetched at most once
+    per `repeat_seconds`.
+    """
+
+    def __init__(
+        self,
+        suggestions: SuggestionIndex,
+        search: Callable[[str], AsyncIterable[Any]],
+        scheduler: PageScheduler,
+        *,
+        max_in_flight: int,
+        min_prefix_chars: int,
+        repeat_seconds: float,
+    ):
+        self.suggestions = suggestions
+        self.search = search
+        self.scheduler = scheduler
+        self.max_in_flight = max_in_flight
+        self.min_prefix_chars = min_prefix_chars
+        self.repeat_seconds = repeat_seconds
+        self._in_flight: dict[str, asyncio.Task] = {}
+        self._prefetched_at: dict[str, float] = {}
+        self._n_prefetches = 0
+
+    async def __aenter__(self) -> Self:
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ):
+        for task in self._in_flight.values():
+            task.cancel()
+
+    def maybe_prefetch(self, prefix: str, completions: list[Suggestion]) -> str | None:
+        """Start prefetching the best of `completions` of `prefix`, if it's worth it; returns the query, if so"""
+        if len(self._in_flight) >= self.max_in_flight or len(prefix.strip()) < self.min_prefix_chars:
+            return None
+        if self.scheduler.is_contended:
+            return None  # real searches come first
+        query = next((completion.text for completion in completions if completion.is_past_query), None)
+        if query is None:
+            return None
+        key = normalize_query(query)
+        now = time.monotonic()
+        self._prefetched_at = {k: t for k, t in self._prefetched_at.items() if now - t < self.repeat_seconds}
+        if key in self._in_flight or key in self._prefetched_at:
+            return None
+        self._prefetched_at[key] = now
+        self._n_prefetches += 1
+        task = self._in_flight[key] = asyncio.create_task(self._prefetch(query))
+        task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return query
+
+    async def _prefetch(self, query: str):
+        LOGGER.info(f"Prefetching search for query {query!r}")
+        try:
+            async for _ in self.search(query):
+                pass
+        except Exception:
+            LOGGER.warning(f"Prefetching search for query {query!r} failed", exc_info=True)
+
+    def get_stats(self) -> SuggestionStats:
+        return SuggestionStats(
+            n_entries=len(self.suggestions),
+            n_prefetches=self._n_prefetches,
+            n_prefetches_in_flight=len(self._in_flight),
+        )
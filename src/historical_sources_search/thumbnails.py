@@ -0,0 +1,311 @@
+import asyncio
+import hashlib
+import io
+import logging
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from types import TracebackType
+from typing import Self
+from urllib.parse import urlencode, urljoin, urlsplit
+
+import httpx
+from PIL import Image, ImageOps
+from pydantic import BaseModel
+
+from historical_sources_search.exceptions import ImageFetchError, InvalidImageUrlError
+
+LOGGER = logging.getLogger(__name__)
+
+_MAX_SOURCE_BYTES = 20 << 20
+_MAX_REDIRECTS = 3
+_THUMBNAIL_FORMAT = "WEBP"  # small, and keeps transparency
+_THUMBNAIL_MEDIA_TYPE = "image/webp"
+_THUMBNAIL_QUALITY = 80
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS thumbnails (
+    url TEXT PRIMARY KEY,
+    content BLOB NOT NULL,
+    etag TEXT NOT NULL,
+    upstream_etag TEXT,
+    upstream_last_modified TEXT,
+    checked_at REAL NOT NULL,
+    used_at REAL NOT NULL,
+    n_bytes INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS thumbnails_used_at ON thumbnails (used_at);
+"""
+
+
+def get_thumbnail_url(image_src: str) -> str:
+    """Where the API serves a thumbnail of the image at `image_src`"""
+    return f"/thumb?{urlencode({'url': image_src})}"
+
+
+@dataclass(frozen=True)
+class Thumbnail:
+    content: bytes
+    media_type: str
+    etag: str
+    """Of the thumbnail itself (not of the upstream image)"""
+
+
+@dataclass(frozen=True)
+class _FetchedImage:
+    content: bytes | None
+    """`None` if the image wasn't modified since the version given by the request's validators"""
+    etag: str | None
+    last_modified: str | None
+
+
+@dataclass(frozen=True)
+class _StoredThumbnail:
+    thumbnail: Thumbnail
+    upstream_etag: str | None
+    upstream_last_modified: str | None
+    checked_at: float
+
+
+class ThumbnailStats(BaseModel):
+    hits: int
+    revalidated: int
+    """Served from disk after checking with the upstream host that the image hasn't changed"""
+    misses: int
+    n_entries: int
+    n_bytes: int
+
+
+def _make_thumbnail(source: bytes, size_px: int) -> bytes:
+    """Shrink an image to fit within `size_px` by `size_px` (keeping its aspect ratio)"""
+    try:
+        with Image.open(io.BytesIO(source)) as image:
+            image.draft("RGB", (size_px, size_px))  # lets JPEGs decode at a reduced size, which is much faster
+            thumbnail = ImageOps.exif_transpose(image)
+            thumbnail.thumbnail((size_px, size_px))
+            if thumbnail.mode not in {"RGB", "RGBA"}:
+                thumbnail = thumbnail.convert("RGBA" if "A" in thumbnail.getbands() else "RGB")
+            output = io.BytesIO()
+            thumbnail.save(output, _THUMBNAIL_FORMAT, quality=_THUMBNAIL_QUALITY)
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        raise ImageFetchError(f"Could not read image: {e}")
+    return output.getvalue()
+
+
+class _SqliteStore:
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            # readers don't block the writer (nor vice versa), so worker processes can share the file
+            self._connection.execute("PRAGMA journal_mode=WAL")
+        with self._lock, self._connection:
+            self._connection.executescript(_SCHEMA)
+
+    def get(self, url: str, now: float) -> _StoredThumbnail | None:
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                "SELECT content, etag, upstream_etag, upstream_last_modified, checked_at FROM thumbnails WHERE url = ?",
+                (url,),
+            ).fetchone()
+            if row is None:
+                return None
+            self._connection.execute("UPDATE thumbnails SET used_at = ? WHERE url = ?", (now, url))
+        content, etag, upstream_etag, upstream_last_modified, checked_at = row
+        return _StoredThumbnail(
+            thumbnail=Thumbnail(content=content, media_type=_THUMBNAIL_MEDIA_TYPE, etag=etag),
+            upstream_etag=upstream_etag,
+            upstream_last_modified=upstream_last_modified,
+            checked_at=checked_at,
+        )
+
+    def put(self, url: str, stored: _StoredThumbnail, max_bytes: int):
+        """Store a thumbnail, then evict the least recently used ones until all fit within `max_bytes`"""
+        content = stored.thumbnail.content
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO thumbnails "
+                "(url, content, etag, upstream_etag, upstream_last_modified, checked_at, used_at, n_bytes) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    url,
+                    content,
+                    stored.thumbnail.etag,
+                    stored.upstream_etag,
+                    stored.upstream_last_modified,
+                    stored.checked_at,
+                    stored.checked_at,
+                    len(content),
+                ),
+            )
+            (total_bytes,) = self._connection.execute("SELECT COALESCE(SUM(n_bytes), 0) FROM thumbnails").fetchone()
+            if total_bytes > max_bytes:
+                self._connection.execute(
+                    "DELETE FROM thumbnails WHERE url IN ("
+                    "SELECT url FROM ("
+                    "SELECT url, SUM(n_bytes) OVER (ORDER BY used_at DESC, url) AS newer_bytes FROM thumbnails"
+                    ") WHERE newer_bytes > ?)",
+                    (max_bytes,),
+                )
+
+    def mark_checked(self, url: str, checked_at: float):
+        with self._lock, self._connection:
+            self._connection.execute("UPDATE thumbnails SET checked_at = ? WHERE url = ?", (checked_at, url))
+
+    def get_size(self) -> tuple[int, int]:
+        with self._lock:
+            n_entries, n_bytes = self._connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(n_bytes), 0) FROM thumbnails"
+            ).fetchone()
+        return n_entries, n_bytes
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+class ThumbnailStore:
+    """
+    Makes thumbnails of result images, fetched through `httpx_client`, and keeps them in a SQLite database on disk;
+    the least recently used ones are evicted to stay within `max_bytes`.
+    After `revalidate_seconds`, a thumbnail is checked against its upstream image (with `ETag`/`Last-Modified`)
+    before being served again.
+
+    Only images on `allowed_domains` (or their subdomains) are fetched, so this isn't an open proxy.
+    """
+
+    def __init__(
+        self,
+        httpx_client: httpx.AsyncClient,
+        *,
+        sqlite_path: Path,
+        max_bytes: int,
+        size_px: int,
+        revalidate_seconds: float,
+        allowed_domains: list[str],
+    ):
+        self.httpx_client = httpx_client
+        self.max_bytes = max_bytes
+        self.size_px = size_px
+        self.revalidate_seconds = revalidate_seconds
+        self.allowed_domains = allowed_domains
+        self._db = _SqliteStore(sqlite_path)
+        self._in_flight: dict[str, asyncio.Task[Thumbnail]] = {}
+        self._hits = 0
+        self._revalidated = 0
+        self._misses = 0
+
+    async def __aenter__(self) -> Self:
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ):
+        for task in self._in_flight.values():
+            task.cancel()
+        self._db.close()
+
+    def is_allowed(self, url: str) -> bool:
+        parts = urlsplit(url)
+        host = parts.hostname or ""
+        return parts.scheme in {"http", "https"} and any(
+            host == domain or host.endswith(f".{domain}") for domain in self.allowed_domains
+        )
+
+    async def get(self, url: str) -> Thumbnail:
+        """A thumbnail of the image at `url`; concurrent requests for the same image share one fetch"""
+        if not self.is_allowed(url):
+            raise InvalidImageUrlError(f"Thumbnails are not available for `{url}`")
+        task = self._in_flight.get(url)
+        if task is None:
+            task = self._in_flight[url] = asyncio.create_task(self._get(url))
+            task.add_done_callback(lambda _: self._in_flight.pop(url, None))
+        return await asyncio.shield(task)  # one client giving up doesn't cancel it for the others
+
+    async def _get(self, url: str) -> Thumbnail:
+        now = time.time()
+        stored = await asyncio.to_thread(self._db.get, url, now)
+        if stored is not None and now - stored.checked_at <= self.revalidate_seconds:
+            self._hits += 1
+            return stored.thumbnail
+
+        headers = {}
+        if stored is not None:
+            if stored.upstream_etag is not None:
+                headers["If-None-Match"] = stored.upstream_etag
+            if stored.upstream_last_modified is not None:
+                headers["If-Modified-Since"] = stored.upstream_last_modified
+        try:
+            fetched = await self._fetch(url, headers)
+        except ImageFetchError:
+            if stored is None:
+                raise
+            LOGGER.warning(f"Failed to revalidate thumbnail of `{url}`; serving it as is", exc_info=True)
+            return stored.thumbnail
+
+        if fetched.content is None:
+            if stored is None:
+                raise ImageFetchError(f'`{url}` responded "not modified" to an unconditional request')
+            self._revalidated += 1
+            await asyncio.to_thread(self._db.mark_checked, url, now)
+            return stored.thumbnail
+
+        self._misses += 1
+        content = await asyncio.to_thread(_make_thumbnail, fetched.content, self.size_px)
+        thumbnail = Thumbnail(
+            content=content,
+            media_type=_THUMBNAIL_MEDIA_TYPE,
+            etag=f'"{hashlib.blake2b(content, digest_size=16).hexdigest()}"',
+        )
+        new_stored = _StoredThumbnail(
+            thumbnail=thumbnail,
+            upstream_etag=fetched.etag,
+            upstream_last_modified=fetched.last_modified,
+            checked_at=now,
+        )
+        await asyncio.to_thread(self._db.put, url, new_stored, self.max_bytes)
+        return thumbnail
+
+    async def _fetch(self, url: str, headers: dict[str, str]) -> _FetchedImage:
+        """Fetch an image, following redirects only to allowed hosts"""
+        for _ in range(_MAX_REDIRECTS + 1):
+            try:
+                async with self.httpx_client.stream("GET", url, headers=headers, follow_redirects=False) as response:
+                    if response.has_redirect_location:
+                        url = urljoin(url, response.headers["location"])
+                        if not self.is_allowed(url):
+                            raise ImageFetchError(f"Image redirects to a host that isn't allowed: `{url}`")
+                        continue
+                    etag, last_modified = response.headers.get("etag"), response.headers.get("last-modified")
+                    if response.status_code == httpx.codes.NOT_MODIFIED:
+                        return _FetchedImage(content=None, etag=etag, last_modified=last_modified)
+                    if not response.is_success:
+                        raise ImageFetchError(f"Fetching `{url}` failed with status {response.status_code}")
+                    content_type = response.headers.get("content-type", "")
+                    if not content_type.startswith("image/"):
+                        raise ImageFetchError(f"`{url}` is not an image (content type {content_type!r})")
+                    body = bytearray()
+                    async for chunk in response.aiter_bytes():
+                        body += chunk
+                        if len(body) > _MAX_SOURCE_BYTES:
+                            raise ImageFetchError(f"Image `{url}` is too large")
+                    return _FetchedImage(content=bytes(body), etag=etag, last_modified=last_modified)
+            except httpx.HTTPError as e:
+                raise ImageFetchError(f"Fetching `{url}` failed: {e}")
+        raise ImageFetchError(f"Too many redirects fetching `{url}`")
+
+    async def get_stats(self) -> ThumbnailStats:
+        n_entries, n_bytes = await asyncio.to_thread(self._db.get_size)  # a full scan, so not on the event loop
+        return ThumbnailStats(
+            hits=self._hits,
+            revalidated=self._revalidated,
+            misses=self._misses,
+            n_entries=n_entries,
+            n_bytes=n_bytes,
+        )
@@ -0,0 +1,184 @@
+"""
+Timeouts of the browser operations of each collection (e.g. waiting for its first results),
+adapted to how long the operations have recently taken (see `AdaptiveTimeouts`).
+"""
+
+import logging
+import math
+import time
+from collections import deque
+from collections.abc import Iterator, Mapping
+from contextlib import contextmanager
+from typing import Self
+
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+from pydantic import BaseModel
+
+from historical_sources_search.env import Env
+from historical_sources_search.exceptions import PageTimeoutError
+from historical_sources_search.metrics import BROWSER_TIMEOUT_SECONDS, BROWSER_TIMEOUTS
+
+LOGGER = logging.getLogger(__name__)
+
+INITIAL_TIMEOUT_SECONDS = {
+    "wait_for_results": 30.0,
+    "load_page": 30.0,
+    "find_next_page": 1.0,
+    "advance_page": 30.0,
+}
+"""Used until an operation has been timed enough times to adapt its timeout"""
+
+_all_timeouts: dict[str, "AdaptiveTimeouts"] = {}
+"""Of every collection that has any, by collection id"""
+
+
+class TimeoutStats(BaseModel):
+    timeout_seconds: float
+    """Currently used"""
+    n_samples: int
+    """In the rolling window the timeout is derived from"""
+    median_seconds: float | None
+    percentile_seconds: float | None
+    """At the percentile the timeout is derived from"""
+    n_timeouts: int
+
+
+class _Operation:
+    def __init__(self, initial_seconds: float, window: int):
+        self.samples: deque[float] = deque(maxlen=window)
+        self.timeout_seconds = initial_seconds
+        self.n_timeouts = 0
+        self.is_timeout_expected = False
+        """Whether it's waited on with `timeout_is_expected`; then its timeout only ever rises"""
+
+
+def _get_percentile(sorted_samples: list[float], percentile: float) -> float:
+    """Nearest-rank percentile"""
+    rank = math.ceil(percentile / 100 * len(sorted_samples))
+    return sorted_samples[max(rank, 1) - 1]
+
+
+class AdaptiveTimeouts:
+    """
+    Timeouts of a collection's browser operations, each derived from a rolling window of how long it recently took:
+    a high `percentile` of the last `window` durations, times a safety `multiplier`,
+    kept within the operation's `bounds_seconds` (operations without bounds keep their initial timeout).
+    Until an operation has `min_samples`, its initial timeout (see `INITIAL_TIMEOUT_SECONDS`) is used.
+
+    So fast pages aren't waited on for longer than they need, and slow ones are waited on for longer.
+    Operations for which timing out is a normal outcome (see `wait`) are only timed when they don't time out,
+    so their timeouts never fall (a run of fast waits would otherwise make a slow one look like a timeout).
+    """
+
+    def __init__(
+        self,
+        collection_id: str,
+        *,
+        window: int,
+        min_samples: int,
+        percentile: float,
+        multiplier: float,
+        bounds_seconds: Mapping[str, tuple[float, float]],
+    ):
+        self.collection_id = collection_id
+        self.window = window
+        self.min_samples = min_samples
+        self.percentile = percentile
+        self.multiplier = multiplier
+        self.bounds_seconds = bounds_seconds
+        self._operations: dict[str, _Operation] = {}
+        _all_timeouts[collection_id] = self
+
+    @classmethod
+    def from_env(cls, collection_id: str) -> Self:
+        env = Env.get()
+        return cls(
+            collection_id,
+            window=env.adaptive_timeout_window,
+            min_samples=env.adaptive_timeout_min_samples,
+            percentile=env.adaptive_timeout_percentile,
+            multiplier=env.adaptive_timeout_multiplier,
+            bounds_seconds=env.adaptive_timeout_bounds_seconds,
+        )
+
+    def _get_operation(self, operation: str) -> _Operation:
+        state = self._operations.get(operation)
+        if state is None:
+            initial_seconds = INITIAL_TIMEOUT_SECONDS.get(operation)
+            if initial_seconds is None:
+                bounds = self.bounds_seconds.get(operation)
+                if bounds is None:
+                    raise ValueError(f"Operation {operation!r} has neither an initial timeout nor bounds")
+                initial_seconds = bounds[1]
+            state = self._operations[operation] = _Operation(initial_seconds, self.window)
+            self._set_gauge(operation, state)
+        return state
+
+    def _set_gauge(self, operation: str, state: _Operation):
+        BROWSER_TIMEOUT_SECONDS.set(state.timeout_seconds, collection=self.collection_id, operation=operation)
+
+    def get(self, operation: str) -> float:
+        """The timeout (in seconds) to use for `operation` now"""
+        return self._get_operation(operation).timeout_seconds
+
+    def _record(self, operation: str, state: _Operation, seconds: float):
+        state.samples.append(seconds)
+        bounds = self.bounds_seconds.get(operation)
+        if bounds is None or len(state.samples) < self.min_samples:
+            return
+        min_seconds, max_seconds = bounds
+        percentile_seconds = _get_percentile(sorted(state.samples), self.percentile)
+        timeout_seconds = min(max(percentile_seconds * self.multiplier, min_seconds), max_seconds)
+        if state.is_timeout_expected:
+            timeout_seconds = max(timeout_seconds, state.timeout_seconds)
+        state.timeout_seconds = timeout_seconds
+        self._set_gauge(operation, state)
+
+    @contextmanager
+    def wait(self, operation: str, *, timeout_is_expected: bool = False) -> Iterator[float]:
+        """
+        Time an operation that waits for at most the yielded timeout (in milliseconds, as playwright takes it).
+
+        If it times out (playwright's expectations raise `AssertionError`, its other calls `TimeoutError`),
+        the timeout counts as hit, and as a sample of the timeout's duration, so repeated timeouts raise it,
+        and `PageTimeoutError` is raised (so it can't be mistaken for a bug, e.g. a failed `assert`);
+        unless timing out is a normal outcome (`timeout_is_expected`, e.g. no next page at the end of results),
+        in which case it isn't counted, only how long it takes when it doesn't time out is known
+        (so its timeout never falls), and the error is raised as is.
+        """
+        state = self._get_operation(operation)
+        state.is_timeout_expected |= timeout_is_expected
+        timeout_seconds = state.timeout_seconds
+        start = time.perf_counter()
+        try:
+            yield timeout_seconds * 1000
+        except (AssertionError, PlaywrightTimeoutError) as e:
+            if timeout_is_expected:
+                raise
+            state.n_timeouts += 1
+            BROWSER_TIMEOUTS.inc(collection=self.collection_id, operation=operation)
+            message = (
+                f"Collection {self.collection_id!r} operation {operation!r} timed out after {timeout_seconds:.2f}s"
+            )
+            LOGGER.info(message)
+            self._record(operation, state, timeout_seconds)
+            raise PageTimeoutError(message) from e
+        self._record(operation, state, time.perf_counter() - start)
+
+    def get_stats(self) -> dict[str, TimeoutStats]:
+        stats = {}
+        for operation, state in self._operations.items():
+            sorted_samples = sorted(state.samples)
+            stats[operation] = TimeoutStats(
+                timeout_seconds=state.timeout_seconds,
+                n_samples=len(sorted_samples),
+                median_seconds=(_get_percentile(sorted_samples, 50) if sorted_samples else None),
+                percentile_seconds=(_get_percentile(sorted_samples, self.percentile) if sorted_samples else None),
+                n_timeouts=state.n_timeouts,
+            )
+        return stats
+
+
+def get_timeout_stats() -> dict[str, dict[str, TimeoutStats]]:
+    """Of all collections' operations, by collection id, then operation"""
+    return {collection_id: timeouts.get_stats() for collection_id, timeouts in _all_timeouts.items()}
@@ -0,0 +1,54 @@
+from collections.abc import AsyncIterable, Iterator
+
+import pytest
+
+from historical_sources_search.collections.base import CollectionBase
+from historical_sources_search.env import Env
+from historical_sources_search.search_result import CollectionInfo, SearchResult
+
+
+class FakeCollection(CollectionBase):
+    """Produces `n_results` results (optionally failing after them), counting how its searches are run"""
+
+    def __init__(self, collection_id: str, n_results: int, *, error: Exception | None = None, host: str | None = None):
+        super().__init__(
+            collection_info=CollectionInfo(id=collection_id, name=collection_id, url=f"https://{collection_id}.test")
+        )
+        self.n_results = n_results
+        self.host = host or f"{collection_id}.test"
+        """Of results' URLs; collections with the same host produce the same items"""
+        self.error = error
+        self.n_searches = 0
+        self.n_fetched = 0
+        self.n_live = 0
+        """Searches started but not yet finished or closed"""
+
+    def make_result(self, i: int) -> SearchResult:
+        return SearchResult(
+            url=f"https://{self.host}/items/{i}",
+            title=f"Item {i}",
+            detail=None,
+            image_src=None,
+            provided_by_collection=self.collection_info,
+        )
+
+    async def search(self, query: str) -> AsyncIterable[SearchResult]:  # noqa: ARG002 (every query has the same results)
+        self.n_searches += 1
+        self.n_live += 1
+        try:
+            for i in range(self.n_results):
+                self.n_fetched += 1
+                yield self.make_result(i)
+            if self.error is not None:
+                raise self.error
+        finally:
+            self.n_live -= 1
+
+
+@pytest.fixture(autouse=True)
+def env(monkeypatch: pytest.MonkeyPatch) -> Iterator[pytest.MonkeyPatch]:
+    """Set environment variables (with `setenv`) for `Env` to read; they're forgotten after each test"""
+    Env.get.cache_clear()
+    yield monkeypatch
+    monkeypatch.undo()
+    Env.get.cache_clear()
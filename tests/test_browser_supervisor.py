@@ -0,0 +1,147 @@
+import asyncio
+from collections.abc import Callable
+from typing import Any, cast
+
+import pytest
+from playwright.async_api import Browser, BrowserContext
+
+from historical_sources_search import browser_supervisor
+from historical_sources_search.browser_supervisor import BrowserSupervisor
+
+
+class _FakeBrowser:
+    def __init__(self):
+        self.n_contexts = 0
+        self.is_closed = False
+        self._on_disconnected: Callable[[Any], None] | None = None
+
+    def on(self, event: str, callback: Callable[[Any], None]):
+        assert event == "disconnected"
+        self._on_disconnected = callback
+
+    def disconnect(self):
+        assert self._on_disconnected is not None
+        self._on_disconnected(self)
+
+    async def new_context(self, **_: Any) -> BrowserContext:
+        self.n_contexts += 1
+        return cast("BrowserContext", object())
+
+    async def close(self):
+        self.is_closed = True
+
+
+class _Launcher:
+    def __init__(self):
+        self.browsers: list[_FakeBrowser] = []
+
+    async def __call__(self) -> Browser:
+        self.browsers.append(_FakeBrowser())
+        return cast("Browser", self.browsers[-1])
+
+
+def _make_supervisor(
+    launcher: _Launcher,
+    *,
+    max_contexts: int | None = None,
+    max_memory_bytes: int | None = None,
+    drain_timeout_seconds: float = 10,
+) -> BrowserSupervisor:
+    return BrowserSupervisor(
+        launcher,
+        max_contexts=max_contexts,
+        max_memory_bytes=max_memory_bytes,
+        drain_timeout_seconds=drain_timeout_seconds,
+    )
+
+
+def test_replaced_after_max_contexts_and_old_browser_closed_once_released():
+    launcher = _Launcher()
+
+    async def _test():
+        async with _make_supervisor(launcher, max_contexts=2) as supervisor:
+            first, _ = await supervisor.new_context()
+            supervisor.acquire(first)
+            second, _ = await supervisor.new_context()
+            assert second is first
+            await asyncio.sleep(0)
+            assert len(launcher.browsers) == 2
+            assert supervisor.get_stats().n_draining == 1
+
+            third, _ = await supervisor.new_context()
+            assert third is not first  # the retired browser isn't used for new contexts
+            await asyncio.sleep(0.01)
+            assert not launcher.browsers[0].is_closed  # still in use
+
+            supervisor.release(first)
+            await asyncio.sleep(0.01)
+            assert launcher.browsers[0].is_closed
+            assert supervisor.get_stats().n_draining == 0
+        assert launcher.browsers[1].is_closed
+
+    asyncio.run(_test())
+
+
+def test_drain_times_out():
+    launcher = _Launcher()
+
+    async def _test():
+        async with _make_supervisor(launcher, max_contexts=1, drain_timeout_seconds=0.01) as supervisor:
+            generation, _ = await supervisor.new_context()
+            supervisor.acquire(generation)
+            await asyncio.sleep(0.05)
+            assert launcher.browsers[0].is_closed
+
+    asyncio.run(_test())
+
+
+def test_relaunched_when_disconnected():
+    launcher = _Launcher()
+
+    async def _test():
+        async with _make_supervisor(launcher) as supervisor:
+            launcher.browsers[0].disconnect()
+            generation, _ = await supervisor.new_context()
+            assert generation.number == 2
+            assert launcher.browsers[1].n_contexts == 1
+            await asyncio.sleep(0.01)
+            assert len(launcher.browsers) == 2  # not relaunched again in the background
+
+    asyncio.run(_test())
+
+
+def test_replaced_when_memory_exceeds_limit(monkeypatch: pytest.MonkeyPatch):
+    launcher = _Launcher()
+    # the replacement browser uses less memory
+    monkeypatch.setattr(
+        browser_supervisor, "browser_memory_bytes", lambda: 2000 if len(launcher.browsers) == 1 else 500
+    )
+    monkeypatch.setattr(browser_supervisor, "_CHECK_INTERVAL_SECONDS", 0.01)
+
+    async def _test():
+        async with _make_supervisor(launcher, max_memory_bytes=1000) as supervisor:
+            await asyncio.sleep(0.05)
+            assert supervisor.get_stats().memory_bytes == 500
+        assert len(launcher.browsers) == 2
+
+    asyncio.run(_test())
+
+
+def test_memory_unchecked_without_limit(monkeypatch: pytest.MonkeyPatch):
+    n_checks = 0
+
+    def _browser_memory_bytes() -> int:
+        nonlocal n_checks
+        n_checks += 1
+        return 2000
+
+    monkeypatch.setattr(browser_supervisor, "_CHECK_INTERVAL_SECONDS", 0.01)
+    monkeypatch.setattr(browser_supervisor, "browser_memory_bytes", _browser_memory_bytes)
+
+    async def _test():
+        async with _make_supervisor(_Launcher()) as supervisor:
+            await asyncio.sleep(0.05)
+            assert supervisor.get_stats().memory_bytes is None
+
+    asyncio.run(_test())
+    assert n_checks == 0
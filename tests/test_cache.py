@@ -0,0 +1,192 @@
+import asyncio
+import sqlite3
+import time
+from collections.abc import AsyncGenerator
+from pathlib import Path
+
+import pytest
+from conftest import FakeCollection
+
+from historical_sources_search.cache import SearchCache, normalize_query
+from historical_sources_search.collections.cached import CollectionCached
+
+
+def _make_cache(
+    sqlite_path: Path | None, *, max_entries: int = 10, ttl_seconds: float = 60, stale_seconds: float = 60
+) -> SearchCache:
+    return SearchCache(
+        max_entries=max_entries,
+        ttl_seconds=ttl_seconds,
+        ttl_seconds_by_collection={},
+        stale_seconds=stale_seconds,
+        sqlite_path=sqlite_path,
+    )
+
+
+def test_normalize_query():
+    assert normalize_query("  Abraham   LINCOLN ") == normalize_query("abraham lincoln") == "abraham lincoln"
+
+
+def test_memory_tier_hits_and_evicts_least_recently_used():
+    collection = FakeCollection("a", 0)
+
+    async def _test():
+        async with _make_cache(None, max_entries=2) as cache:
+            await cache.put("a", "one", [collection.make_result(1)])
+            await cache.put("a", "two", [collection.make_result(2)])
+            assert await cache.get("a", "ONE ") is not None  # now more recently used than "two"
+            await cache.put("a", "three", [collection.make_result(3)])
+            assert await cache.get("a", "two") is None
+            lookup = await cache.get("a", "one")
+            assert lookup is not None
+            assert lookup.entry.results == [collection.make_result(1)]
+            assert not lookup.is_stale
+            stats = cache.get_stats()
+            assert (stats.hits, stats.misses, stats.n_entries_memory) == (2, 1, 2)
+
+    asyncio.run(_test())
+
+
+def test_entries_go_stale_then_expire():
+    collection = FakeCollection("a", 0)
+
+    async def _test():
+        async with _make_cache(None, ttl_seconds=0.05, stale_seconds=0.1) as cache:
+            await cache.put("a", "query", [collection.make_result(0)])
+            await asyncio.sleep(0.08)
+            lookup = await cache.get("a", "query")
+            assert lookup is not None
+            assert lookup.is_stale
+            await asyncio.sleep(0.1)
+            assert await cache.get("a", "query") is None
+
+    asyncio.run(_test())
+
+
+def test_sqlite_tier_survives_restart_and_keeps_partial_flag(tmp_path: Path):
+    collection = FakeCollection("a", 0)
+    results = [collection.make_result(i) for i in range(3)]
+
+    async def _test():
+        async with _make_cache(tmp_path / "cache.sqlite3") as cache:
+            await cache.put("a", "query", results, is_complete=False)
+        async with _make_cache(tmp_path / "cache.sqlite3") as cache:
+            lookup = await cache.get("a", "Query")
+            assert lookup is not None
+            assert lookup.entry.results == results
+            assert not lookup.entry.is_complete
+
+    asyncio.run(_test())
+
+
+def test_sqlite_tier_migrates_old_table(tmp_path: Path):
+    path = tmp_path / "cache.sqlite3"
+    with sqlite3.connect(path) as connection:
+        connection.execute(
+            "CREATE TABLE search_cache (collection_id TEXT NOT NULL, query TEXT NOT NULL, "
+            "created_at REAL NOT NULL, results TEXT NOT NULL, PRIMARY KEY (collection_id, query))"
+        )
+        connection.execute("INSERT INTO search_cache VALUES ('a', 'query', ?, '[]')", (time.time(),))
+    connection.close()
+
+    async def _test():
+        async with _make_cache(path) as cache:
+            lookup = await cache.get("a", "query")
+            assert lookup is not None
+            assert lookup.entry.is_complete
+
+    asyncio.run(_test())
+
+
+def test_claims_are_exclusive_until_released_or_expired(tmp_path: Path):
+    async def _test():
+        async with _make_cache(tmp_path / "cache.sqlite3") as cache:
+            assert await cache.claim("a", "query", claim_seconds=0.1)
+            assert not await cache.claim("a", "QUERY", claim_seconds=0.1)
+            assert await cache.claim("b", "query", claim_seconds=0.1)  # other collections aren't affected
+            await asyncio.sleep(0.15)
+            assert await cache.claim("a", "query", claim_seconds=10)  # the first claim expired
+            await cache.release("a", "query")
+            assert await cache.claim("a", "query", claim_seconds=10)
+
+    asyncio.run(_test())
+
+
+def test_claims_always_succeed_without_sqlite():
+    async def _test():
+        async with _make_cache(None) as cache:
+            assert await cache.claim("a", "query", claim_seconds=10)
+            assert await cache.claim("a", "query", claim_seconds=10)
+
+    asyncio.run(_test())
+
+
+def test_wait_for_claim_gives_up_after_timeout(tmp_path: Path):
+    async def _test() -> float:
+        async with _make_cache(tmp_path / "cache.sqlite3") as cache:
+            assert await cache.claim("a", "query", claim_seconds=60)
+            start = time.monotonic()
+            assert await cache.wait_for_claim("a", "query", timeout_seconds=0.2) is None
+            return time.monotonic() - start
+
+    assert 0.2 <= asyncio.run(_test()) < 1
+
+
+def test_wait_for_claim_returns_what_the_owner_cached(tmp_path: Path):
+    collection = FakeCollection("a", 0)
+
+    async def _test():
+        async with _make_cache(tmp_path / "cache.sqlite3") as cache:
+            assert await cache.claim("a", "query", claim_seconds=60)
+
+            async def _owner():
+                await asyncio.sleep(0.1)
+                await cache.put("a", "query", [collection.make_result(0)])
+                await cache.release("a", "query")
+
+            owner = asyncio.create_task(_owner())
+            lookup = await cache.wait_for_claim("a", "query", timeout_seconds=5)
+            await owner
+            assert lookup is not None
+            assert lookup.entry.results == [collection.make_result(0)]
+
+    asyncio.run(_test())
+
+
+@pytest.mark.parametrize("use_sqlite", [False, True])
+def test_collection_cached_caches_partial_then_continues(tmp_path: Path, *, use_sqlite: bool):
+    collection = FakeCollection("a", 5)
+
+    async def _take(cached: CollectionCached, n: int) -> list[str]:
+        results = cached.search("query")
+        assert isinstance(results, AsyncGenerator)
+        urls = []
+        async for result in results:
+            urls.append(result.url)
+            if len(urls) >= n:
+                break
+        await results.aclose()
+        return urls
+
+    async def _test():
+        async with _make_cache(tmp_path / "cache.sqlite3" if use_sqlite else None) as cache:
+            cached = CollectionCached(collection, cache)
+            assert len(await _take(cached, 2)) == 2
+            lookup = await cache.get("a", "query")
+            assert lookup is not None
+            assert len(lookup.entry.results) == 2
+            assert not lookup.entry.is_complete
+
+            # served from the partial entry, without searching again
+            assert len(await _take(cached, 2)) == 2
+            assert collection.n_searches == 1
+
+            # continued live past the partial entry, which completes it
+            urls = await _take(cached, 10)
+            assert urls == [collection.make_result(i).url for i in range(5)]
+            lookup = await cache.get("a", "query")
+            assert lookup is not None
+            assert lookup.entry.is_complete
+            assert await cache.claim("a", "query", claim_seconds=10)  # every claim was released
+
+    asyncio.run(_test())
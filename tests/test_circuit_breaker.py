@@ -0,0 +1,163 @@
+import asyncio
+from collections.abc import AsyncIterable
+
+import pytest
+from conftest import FakeCollection
+
+from historical_sources_search.circuit_breaker import CircuitBreaker, CircuitBreakerStats, CircuitState
+from historical_sources_search.collections.breaker import CollectionWithCircuitBreaker
+from historical_sources_search.exceptions import CollectionUnavailableError, NavigationError
+
+
+def _make_breaker(*, open_seconds: float = 0.05) -> CircuitBreaker:
+    return CircuitBreaker("a", failure_threshold=2, open_seconds=open_seconds, max_open_seconds=1)
+
+
+async def _failing_probe():
+    raise NavigationError("still down")
+
+
+async def _succeeding_probe():
+    pass
+
+
+def test_opens_after_consecutive_failures():
+    async def _test() -> CircuitBreakerStats:
+        breaker = _make_breaker(open_seconds=60)
+        breaker.record_failure(NavigationError("down"), _failing_probe)
+        breaker.record_success()  # resets the streak
+        breaker.record_failure(NavigationError("down"), _failing_probe)
+        breaker.check()
+        assert breaker.state == "closed"
+        breaker.record_failure(NavigationError("down"), _failing_probe)
+        assert breaker.state == "open"
+        with pytest.raises(CollectionUnavailableError, match="down"):
+            breaker.check()
+        stats = breaker.get_stats()
+        breaker.cancel_probe()
+        return stats
+
+    stats = asyncio.run(_test())
+    assert (stats.n_failures, stats.consecutive_failures, stats.n_opened, stats.n_rejected) == (3, 2, 1, 1)
+    assert stats.retry_in_seconds is not None
+    assert stats.retry_in_seconds > 50
+
+
+def test_probe_closes_circuit():
+    async def _test() -> CircuitState:
+        breaker = _make_breaker()
+        for _ in range(2):
+            breaker.record_failure(NavigationError("down"), _succeeding_probe)
+        assert breaker.state == "open"
+        await asyncio.sleep(0.1)
+        breaker.check()
+        return breaker.state
+
+    assert asyncio.run(_test()) == "closed"
+
+
+def test_failed_probes_count_and_back_off():
+    async def _test() -> CircuitBreakerStats:
+        breaker = _make_breaker()
+        for _ in range(2):
+            breaker.record_failure(NavigationError("down"), _failing_probe)
+        await asyncio.sleep(0.08)  # the first probe (after 0.05s) has failed; the next is in 0.1s
+        stats = breaker.get_stats()
+        breaker.cancel_probe()
+        return stats
+
+    stats = asyncio.run(_test())
+    assert stats.state == "open"
+    assert stats.n_failures == stats.consecutive_failures == 3
+    assert stats.last_error == "still down"
+    assert stats.retry_in_seconds is not None
+    assert stats.retry_in_seconds > 0.05
+
+
+class _BuggyCollection(FakeCollection):
+    async def search(self, query: str) -> AsyncIterable:  # noqa: ARG002 (always fails)
+        raise AssertionError("a selector bug")
+        yield
+
+
+def test_collection_breaker_counts_only_upstream_failures():
+    async def _search(collection: CollectionWithCircuitBreaker) -> list:
+        return [result async for result in collection.search("query")]
+
+    async def _test():
+        breaker = _make_breaker(open_seconds=60)
+        buggy = CollectionWithCircuitBreaker(_BuggyCollection("a", 0), breaker, "probe")
+        for _ in range(3):
+            with pytest.raises(AssertionError):
+                await _search(buggy)
+        assert breaker.state == "closed"
+
+        down = CollectionWithCircuitBreaker(FakeCollection("a", 1, error=NavigationError("down")), breaker, "probe")
+        for _ in range(2):
+            with pytest.raises(NavigationError):
+                await _search(down)
+        assert breaker.state == "open"
+        with pytest.raises(CollectionUnavailableError):
+            await _search(down)
+        breaker.cancel_probe()
+
+    asyncio.run(_test())
+
+
+class _HangingCollection(FakeCollection):
+    async def search(self, query: str) -> AsyncIterable:  # noqa: ARG002 (never answers)
+        await asyncio.sleep(3600)
+        yield
+
+
+def test_collection_breaker_counts_searches_cancelled_at_deadline(env: pytest.MonkeyPatch):
+    env.setenv("COLLECTION_DEADLINE_SECONDS", "0.1")
+
+    async def _search(collection: CollectionWithCircuitBreaker, timeout_seconds: float):
+        async with asyncio.timeout(timeout_seconds):
+            async for _ in collection.search("query"):
+                pass
+
+    async def _test() -> CircuitBreakerStats:
+        breaker = _make_breaker(open_seconds=60)
+        hanging = CollectionWithCircuitBreaker(_HangingCollection("a", 0), breaker, "probe")
+        with pytest.raises(TimeoutError):
+            await _search(hanging, 0.01)  # e.g. the client left; not the collection's fault
+        assert breaker.get_stats().n_failures == 0
+        for _ in range(2):
+            with pytest.raises(TimeoutError):
+                await _search(hanging, 0.1)
+        stats = breaker.get_stats()
+        breaker.cancel_probe()
+        return stats
+
+    stats = asyncio.run(_test())
+    assert (stats.state, stats.n_failures) == ("open", 2)
+    assert stats.last_error is not None
+    assert stats.last_error.startswith("No results within")
+
+
+def test_hanging_probe_times_out(env: pytest.MonkeyPatch):
+    env.setenv("COLLECTION_DEADLINE_SECONDS", "0.05")
+
+    async def _test() -> CircuitBreakerStats:
+        breaker = _make_breaker(open_seconds=0.01)
+        hanging = CollectionWithCircuitBreaker(_HangingCollection("a", 0), breaker, "probe")
+        probed = asyncio.Event()
+
+        async def _probe():
+            try:
+                await hanging._probe()  # noqa: SLF001 (as the breaker would)
+            finally:
+                probed.set()
+
+        for _ in range(2):
+            breaker.record_failure(NavigationError("down"), _probe)
+        await asyncio.wait_for(probed.wait(), timeout=1)  # the first probe gave up
+        stats = breaker.get_stats()
+        breaker.cancel_probe()
+        return stats
+
+    stats = asyncio.run(_test())
+    assert stats.state == "open"
+    assert stats.last_error == "TimeoutError"
@@ -0,0 +1,89 @@
+import asyncio
+from collections.abc import AsyncGenerator
+
+import pytest
+from conftest import FakeCollection
+
+from historical_sources_search.coalesce import CoalescerStats, SearchCoalescer
+from historical_sources_search.exceptions import CollectionSearchError, NavigationError
+
+
+def test_concurrent_searches_share_one_run():
+    async def _test() -> tuple[list[str], list[str], int, CoalescerStats]:
+        collection = FakeCollection("a", 5)
+        async with SearchCoalescer(read_ahead=5) as coalescer:
+
+            async def _search() -> list[str]:
+                return [result.url async for result in coalescer.search(collection, "Query")]
+
+            first, second = await asyncio.gather(_search(), _search())
+            stats = coalescer.get_stats()
+        return first, second, collection.n_searches, stats
+
+    first, second, n_searches, stats = asyncio.run(_test())
+    assert first == second
+    assert len(first) == 5
+    assert n_searches == 1
+    assert stats.n_subscriptions_joined == 1
+    assert stats.n_runs_in_flight == 0
+
+
+@pytest.mark.parametrize("read_ahead", [0, 3])
+def test_run_fetches_only_as_far_as_wanted_and_stops_when_abandoned(read_ahead: int):
+    async def _test() -> tuple[int, int, int]:
+        collection = FakeCollection("a", 100)
+        async with SearchCoalescer(read_ahead=read_ahead) as coalescer:
+            results = coalescer.search(collection, "query")
+            assert isinstance(results, AsyncGenerator)
+            async for _ in results:
+                break
+            await asyncio.sleep(0.01)
+            n_fetched = collection.n_fetched
+            await results.aclose()
+            await asyncio.sleep(0.01)
+        return n_fetched, collection.n_live, collection.n_fetched
+
+    n_fetched_while_subscribed, n_live, n_fetched = asyncio.run(_test())
+    assert 1 + read_ahead <= n_fetched_while_subscribed <= 2 + read_ahead
+    assert n_live == 0  # the underlying search was closed
+    assert n_fetched == n_fetched_while_subscribed
+
+
+def test_run_reads_ahead_in_batches_as_subscriber_catches_up():
+    async def _test() -> list[int]:
+        collection = FakeCollection("a", 100)
+        n_fetched: list[int] = []
+        async with SearchCoalescer(read_ahead=4) as coalescer:
+            results = coalescer.search(collection, "query")
+            assert isinstance(results, AsyncGenerator)
+            for _ in range(4):
+                await anext(results)
+                await asyncio.sleep(0.01)
+                n_fetched.append(collection.n_fetched)
+            await results.aclose()
+        return n_fetched
+
+    # stays at most 4 ahead of what was asked for, refilling once fewer than 2 are ahead
+    assert asyncio.run(_test()) == [5, 5, 5, 8]
+
+
+def test_failure_reaches_every_subscriber_after_partial_results():
+    async def _test() -> tuple[list[str], list[str]]:
+        collection = FakeCollection("a", 2, error=NavigationError("down"))
+        async with SearchCoalescer(read_ahead=5) as coalescer:
+
+            async def _collect(urls: list[str]):
+                async for result in coalescer.search(collection, "query"):
+                    urls.append(result.url)  # noqa: PERF401 (keeps what was found before the error)
+
+            async def _search() -> list[str]:
+                urls: list[str] = []
+                with pytest.raises(CollectionSearchError, match="down"):
+                    await _collect(urls)
+                return urls
+
+            first, second = await asyncio.gather(_search(), _search())
+            return first, second
+
+    first, second = asyncio.run(_test())
+    assert len(first) == len(second) == 2
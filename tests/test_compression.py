@@ -0,0 +1,94 @@
+import asyncio
+import zlib
+
+import brotli
+import pytest
+import zstandard
+from starlette.types import Message, Receive, Scope, Send
+
+from historical_sources_search.compression import CompressionMiddleware, Encoding, compress, negotiate_encoding
+
+_BODY = b'{"results": [' + b'{"title": "Item", "url": "https://example.com/item"},' * 100 + b"]}"
+
+
+def _decompress(data: bytes, encoding: Encoding) -> bytes:
+    match encoding:
+        case "zstd":
+            return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+        case "br":
+            return brotli.decompress(data)
+        case "gzip":
+            return zlib.decompress(data, 16 + zlib.MAX_WBITS)
+
+
+@pytest.mark.parametrize("encoding", ["zstd", "br", "gzip"])
+def test_compress_round_trip(encoding: Encoding):
+    compressed = compress(_BODY, encoding)
+    assert len(compressed) < len(_BODY)
+    assert _decompress(compressed, encoding) == _BODY
+
+
+@pytest.mark.parametrize(
+    ("accept_encoding", "expected"),
+    [
+        ("gzip, deflate, br, zstd", "zstd"),
+        ("gzip, br", "br"),
+        ("gzip;q=1.0, br;q=0.5", "gzip"),
+        ("br;q=0, gzip", "gzip"),
+        ("*", "zstd"),
+        ("identity", None),
+        ("", None),
+        ("gzip;q=oops", None),
+    ],
+)
+def test_negotiate_encoding(accept_encoding: str, expected: Encoding | None):
+    assert negotiate_encoding(accept_encoding) == expected
+
+
+async def _call(
+    body_chunks: list[bytes], *, accept_encoding: str, media_type: str = "application/json"
+) -> list[Message]:
+    async def _app(scope: Scope, receive: Receive, send: Send):  # noqa: ARG001 (only sends)
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", media_type.encode())]})
+        for i, chunk in enumerate(body_chunks):
+            await send({"type": "http.response.body", "body": chunk, "more_body": i < len(body_chunks) - 1})
+
+    async def _receive() -> Message:
+        return {"type": "http.request"}
+
+    sent: list[Message] = []
+
+    async def _send(message: Message):
+        sent.append(message)
+
+    scope = {"type": "http", "headers": [(b"accept-encoding", accept_encoding.encode())]}
+    await CompressionMiddleware(_app, minimum_size=100)(scope, _receive, _send)
+    return sent
+
+
+def test_middleware_compresses_whole_body():
+    sent = asyncio.run(_call([_BODY], accept_encoding="gzip"))
+    headers = dict(sent[0]["headers"])
+    assert headers[b"content-encoding"] == b"gzip"
+    assert int(headers[b"content-length"]) == len(sent[1]["body"])
+    assert _decompress(sent[1]["body"], "gzip") == _BODY
+
+
+def test_middleware_flushes_each_streamed_chunk():
+    chunks = [b'{"event": "result"}\n' * 3, b'{"event": "done"}\n']
+    sent = asyncio.run(_call(chunks, accept_encoding="zstd", media_type="application/x-ndjson"))
+    assert b"content-length" not in dict(sent[0]["headers"])
+    decompressor = zstandard.ZstdDecompressor().decompressobj()
+    # each chunk decodes on its own, without waiting for the rest of the stream
+    assert decompressor.decompress(sent[1]["body"]) == chunks[0]
+    assert decompressor.decompress(sent[2]["body"]) == chunks[1]
+
+
+@pytest.mark.parametrize(
+    ("body", "media_type"),
+    [(b"{}", "application/json"), (_BODY, "image/webp")],
+)
+def test_middleware_passes_through_small_or_incompressible(body: bytes, media_type: str):
+    sent = asyncio.run(_call([body], accept_encoding="gzip", media_type=media_type))
+    assert b"content-encoding" not in dict(sent[0]["headers"])
+    assert sent[1]["body"] == body
@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+
+from historical_sources_search.fair_queue import FairQueue
+
+
+async def _drain(queue: FairQueue[str, str]) -> list[str]:
+    items = []
+    while True:
+        try:
+            items.append(await queue.get())
+        except asyncio.QueueShutDown:
+            return items
+
+
+def test_takes_sources_in_turn():
+    async def _test() -> list[str]:
+        queue = FairQueue[str, str](10)
+        for i in range(4):
+            await queue.put("fast", f"fast{i}")
+        await queue.put("slow", "slow0")
+        await queue.shutdown()
+        return await _drain(queue)
+
+    assert asyncio.run(_test()) == ["fast0", "slow0", "fast1", "fast2", "fast3"]
+
+
+def test_weights_give_more_turns():
+    async def _test() -> list[str]:
+        queue = FairQueue[str, str](10, weights={"a": 2})
+        for i in range(4):
+            await queue.put("a", f"a{i}")
+            await queue.put("b", f"b{i}")
+        await queue.shutdown()
+        return await _drain(queue)
+
+    assert asyncio.run(_test()) == ["a0", "a1", "b0", "a2", "a3", "b1", "b2", "b3"]
+
+
+def test_full_source_waits_without_blocking_others():
+    async def _test() -> list[str]:
+        queue = FairQueue[str, str](2)
+        await queue.put("a", "a0")
+        await queue.put("a", "a1")
+        put_a = asyncio.create_task(queue.put("a", "a2"))
+        await asyncio.sleep(0)
+        assert not put_a.done()  # "a" is full
+        await asyncio.wait_for(queue.put("b", "b0"), timeout=1)  # "b" isn't
+        assert queue.qsize() == 3
+
+        assert await queue.get() == "a0"
+        await asyncio.wait_for(put_a, timeout=1)
+        await queue.shutdown()
+        return await _drain(queue)
+
+    assert asyncio.run(_test()) == ["b0", "a1", "a2"]
+
+
+def test_shutdown_rejects_puts_but_keeps_buffered():
+    async def _test():
+        queue = FairQueue[str, str](2)
+        await queue.put("a", "a0")
+        await queue.shutdown()
+        with pytest.raises(asyncio.QueueShutDown):
+            await queue.put("a", "a1")
+        assert await queue.get() == "a0"
+        with pytest.raises(asyncio.QueueShutDown):
+            await queue.get()
+
+    asyncio.run(_test())
+
+
+def test_shutdown_wakes_waiting_get():
+    async def _test():
+        queue = FairQueue[str, str](2)
+        get = asyncio.create_task(queue.get())
+        await asyncio.sleep(0)
+        await queue.shutdown()
+        with pytest.raises(asyncio.QueueShutDown):
+            await asyncio.wait_for(get, timeout=1)
+
+    asyncio.run(_test())
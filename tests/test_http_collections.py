@@ -0,0 +1,133 @@
+import asyncio
+import json
+from collections.abc import Callable
+from typing import Any
+
+import httpx
+import pytest
+
+from historical_sources_search.collections.base_http_paging import CollectionBaseHttpPaging
+from historical_sources_search.collections.constitution_annotated import CollectionConstitutionAnnotatedHttp
+from historical_sources_search.collections.facing_history import CollectionFacingHistoryHttp
+from historical_sources_search.collections.library_of_congress import CollectionLibraryOfCongressHttp
+from historical_sources_search.exceptions import MissingInformationError, NavigationError
+from historical_sources_search.search_result import SearchResult
+
+type Handler = Callable[[httpx.Request], httpx.Response]
+
+
+def _search(
+    make_collection: Callable[[httpx.AsyncClient], CollectionBaseHttpPaging], handler: Handler
+) -> list[SearchResult]:
+    async def _test() -> list[SearchResult]:
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return [result async for result in make_collection(client).search("civil war")]
+
+    return asyncio.run(_test())
+
+
+def _html(body: str) -> httpx.Response:
+    return httpx.Response(200, headers={"content-type": "text/html"}, text=f"<html><body>{body}</body></html>")
+
+
+def _facing_history_card(i: int) -> str:
+    return f"""
+        <div class="card">
+            <a class="card__link" href="/resource-library/item-{i}"></a>
+            <div class="card__header"> Item {i} </div>
+            <div class="card__summary">About item {i}</div>
+            <div class="card__image"><img src="/images/{i}.jpg"></div>
+        </div>
+    """
+
+
+def test_facing_history_pages():
+    def _handler(request: httpx.Request) -> httpx.Response:
+        assert request.url.params["keys"] == "civil war"
+        if request.url.params.get("page") == "1":
+            return _html(f'<div class="card-list">{_facing_history_card(2)}</div>')
+        next_page = '<ul><li class="pager__item--next"><a href="?keys=civil+war&page=1">Next</a></li></ul>'
+        # a card without a link is skipped
+        cards = _facing_history_card(0) + _facing_history_card(1) + '<div class="card"><div class="card__header">'
+        return _html(f'<div class="card-list">{cards}</div>{next_page}')
+
+    results = _search(CollectionFacingHistoryHttp, _handler)
+    assert [result.title for result in results] == ["Item 0", "Item 1", "Item 2"]
+    assert results[0].url == "https://www.facinghistory.org/resource-library/item-0"
+    assert results[0].detail == "About item 0"
+    assert results[0].image_src == "https://www.facinghistory.org/images/0.jpg"
+
+
+@pytest.mark.parametrize(
+    ("make_collection", "no_results_page"),
+    [
+        (CollectionFacingHistoryHttp, '<div class="search-no-results-message">No results</div>'),
+        (CollectionConstitutionAnnotatedHttp, '<div title="no-results">No results</div>'),
+    ],
+)
+def test_html_no_results_and_unrecognized_pages(
+    make_collection: Callable[[httpx.AsyncClient], CollectionBaseHttpPaging], no_results_page: str
+):
+    assert _search(make_collection, lambda _: _html(no_results_page)) == []
+    with pytest.raises(MissingInformationError, match="neither results nor"):
+        _search(make_collection, lambda _: _html("<p>Are you a robot?</p>"))
+
+
+def test_constitution_annotated_follows_numbered_pages():
+    def _handler(request: httpx.Request) -> httpx.Response:
+        assert request.url.raw_path.startswith(b"/search/civil%20war")
+        page_number = int(request.url.params.get("page", "1"))
+        pagination = "".join(f'<a href="?page={n}"> {n} </a>' for n in range(1, 3))
+        return _html(f"""
+            <ul class="search-results"><li>
+                <div class="search-results-title"><a href="/browse/item-{page_number}">Item {page_number}</a></div>
+                <div class="search-results-summary">About</div>
+            </li></ul>
+            <div class="search-results-control-pagination">{pagination}</div>
+        """)
+
+    results = _search(CollectionConstitutionAnnotatedHttp, _handler)
+    assert [result.url for result in results] == [
+        "https://constitution.congress.gov/browse/item-1",
+        "https://constitution.congress.gov/browse/item-2",
+    ]
+    assert results[0].image_src is None
+
+
+def test_library_of_congress_json_pages():
+    def _handler(request: httpx.Request) -> httpx.Response:
+        assert request.url.params["fo"] == "json"
+        content: dict[str, Any]
+        if request.url.params.get("sp") == "2":
+            content = {"results": [{"url": "https://www.loc.gov/item/2", "title": "Item 2"}], "pagination": {}}
+        else:
+            content = {
+                "results": [
+                    {
+                        "url": "https://www.loc.gov/item/1",
+                        "title": "Item 1",
+                        "description": ["About item 1", "More"],
+                        "image_url": [],
+                    },
+                    "not an item",
+                    {"url": "https://www.loc.gov/item/untitled"},
+                ],
+                "pagination": {"next": "https://www.loc.gov/classroom-materials/?fo=json&sp=2"},
+            }
+        return httpx.Response(200, headers={"content-type": "application/json"}, text=json.dumps(content))
+
+    results = _search(CollectionLibraryOfCongressHttp, _handler)
+    assert [result.title for result in results] == ["Item 1", "Item 2"]
+    assert results[0].detail == "About item 1"
+    assert results[0].image_src is None
+
+
+@pytest.mark.parametrize("body", ["<html>Not JSON</html>", '{"error": "down"}'])
+def test_library_of_congress_unrecognized_pages(body: str):
+    with pytest.raises(MissingInformationError):
+        _search(CollectionLibraryOfCongressHttp, lambda _: httpx.Response(200, text=body))
+
+
+def test_failed_fetch():
+    with pytest.raises(NavigationError, match="503"):
+        _search(CollectionFacingHistoryHttp, lambda _: httpx.Response(503))
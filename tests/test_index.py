@@ -0,0 +1,141 @@
+import asyncio
+import sqlite3
+import time
+from collections.abc import AsyncGenerator
+from pathlib import Path
+
+from conftest import FakeCollection
+
+from historical_sources_search.collections.indexed import CollectionIndexed
+from historical_sources_search.index import IndexStats, SearchIndex
+
+
+def _make_index(sqlite_path: Path | None, *, reharvest_seconds: float = 60) -> SearchIndex:
+    return SearchIndex(sqlite_path=sqlite_path, min_results=2, reharvest_seconds=reharvest_seconds, max_results=10)
+
+
+async def _search(collection: CollectionIndexed, query: str) -> list[str]:
+    return [result.url async for result in collection.search(query)]
+
+
+def test_disabled_index_always_misses():
+    collection = FakeCollection("a", 0)
+
+    async def _test():
+        async with _make_index(None) as index:
+            await index.add("a", "item", [collection.make_result(i) for i in range(3)], is_harvest=True)
+            assert await index.search(collection.collection_info, "item") is None
+            assert not await index.claim_harvest("a", "item")
+
+    asyncio.run(_test())
+
+
+def test_only_harvested_queries_are_answered(tmp_path: Path):
+    async def _test() -> tuple[list[str], list[str], int, IndexStats]:
+        collection = FakeCollection("a", 3)
+        async with _make_index(tmp_path / "index.sqlite3") as index:
+            indexed = CollectionIndexed(collection, index)
+            live_urls = await _search(indexed, "item")
+            # its results were indexed, but a live search isn't a harvest; so it's searched live again
+            assert await _search(indexed, "item") == live_urls
+            assert collection.n_searches == 2
+
+            await index.add("a", "Item", [collection.make_result(i) for i in range(3)], is_harvest=True)
+            indexed_urls = await _search(indexed, "ITEM ")
+            return live_urls, indexed_urls, collection.n_searches, index.get_stats()
+
+    live_urls, indexed_urls, n_searches, stats = asyncio.run(_test())
+    assert sorted(indexed_urls) == sorted(live_urls)  # ranked by full-text match, not the collection's order
+    assert n_searches == 2
+    assert (stats.hits, stats.misses, stats.n_harvests) == (1, 2, 1)
+
+
+def test_too_few_matches_is_a_miss(tmp_path: Path):
+    collection = FakeCollection("a", 0)
+
+    async def _test():
+        async with _make_index(tmp_path / "index.sqlite3") as index:
+            await index.add("a", "item 1", [collection.make_result(1)], is_harvest=True)
+            assert await index.search(collection.collection_info, "item 1") is None
+            # nor can FTS syntax be injected through the query
+            assert await index.search(collection.collection_info, 'item" OR title:*') is None
+
+    asyncio.run(_test())
+
+
+def test_search_stopped_early_indexes_its_items(tmp_path: Path):
+    async def _test() -> int:
+        collection = FakeCollection("a", 5)
+        async with _make_index(tmp_path / "index.sqlite3") as index:
+            results = CollectionIndexed(collection, index).search("item")
+            assert isinstance(results, AsyncGenerator)
+            async for _ in results:
+                break
+            await results.aclose()
+            assert collection.n_live == 0
+            assert await index.is_harvest_due("a", "item")
+            return len(await index.get_recent_titles(10))
+
+    assert asyncio.run(_test()) == 1
+
+
+def test_harvest_claims_and_due(tmp_path: Path):
+    collection = FakeCollection("a", 0)
+
+    async def _test():
+        async with _make_index(tmp_path / "index.sqlite3") as index:
+            assert await index.claim_harvest("a", "item")
+            assert not await index.claim_harvest("a", "Item")  # already claimed
+            await index.add("a", "item", [collection.make_result(0)], is_harvest=True)
+            await index.release_harvest("a", "item")
+            assert not await index.is_harvest_due("a", "item")
+            assert not await index.claim_harvest("a", "item")  # just harvested
+
+    asyncio.run(_test())
+
+
+def test_harvester_fills_index_for_seed_queries(tmp_path: Path):
+    async def _test() -> tuple[list[str], int]:
+        collection = FakeCollection("a", 3)
+        async with _make_index(tmp_path / "index.sqlite3") as index:
+            harvest = asyncio.create_task(index.harvest([collection], ["item"], pause_seconds=0.01))
+            await asyncio.sleep(0.1)
+            harvest.cancel()
+            n_searches = collection.n_searches  # not again, until due
+            return await _search(CollectionIndexed(collection, index), "item"), n_searches
+
+    urls, n_searches = asyncio.run(_test())
+    assert len(urls) == 3
+    assert n_searches == 1
+
+
+def test_answer_from_index_is_refreshed_in_background_once_due(tmp_path: Path):
+    async def _test() -> tuple[int, IndexStats]:
+        collection = FakeCollection("a", 3)
+        async with _make_index(tmp_path / "index.sqlite3", reharvest_seconds=0.05) as index:
+            await index.add("a", "item", [collection.make_result(i) for i in range(3)], is_harvest=True)
+            await asyncio.sleep(0.1)
+            assert len(await _search(CollectionIndexed(collection, index), "item")) == 3
+            await asyncio.sleep(0.05)
+            return collection.n_searches, index.get_stats()
+
+    n_searches, stats = asyncio.run(_test())
+    assert n_searches == 1
+    assert (stats.hits, stats.n_harvests) == (1, 2)  # the refresh counts as a harvest
+
+
+def test_harvests_recorded_by_live_searches_before_are_dropped(tmp_path: Path):
+    path = tmp_path / "index.sqlite3"
+    with sqlite3.connect(path) as connection:
+        connection.execute("CREATE TABLE harvests (collection_id TEXT, query TEXT, harvested_at REAL)")
+        connection.execute("INSERT INTO harvests VALUES ('a', 'item', ?)", (time.time(),))
+    connection.close()
+
+    async def _test() -> bool:
+        async with _make_index(path) as index:
+            return await index.is_harvest_due("a", "item")
+
+    assert asyncio.run(_test())
+    with sqlite3.connect(path) as connection:
+        assert connection.execute("SELECT name FROM sqlite_master WHERE name = 'harvests'").fetchone() is None
+    connection.close()
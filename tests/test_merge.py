@@ -0,0 +1,72 @@
+import asyncio
+from collections.abc import AsyncIterable
+
+from historical_sources_search.merge import SeenUrls, canonicalize_url, merge_events
+from historical_sources_search.search_event import SearchEvent, SearchEventCollectionDone, SearchEventResult
+from historical_sources_search.search_result import CollectionInfo, SearchResult
+
+_COLLECTION = CollectionInfo(id="test", name="Test", url="https://test.example")
+
+
+def _result(url: str, title: str = "Untitled") -> SearchResult:
+    return SearchResult(url=url, title=title, detail=None, image_src=None, provided_by_collection=_COLLECTION)
+
+
+def test_canonicalize_url_ignores_presentation():
+    assert canonicalize_url("https://www.example.com/item/1/?utm_source=x&b=2&a=1") == canonicalize_url(
+        "http://example.com/item/1?a=1&b=2&fbclid=y"
+    )
+
+
+def test_canonicalize_url_ignores_search_params_of_loc():
+    assert canonicalize_url("https://www.loc.gov/item/123/?q=lincoln&st=list") == canonicalize_url(
+        "https://loc.gov/item/123"
+    )
+    assert canonicalize_url("https://example.com/item?q=1") != canonicalize_url("https://example.com/item?q=2")
+
+
+def test_seen_urls_exact():
+    seen = SeenUrls(max_exact=10)
+    assert seen.add("https://example.com/1")
+    assert not seen.add("https://www.example.com/1/?utm_medium=email")
+    assert seen.add("https://example.com/2")
+
+
+def test_seen_urls_bloom_filter_beyond_exact():
+    seen = SeenUrls(max_exact=5)
+    urls = [f"https://example.com/{i}" for i in range(1_000)]
+    assert all(seen.add(url) for url in urls[:5])
+    n_new = sum(seen.add(url) for url in urls[5:])
+    assert n_new >= 990  # the Bloom filter may rarely mistake a new URL for a seen one
+    assert not any(seen.add(url) for url in urls)  # but never forgets one
+
+
+def test_merge_events_drops_duplicates_and_keeps_done_after_results():
+    async def _events() -> AsyncIterable[SearchEvent]:
+        yield SearchEventResult(result=_result("https://example.com/1"))
+        yield SearchEventResult(result=_result("https://www.example.com/1/"))
+        yield SearchEventResult(result=_result("https://example.com/2"))
+        yield SearchEventCollectionDone(collection=_COLLECTION, status="complete", n_results=3)
+
+    async def _test() -> list[SearchEvent]:
+        merged = merge_events(_events(), "query", seen=SeenUrls(10), window_size=10, window_seconds=10)
+        return [event async for event in merged]
+
+    events = asyncio.run(_test())
+    assert [event.result.url for event in events if isinstance(event, SearchEventResult)] == [
+        "https://example.com/1",
+        "https://example.com/2",
+    ]
+    assert isinstance(events[-1], SearchEventCollectionDone)
+
+
+def test_merge_events_reorders_by_relevance_within_window():
+    async def _events() -> AsyncIterable[SearchEvent]:
+        yield SearchEventResult(result=_result("https://example.com/1", "Unrelated"))
+        yield SearchEventResult(result=_result("https://example.com/2", "Lincoln's speech"))
+
+    async def _test() -> list[str]:
+        merged = merge_events(_events(), "lincoln speech", seen=None, window_size=10, window_seconds=10)
+        return [event.result.url async for event in merged if isinstance(event, SearchEventResult)]
+
+    assert asyncio.run(_test()) == ["https://example.com/2", "https://example.com/1"]
@@ -0,0 +1,62 @@
+import asyncio
+import time
+
+from historical_sources_search.rate_limit import HostRateLimiter
+
+
+def _make_rate_limiter(*, requests_per_second: float = 20, burst: int = 2) -> HostRateLimiter:
+    return HostRateLimiter(
+        requests_per_second=requests_per_second,
+        burst=burst,
+        requests_per_second_by_host={"slow.test": 1},
+        max_backoff_seconds=0.2,
+    )
+
+
+def test_burst_then_steady_rate():
+    async def _test() -> float:
+        rate_limiter = _make_rate_limiter()
+        start = time.monotonic()
+        for _ in range(4):  # 2 at once, then 2 more at 20/s
+            await rate_limiter.acquire("a.test")
+        return time.monotonic() - start
+
+    assert 0.08 <= asyncio.run(_test()) < 0.5
+
+
+def test_hosts_are_limited_separately():
+    async def _test() -> float:
+        rate_limiter = _make_rate_limiter()
+        start = time.monotonic()
+        for host in ["a.test", "a.test", "b.test", "b.test", "slow.test", "slow.test"]:
+            await rate_limiter.acquire(host)
+        return time.monotonic() - start
+
+    assert asyncio.run(_test()) < 0.05
+
+
+def test_backs_off_on_too_many_requests_then_recovers():
+    rate_limiter = _make_rate_limiter()
+    rate_limiter.report("a.test", 429, retry_after="60")
+    stats = rate_limiter.get_stats()["a.test"]
+    assert stats.requests_per_second == 10
+    assert 0.1 < stats.blocked_for_seconds <= 0.2  # capped at `max_backoff_seconds`
+
+    rate_limiter.report("a.test", 503)
+    assert rate_limiter.get_stats()["a.test"].requests_per_second == 5
+    for _ in range(20):
+        rate_limiter.report("a.test", 200)
+    assert rate_limiter.get_stats()["a.test"].requests_per_second == 20
+    rate_limiter.report("a.test", 404)  # the host isn't struggling
+    assert rate_limiter.get_stats()["a.test"].requests_per_second == 20
+
+
+def test_acquire_waits_out_backoff():
+    async def _test() -> float:
+        rate_limiter = _make_rate_limiter()
+        rate_limiter.report("a.test", 429, retry_after="0.1")
+        start = time.monotonic()
+        await rate_limiter.acquire("a.test")
+        return time.monotonic() - start
+
+    assert 0.08 <= asyncio.run(_test()) < 0.5
@@ -0,0 +1,105 @@
+import asyncio
+import logging
+import sys
+from importlib.metadata import EntryPoint
+from types import ModuleType
+from typing import cast
+
+import httpx
+import pytest
+from conftest import FakeCollection
+
+from historical_sources_search.browser_pool import BrowserContextPool
+from historical_sources_search.circuit_breaker import CircuitBreakers
+from historical_sources_search.collections import registry as registry_module
+from historical_sources_search.collections.base import CollectionBase
+from historical_sources_search.collections.breaker import CollectionWithCircuitBreaker
+from historical_sources_search.collections.registry import ENTRY_POINT_GROUP, CollectionRegistry
+from historical_sources_search.exceptions import UnknownCollectionError
+from historical_sources_search.rate_limit import HostRateLimiter
+
+_BUILT_IN_IDS = ["facing_history", "library_of_congress", "constitution_annotated"]
+
+
+def _make_fake(_: httpx.AsyncClient, __: BrowserContextPool, ___: HostRateLimiter) -> CollectionBase:
+    return FakeCollection("fake", 1)
+
+
+def _make_misnamed(_: httpx.AsyncClient, __: BrowserContextPool, ___: HostRateLimiter) -> CollectionBase:
+    return FakeCollection("other", 1)
+
+
+@pytest.fixture
+def plugins(monkeypatch: pytest.MonkeyPatch):
+    """An installed package adding collections, one of which replaces a built-in one"""
+    module = ModuleType("fake_collections_plugin")
+    module.make_fake = _make_fake  # type: ignore[attr-defined]
+    module.make_misnamed = _make_misnamed  # type: ignore[attr-defined]
+    monkeypatch.setitem(sys.modules, module.__name__, module)
+    entries = [
+        EntryPoint(name="fake", value=f"{module.__name__}:make_fake", group=ENTRY_POINT_GROUP),
+        EntryPoint(name="misnamed", value=f"{module.__name__}:make_misnamed", group=ENTRY_POINT_GROUP),
+        EntryPoint(name="facing_history", value=f"{module.__name__}:make_fake", group=ENTRY_POINT_GROUP),
+    ]
+    monkeypatch.setattr(registry_module, "entry_points", lambda group: entries if group == ENTRY_POINT_GROUP else [])
+
+
+def _make_registry(
+    *, enabled_ids: list[str] | None = None, breakers: CircuitBreakers | None = None
+) -> CollectionRegistry:
+    rate_limiter = HostRateLimiter(
+        requests_per_second=1, burst=1, requests_per_second_by_host={}, max_backoff_seconds=1
+    )
+    return CollectionRegistry(
+        httpx.AsyncClient(),
+        cast("BrowserContextPool", None),  # not used until searching
+        rate_limiter,
+        enabled_ids=enabled_ids,
+        breakers=breakers,
+    )
+
+
+def test_built_in_collections_built_once_when_first_needed():
+    registry = _make_registry()
+    assert registry.ids == _BUILT_IN_IDS
+    assert registry._collections == {}  # noqa: SLF001 (none built up front)
+    collection = registry.get("library_of_congress")
+    assert collection.collection_info.id == "library_of_congress"
+    assert registry.get("library_of_congress") is collection
+    assert [collection.collection_info.id for collection in registry.get_many()] == _BUILT_IN_IDS
+    with pytest.raises(UnknownCollectionError, match="nope"):
+        registry.get("nope")
+
+
+def test_only_enabled_collections_available():
+    registry = _make_registry(enabled_ids=["constitution_annotated", "facing_history"])
+    assert registry.ids == ["constitution_annotated", "facing_history"]
+    assert len(registry.get_many(["facing_history", "facing_history"])) == 1
+    with pytest.raises(UnknownCollectionError):
+        registry.get("library_of_congress")
+    with pytest.raises(UnknownCollectionError, match="nope"):
+        _make_registry(enabled_ids=["facing_history", "nope"])
+
+
+@pytest.mark.usefixtures("plugins")
+def test_installed_packages_add_and_replace_collections(caplog: pytest.LogCaptureFixture):
+    with caplog.at_level(logging.WARNING):
+        registry = _make_registry()
+    assert "replaces" in caplog.text
+    assert registry.ids == [*_BUILT_IN_IDS, "fake", "misnamed"]
+    assert isinstance(registry.get("fake"), FakeCollection)
+    with pytest.raises(ValueError, match="has id 'fake'"):
+        registry.get("facing_history")
+    with pytest.raises(ValueError, match="has id 'other'"):
+        registry.get("misnamed")
+
+
+@pytest.mark.usefixtures("plugins")
+def test_collections_searched_through_their_breakers():
+    async def _test() -> list[str]:
+        breakers = CircuitBreakers(failure_threshold=1, open_seconds=60, max_open_seconds=60, probe_query="item")
+        collection = _make_registry(breakers=breakers).get("fake")
+        assert isinstance(collection, CollectionWithCircuitBreaker)
+        return [result.url async for result in collection.search("item")]
+
+    assert asyncio.run(_test()) == ["https://fake.test/items/0"]
@@ -0,0 +1,101 @@
+import asyncio
+import re
+from dataclasses import dataclass, field
+from typing import cast
+
+import pytest
+from playwright.async_api import Route
+
+from historical_sources_search.metrics import REGISTRY
+from historical_sources_search.resource_blocking import (
+    DEFAULT_BLOCKED_RESOURCE_TYPES,
+    ResourceBlocker,
+    ResourceBlockingStats,
+    ResourcePolicy,
+)
+
+
+@dataclass
+class _FakeRequest:
+    resource_type: str
+    url: str
+
+
+@dataclass
+class _FakeRoute:
+    request: _FakeRequest
+    calls: list[str] = field(default_factory=list)
+
+    async def abort(self, error_code: str):
+        self.calls.append(f"abort {error_code}")
+
+    async def fallback(self):
+        self.calls.append("fallback")
+
+
+def test_default_policy_blocks_heavy_resources_and_trackers():
+    policy = ResourcePolicy()
+    assert policy.is_blocked("image", "https://example.com/a.png")
+    assert policy.is_blocked("font", "https://example.com/a.woff2")
+    assert not policy.is_blocked("stylesheet", "https://example.com/a.css")  # visibility checks need styles
+    assert not policy.is_blocked("document", "https://example.com/")
+    assert policy.is_blocked("script", "https://www.googletagmanager.com/gtag.js")
+    assert not policy.is_blocked("script", "https://notgoogletagmanager.com/gtag.js")
+
+
+def test_allowed_urls_are_never_blocked():
+    policy = ResourcePolicy(allowed_url_patterns=(re.compile(r"^https://example\.com/keep/"),))
+    assert not policy.is_blocked("image", "https://example.com/keep/a.png")
+    assert policy.is_blocked("image", "https://example.com/other/a.png")
+
+
+def test_policy_from_env_per_collection(env: pytest.MonkeyPatch):
+    env.setenv("BLOCKED_BROWSER_RESOURCE_TYPES_BY_COLLECTION", '{"a": ["image", "stylesheet"]}')
+    env.setenv("ALLOWED_BROWSER_RESOURCE_URLS_BY_COLLECTION", r'{"a": ["/logo\\.png$"]}')
+    policy = ResourcePolicy.from_env("a")
+    assert policy.blocked_resource_types == {"image", "stylesheet"}
+    assert policy.is_blocked("stylesheet", "https://example.com/a.css")
+    assert not policy.is_blocked("image", "https://example.com/logo.png")
+    other_policy = ResourcePolicy.from_env("b")
+    assert other_policy.blocked_resource_types == DEFAULT_BLOCKED_RESOURCE_TYPES
+    assert other_policy.allowed_url_patterns == ()
+
+
+def test_blocker_routes_and_counts():
+    stats, totals = ResourceBlockingStats(), ResourceBlockingStats()
+    blocker = ResourceBlocker("a", ResourcePolicy(), stats, totals)
+    routes = [
+        _FakeRoute(_FakeRequest("image", "https://example.com/a.png")),
+        _FakeRoute(_FakeRequest("image", "https://example.com/b.png")),
+        _FakeRoute(_FakeRequest("document", "https://example.com/")),
+    ]
+
+    async def _test():
+        for route in routes:
+            await blocker._route(cast("Route", route))  # noqa: SLF001 (as playwright would)
+
+    asyncio.run(_test())
+    assert [route.calls for route in routes] == [["abort blockedbyclient"], ["abort blockedbyclient"], ["fallback"]]
+    assert stats == totals
+    assert (stats.n_requests_blocked, stats.n_requests_allowed) == (2, 1)
+    assert stats.n_requests_blocked_by_type == {"image": 2}
+    assert stats.n_bytes_saved_estimate > 0
+    metrics = REGISTRY.render()
+    assert 'browser_requests_blocked_total{collection="a",resource_type="image"}' in metrics
+    assert 'browser_requests_blocked_bytes_estimate_total{collection="a"}' in metrics
+    assert 'browser_requests_allowed_total{collection="a"}' in metrics
+
+
+def test_stats_minus_earlier_snapshot():
+    earlier = ResourceBlockingStats(
+        n_requests_allowed=1, n_requests_blocked=2, n_requests_blocked_by_type={"image": 2}, n_bytes_saved_estimate=10
+    )
+    later = ResourceBlockingStats(
+        n_requests_allowed=3,
+        n_requests_blocked=5,
+        n_requests_blocked_by_type={"image": 2, "font": 3},
+        n_bytes_saved_estimate=40,
+    )
+    assert later.minus(earlier) == ResourceBlockingStats(
+        n_requests_allowed=2, n_requests_blocked=3, n_requests_blocked_by_type={"font": 3}, n_bytes_saved_estimate=30
+    )
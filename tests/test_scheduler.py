@@ -0,0 +1,98 @@
+import asyncio
+
+import pytest
+
+from historical_sources_search.exceptions import CapacityExceededError
+from historical_sources_search.scheduler import PageScheduler
+
+
+def _make_scheduler(*, max_pages: int = 2, max_waiting: int = 10, wait_timeout_seconds: float = 10) -> PageScheduler:
+    return PageScheduler(
+        max_pages=max_pages,
+        max_pages_per_collection=1,
+        max_waiting=max_waiting,
+        wait_timeout_seconds=wait_timeout_seconds,
+    )
+
+
+async def _hold(scheduler: PageScheduler, collection_id: str, released: asyncio.Event):
+    async with scheduler.slot(collection_id):
+        await released.wait()
+
+
+def test_limits_pages_in_total_and_per_collection():
+    async def _test() -> int:
+        scheduler = _make_scheduler()
+        n_active = 0
+        max_active = 0
+
+        async def _use(collection_id: str):
+            nonlocal n_active, max_active
+            async with scheduler.slot(collection_id):
+                n_active += 1
+                max_active = max(max_active, n_active)
+                assert scheduler.get_stats().n_active_by_collection[collection_id] == 1
+                await asyncio.sleep(0.01)
+                n_active -= 1
+
+        await asyncio.gather(*(_use(collection_id) for collection_id in ["a", "a", "b", "b", "c"]))
+        assert scheduler.get_stats().n_active == 0
+        return max_active
+
+    assert asyncio.run(_test()) == 2
+
+
+def test_wait_times_out():
+    async def _test():
+        scheduler = _make_scheduler(wait_timeout_seconds=0.01)
+        async with scheduler.slot("a"):
+            with pytest.raises(CapacityExceededError, match="Timed out"):
+                await _hold(scheduler, "a", asyncio.Event())
+        stats = scheduler.get_stats()
+        assert (stats.n_timed_out, stats.n_waiting) == (1, 0)
+
+    asyncio.run(_test())
+
+
+def test_rejects_when_queue_full():
+    async def _test():
+        scheduler = _make_scheduler(max_pages=1, max_waiting=1)
+        released = asyncio.Event()
+        async with scheduler.slot("a"):
+            waiting = asyncio.create_task(_hold(scheduler, "b", released))
+            await asyncio.sleep(0)
+            assert scheduler.is_saturated
+            with pytest.raises(CapacityExceededError, match="Too many") as exc_info:
+                scheduler.check_admission()
+            assert exc_info.value.retry_after_seconds >= 1
+        released.set()
+        await waiting
+        assert scheduler.get_stats().n_rejected == 1
+
+    asyncio.run(_test())
+
+
+def test_slot_if_free_does_not_wait_nor_jump_the_queue():
+    async def _test():
+        scheduler = _make_scheduler(max_pages=2)
+        released = asyncio.Event()
+        async with scheduler.slot_if_free("a") as got:
+            assert got
+            async with scheduler.slot_if_free("a") as got_same:
+                assert not got_same  # none free for the collection
+            async with scheduler.slot_if_free("b") as got_other:
+                assert got_other
+                async with scheduler.slot_if_free("c") as got_third:
+                    assert not got_third  # none free in total
+
+        holding = asyncio.create_task(_hold(scheduler, "b", released))
+        waiting = asyncio.create_task(_hold(scheduler, "b", released))
+        await asyncio.sleep(0)
+        assert scheduler.is_contended
+        async with scheduler.slot_if_free("c") as got:
+            assert not got  # free, but someone is already waiting
+        released.set()
+        await asyncio.gather(holding, waiting)
+        assert scheduler.get_stats().n_active == 0
+
+    asyncio.run(_test())
@@ -0,0 +1,236 @@
+import asyncio
+import base64
+import logging
+from collections.abc import AsyncIterable
+
+import pytest
+from conftest import FakeCollection
+
+from historical_sources_search.collections.base import CollectionBase
+from historical_sources_search.exceptions import CollectionUnavailableError, InvalidCursorError
+from historical_sources_search.search_event import (
+    SearchEvent,
+    SearchEventCollectionDone,
+    SearchEventCollectionError,
+    SearchEventResult,
+)
+from historical_sources_search.search_result import SearchResult
+from historical_sources_search.search_session import SearchSession, SearchSessionStore
+
+
+def _make_store(*, max_live_sessions: int = 10) -> SearchSessionStore:
+    return SearchSessionStore(ttl_seconds=600, max_sessions=10, live_seconds=600, max_live_sessions=max_live_sessions)
+
+
+async def _get_page(
+    store: SearchSessionStore, collections: list[FakeCollection], cursor: str | None, limit: int
+) -> tuple[list[SearchEvent], str | None]:
+    def _build_collections(collection_ids: list[str] | None) -> list[CollectionBase]:
+        return [c for c in collections if collection_ids is None or c.collection_info.id in collection_ids]
+
+    async with store.open("query", cursor, _build_collections) as session:
+        events = [event async for event in session.next_page(limit)]
+        await store.release(session)
+    return events, session.get_cursor()
+
+
+def _urls(events: list[SearchEvent]) -> list[str]:
+    return [event.result.url for event in events if isinstance(event, SearchEventResult)]
+
+
+async def _get_all_pages(
+    store: SearchSessionStore, collections: list[FakeCollection], limit: int
+) -> tuple[list[list[str]], list[SearchEvent]]:
+    pages = []
+    all_events = []
+    cursor = None
+    while True:
+        events, cursor = await _get_page(store, collections, cursor, limit)
+        pages.append(_urls(events))
+        all_events += events
+        if cursor is None:
+            return pages, all_events
+
+
+def test_pages_take_collections_in_turn():
+    async def _test() -> tuple[list[str], str | None]:
+        a, b = FakeCollection("a", 3), FakeCollection("b", 3)
+        async with _make_store() as store:
+            events, cursor = await _get_page(store, [a, b], None, 4)
+        return _urls(events), cursor
+
+    urls, cursor = asyncio.run(_test())
+    assert urls == [
+        "https://a.test/items/0",
+        "https://b.test/items/0",
+        "https://a.test/items/1",
+        "https://b.test/items/1",
+    ]
+    assert cursor is not None
+
+
+def test_pages_cover_every_result_once():
+    async def _test() -> tuple[list[list[str]], list[SearchEvent]]:
+        a, b = FakeCollection("a", 7), FakeCollection("b", 3)
+        async with _make_store() as store:
+            return await _get_all_pages(store, [a, b], 3)
+
+    pages, events = asyncio.run(_test())
+    assert all(len(page) <= 3 for page in pages)
+    urls = [url for page in pages for url in page]
+    assert len(urls) == len(set(urls)) == 10
+    done = {event.collection.id: event.n_results for event in events if isinstance(event, SearchEventCollectionDone)}
+    assert done == {"a": 7, "b": 3}
+
+
+def test_duplicates_are_skipped_across_pages():
+    async def _test() -> tuple[list[list[str]], list[SearchEvent]]:
+        # "b" finds the same items as "a", but only after "a" has handed them out on earlier pages
+        a, b = FakeCollection("a", 4), FakeCollection("b", 6, host="a.test")
+        async with _make_store() as store:
+            return await _get_all_pages(store, [a, b], 2)
+
+    pages, _ = asyncio.run(_test())
+    urls = [url for page in pages for url in page]
+    assert len(urls) == len(set(urls)) == 6
+
+
+def test_cursor_round_trip_continues_same_session():
+    async def _test() -> tuple[list[str], int]:
+        a = FakeCollection("a", 5)
+        async with _make_store() as store:
+            _, cursor = await _get_page(store, [a], None, 2)
+            events, _ = await _get_page(store, [a], cursor, 2)
+        return _urls(events), a.n_searches
+
+    urls, n_searches = asyncio.run(_test())
+    assert urls == ["https://a.test/items/2", "https://a.test/items/3"]
+    assert n_searches == 1
+
+
+def test_expired_session_is_rederived_from_cursor():
+    async def _test() -> tuple[list[str], str | None, int]:
+        a, b = FakeCollection("a", 5), FakeCollection("b", 1)
+        async with _make_store() as store:
+            _, cursor = await _get_page(store, [a, b], None, 4)
+        async with _make_store() as other_store:  # e.g. another worker, which never had the session
+            events, next_cursor = await _get_page(other_store, [a, b], cursor, 10)
+        return _urls(events), next_cursor, b.n_searches
+
+    urls, next_cursor, n_searches_b = asyncio.run(_test())
+    assert urls == ["https://a.test/items/3", "https://a.test/items/4"]
+    assert next_cursor is None
+    assert n_searches_b == 1  # "b" had run out, so it isn't searched again
+
+
+def test_reused_cursor_gives_the_same_page():
+    async def _test() -> tuple[list[str], list[str], list[str], int]:
+        a = FakeCollection("a", 10)
+        async with _make_store() as store:
+            _, cursor = await _get_page(store, [a], None, 2)
+            events, next_cursor = await _get_page(store, [a], cursor, 2)
+            events_again, _ = await _get_page(store, [a], cursor, 2)  # e.g. retried after a dropped response
+            events_next, _ = await _get_page(store, [a], next_cursor, 2)
+        return _urls(events), _urls(events_again), _urls(events_next), a.n_searches
+
+    urls, urls_again, urls_next, n_searches = asyncio.run(_test())
+    assert urls == urls_again == ["https://a.test/items/2", "https://a.test/items/3"]
+    assert urls_next == ["https://a.test/items/4", "https://a.test/items/5"]
+    assert n_searches == 2  # the original session carried on, apart from the one re-derived for the reused cursor
+
+
+def test_concurrent_requests_with_same_cursor_get_the_same_page():
+    async def _test() -> list[list[str]]:
+        a = FakeCollection("a", 10)
+        async with _make_store() as store:
+            _, cursor = await _get_page(store, [a], None, 2)
+            pages = await asyncio.gather(*(_get_page(store, [a], cursor, 2) for _ in range(2)))
+        return [_urls(events) for events, _ in pages]
+
+    assert asyncio.run(_test()) == [["https://a.test/items/2", "https://a.test/items/3"]] * 2
+
+
+class _ReversedCollection(FakeCollection):
+    async def search(self, query: str) -> AsyncIterable[SearchResult]:  # noqa: ARG002 (every query has the same results)
+        self.n_searches += 1
+        for i in reversed(range(self.n_results)):
+            yield self.make_result(i)
+
+
+def test_rederived_session_skips_duplicates_of_earlier_pages():
+    async def _test() -> list[str]:
+        # "b" finds the same items as "a", in the opposite order
+        a, b = FakeCollection("a", 6), _ReversedCollection("b", 6, host="a.test")
+        async with _make_store() as store:
+            _, cursor = await _get_page(store, [a, b], None, 2)  # items 0 and 5
+        async with _make_store() as other_store:
+            events, _ = await _get_page(other_store, [a, b], cursor, 10)
+        return _urls(events)
+
+    urls = asyncio.run(_test())
+    assert urls == [f"https://a.test/items/{i}" for i in (1, 4, 2, 3)]
+
+
+def test_parked_sessions_give_back_searches_and_resume():
+    async def _test() -> tuple[list[str], int]:
+        a = FakeCollection("a", 6)
+        async with _make_store(max_live_sessions=0) as store:
+            events, cursor = await _get_page(store, [a], None, 2)
+            n_live_between_pages = a.n_live
+            events_next, _ = await _get_page(store, [a], cursor, 10)
+        return _urls(events) + _urls(events_next), n_live_between_pages
+
+    urls, n_live_between_pages = asyncio.run(_test())
+    assert n_live_between_pages == 0
+    assert urls == [f"https://a.test/items/{i}" for i in range(6)]
+
+
+def test_session_with_max_results_truncates(env: pytest.MonkeyPatch):
+    env.setenv("MAX_RESULTS_PER_COLLECTION", "3")
+
+    async def _test() -> list[SearchEvent]:
+        a = FakeCollection("a", 10)
+        session = SearchSession("id", "query", [a])
+        events = [event async for event in session.next_page(10)]
+        await session.close()
+        return events
+
+    events = asyncio.run(_test())
+    assert len(_urls(events)) == 3
+    done = events[-1]
+    assert isinstance(done, SearchEventCollectionDone)
+    assert (done.status, done.n_results) == ("truncated", 3)
+
+
+def test_unavailable_collection_is_skipped_quietly(caplog: pytest.LogCaptureFixture):
+    async def _test() -> list[SearchEvent]:
+        a = FakeCollection("a", 0, error=CollectionUnavailableError("circuit open"))
+        session = SearchSession("id", "query", [a])
+        return [event async for event in session.next_page(10)]
+
+    with caplog.at_level(logging.INFO):
+        events = asyncio.run(_test())
+    assert len(events) == 1
+    assert isinstance(events[0], SearchEventCollectionError)
+    assert events[0].message == "circuit open"
+    assert "Skipped search of collection 'a'" in caplog.text
+    assert not [record for record in caplog.records if record.levelno >= logging.WARNING]
+
+
+def test_malformed_or_mismatched_cursor_is_rejected():
+    async def _test():
+        a = FakeCollection("a", 5)
+        async with _make_store() as store:
+            _, cursor = await _get_page(store, [a], None, 2)
+            assert cursor is not None
+            with pytest.raises(InvalidCursorError):
+                async with store.open("another query", cursor, lambda _: [a]):
+                    pass
+            with pytest.raises(InvalidCursorError):
+                async with store.open("query", "not a cursor!", lambda _: [a]):
+                    pass
+            with pytest.raises(InvalidCursorError):
+                async with store.open("query", base64.urlsafe_b64encode(b"{}").decode(), lambda _: [a]):
+                    pass
+
+    asyncio.run(_test())
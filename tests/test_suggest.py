@@ -0,0 +1,118 @@
+import asyncio
+from collections.abc import AsyncIterator
+from pathlib import Path
+
+from conftest import FakeCollection
+
+from historical_sources_search.index import SearchIndex
+from historical_sources_search.scheduler import PageScheduler
+from historical_sources_search.suggest import SearchPrefetcher, SuggestionIndex, SuggestionStats, seed_suggestions
+
+
+def _texts(suggestions: SuggestionIndex, prefix: str) -> list[str]:
+    return [suggestion.text for suggestion in suggestions.suggest(prefix, 3)]
+
+
+def test_suggests_completions_ranked_with_past_queries_first():
+    suggestions = SuggestionIndex(100, query_min_clients=1)
+    suggestions.add_titles(["Civil War letters", "Civilization of Rome", "Civil War letters", "Cities"])
+    suggestions.add_query("civil  rights")
+
+    assert _texts(suggestions, "CIVIL") == ["civil rights", "Civil War letters", "Civilization of Rome"]
+    assert _texts(suggestions, "civil ") == ["civil rights", "Civil War letters"]  # the last word is complete
+    assert [suggestion.is_past_query for suggestion in suggestions.suggest("civil r", 3)] == [True]
+    assert suggestions.suggest("  ", 3) == []
+
+
+def test_client_queries_suggested_only_once_searched_by_enough_clients():
+    suggestions = SuggestionIndex(100, query_min_clients=2)
+    suggestions.add_query("gold rush", "client-1")
+    suggestions.add_query("Gold Rush", "client-1")
+    assert _texts(suggestions, "gold") == []
+    suggestions.add_query("gold rush", "client-2")
+    assert _texts(suggestions, "gold") == ["gold rush"]
+    # once suggested, further searches count right away
+    suggestions.add_query("gold rush", "client-3")
+    suggestions.add_query("gold mine", None)
+    assert _texts(suggestions, "gold") == ["gold rush", "gold mine"]
+
+
+def test_lowest_ranked_dropped_beyond_max_entries():
+    suggestions = SuggestionIndex(4, query_min_clients=1)
+    suggestions.add_query("item 0")
+    suggestions.add_titles(f"Item {i}" for i in range(1, 10))
+    assert len(suggestions) <= 5
+    assert _texts(suggestions, "item 0") == ["item 0"]
+
+
+def test_seeded_from_seed_queries_and_index_titles(tmp_path: Path):
+    async def _test() -> SuggestionIndex:
+        collection = FakeCollection("a", 0)
+        suggestions = SuggestionIndex(100, query_min_clients=2)
+        async with SearchIndex(
+            sqlite_path=tmp_path / "index.sqlite3", min_results=1, reharvest_seconds=60, max_results=10
+        ) as index:
+            await index.add("a", "item", [collection.make_result(i) for i in range(2)], is_harvest=True)
+            await seed_suggestions(suggestions, index, ["Items", "items"], max_titles=10)
+        return suggestions
+
+    suggestions = asyncio.run(_test())
+    assert sorted(_texts(suggestions, "item")) == ["Item 0", "Item 1", "items"]  # the seed queries once
+
+
+def _make_scheduler() -> PageScheduler:
+    return PageScheduler(max_pages=1, max_pages_per_collection=1, max_waiting=10, wait_timeout_seconds=10)
+
+
+def test_prefetches_best_past_query_once():
+    async def _test() -> tuple[list[str], SuggestionStats]:
+        suggestions = SuggestionIndex(100, query_min_clients=1)
+        suggestions.add_titles(["Gold mine"] * 5)
+        suggestions.add_query("gold rush")
+        searched: list[str] = []
+
+        async def _search(query: str) -> AsyncIterator[None]:
+            searched.append(query)
+            yield None
+
+        async with SearchPrefetcher(
+            suggestions, _search, _make_scheduler(), max_in_flight=2, min_prefix_chars=3, repeat_seconds=60
+        ) as prefetcher:
+            assert prefetcher.maybe_prefetch("go", suggestions.suggest("go", 3)) is None  # too short
+            assert prefetcher.maybe_prefetch("gol", suggestions.suggest("gol", 3)) == "gold rush"
+            assert prefetcher.maybe_prefetch("gold", suggestions.suggest("gold", 3)) is None  # just prefetched
+            await asyncio.sleep(0.01)
+            assert prefetcher.maybe_prefetch("gold", suggestions.suggest("gold", 3)) is None  # nor again, so soon
+            return searched, prefetcher.get_stats()
+
+    searched, stats = asyncio.run(_test())
+    assert searched == ["gold rush"]
+    assert (stats.n_prefetches, stats.n_prefetches_in_flight) == (1, 0)
+
+
+async def _wait_for_slot(scheduler: PageScheduler):
+    async with scheduler.slot("a"):
+        pass
+
+
+def test_no_prefetch_while_searches_wait_for_pages():
+    async def _test():
+        suggestions = SuggestionIndex(100, query_min_clients=1)
+        suggestions.add_query("gold rush")
+        scheduler = _make_scheduler()
+
+        async def _search(_: str) -> AsyncIterator[None]:
+            yield None
+
+        async with (
+            SearchPrefetcher(
+                suggestions, _search, scheduler, max_in_flight=2, min_prefix_chars=3, repeat_seconds=60
+            ) as prefetcher,
+            scheduler.slot("a"),
+        ):
+            waiting = asyncio.create_task(_wait_for_slot(scheduler))
+            await asyncio.sleep(0)
+            assert prefetcher.maybe_prefetch("gold", suggestions.suggest("gold", 3)) is None
+        await waiting
+
+    asyncio.run(_test())
@@ -0,0 +1,139 @@
+import asyncio
+import io
+from pathlib import Path
+
+import httpx
+import pytest
+from PIL import Image
+
+from historical_sources_search.exceptions import ImageFetchError, InvalidImageUrlError
+from historical_sources_search.thumbnails import ThumbnailStats, ThumbnailStore
+
+_ETAG = '"v1"'
+
+
+def _make_image(width: int, height: int) -> bytes:
+    output = io.BytesIO()
+    Image.new("RGB", (width, height), "red").save(output, "PNG")
+    return output.getvalue()
+
+
+class _Upstream:
+    """Serves images at `https://images.test/<width>x<height>.png`, counting requests"""
+
+    def __init__(self):
+        self.requests: list[httpx.Request] = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        name = request.url.path.removeprefix("/")
+        if name == "redirect":
+            return httpx.Response(302, headers={"location": "https://elsewhere.test/1x1.png"})
+        if name == "page.html":
+            return httpx.Response(200, headers={"content-type": "text/html"}, content=b"<html></html>")
+        if request.headers.get("if-none-match") == _ETAG:
+            return httpx.Response(304, headers={"etag": _ETAG})
+        width, height = map(int, name.removesuffix(".png").split("x"))
+        return httpx.Response(
+            200, headers={"content-type": "image/png", "etag": _ETAG}, content=_make_image(width, height)
+        )
+
+
+def _make_store(
+    client: httpx.AsyncClient, tmp_path: Path, *, max_bytes: int = 1 << 20, revalidate_seconds: float = 60
+) -> ThumbnailStore:
+    return ThumbnailStore(
+        client,
+        sqlite_path=tmp_path / "thumbnails.sqlite3",
+        max_bytes=max_bytes,
+        size_px=100,
+        revalidate_seconds=revalidate_seconds,
+        allowed_domains=["images.test"],
+    )
+
+
+def test_makes_thumbnail_once_and_serves_it_from_disk(tmp_path: Path):
+    upstream = _Upstream()
+
+    async def _test() -> tuple[tuple[int, int], ThumbnailStats]:
+        async with (
+            httpx.AsyncClient(transport=httpx.MockTransport(upstream)) as client,
+            _make_store(client, tmp_path) as store,
+        ):
+            first, second = await asyncio.gather(
+                store.get("https://images.test/400x200.png"), store.get("https://images.test/400x200.png")
+            )
+            assert first == second
+            assert (await store.get("https://cdn.images.test/200x400.png")).etag != first.etag  # subdomains are allowed
+            assert await store.get("https://images.test/400x200.png") == first
+            with Image.open(io.BytesIO(first.content)) as image:
+                size = image.size
+            return size, await store.get_stats()
+
+    size, stats = asyncio.run(_test())
+    assert size == (100, 50)
+    assert len(upstream.requests) == 2
+    assert (stats.hits, stats.misses, stats.n_entries) == (1, 2, 2)
+
+
+def test_revalidates_with_upstream_etag(tmp_path: Path):
+    upstream = _Upstream()
+
+    async def _test() -> ThumbnailStats:
+        async with (
+            httpx.AsyncClient(transport=httpx.MockTransport(upstream)) as client,
+            _make_store(client, tmp_path, revalidate_seconds=0) as store,
+        ):
+            first = await store.get("https://images.test/10x10.png")
+            await asyncio.sleep(0.01)
+            assert await store.get("https://images.test/10x10.png") == first
+            return await store.get_stats()
+
+    stats = asyncio.run(_test())
+    assert upstream.requests[-1].headers["if-none-match"] == _ETAG
+    assert (stats.revalidated, stats.misses) == (1, 1)
+
+
+def test_evicts_least_recently_used_to_fit(tmp_path: Path):
+    async def _test() -> ThumbnailStats:
+        async with (
+            httpx.AsyncClient(transport=httpx.MockTransport(_Upstream())) as client,
+            _make_store(client, tmp_path) as store,
+        ):
+            thumbnail = await store.get("https://images.test/10x10.png")
+        # room for only two
+        async with (
+            httpx.AsyncClient(transport=httpx.MockTransport(_Upstream())) as client,
+            _make_store(client, tmp_path, max_bytes=2 * len(thumbnail.content)) as store,
+        ):
+            await store.get("https://images.test/10x10.png")
+            await store.get("https://images.test/11x11.png")
+            await store.get("https://images.test/10x10.png")  # used more recently than 11x11
+            await store.get("https://images.test/12x12.png")
+            await store.get("https://images.test/10x10.png")
+            return await store.get_stats()
+
+    stats = asyncio.run(_test())
+    assert stats.n_entries == 2
+    assert stats.hits == 3
+
+
+@pytest.mark.parametrize(
+    ("url", "error", "match"),
+    [
+        ("https://evil.test/1x1.png", InvalidImageUrlError, "not available"),
+        ("file:///images.test/1x1.png", InvalidImageUrlError, "not available"),
+        ("https://images.test/redirect", ImageFetchError, "isn't allowed"),
+        ("https://images.test/page.html", ImageFetchError, "not an image"),
+    ],
+)
+def test_refuses_other_hosts_and_non_images(tmp_path: Path, url: str, error: type[Exception], match: str):
+    async def _test():
+        async with (
+            httpx.AsyncClient(transport=httpx.MockTransport(_Upstream())) as client,
+            _make_store(client, tmp_path) as store,
+        ):
+            await store.get(url)
+
+    with pytest.raises(error, match=match):
+        asyncio.run(_test())
@@ -0,0 +1,69 @@
+import pytest
+
+from historical_sources_search.exceptions import PageTimeoutError
+from historical_sources_search.timeouts import INITIAL_TIMEOUT_SECONDS, AdaptiveTimeouts
+
+
+def _make_timeouts(*, bounds_seconds: tuple[float, float] = (0.01, 60)) -> AdaptiveTimeouts:
+    return AdaptiveTimeouts(
+        "test",
+        window=10,
+        min_samples=3,
+        percentile=90,
+        multiplier=2,
+        bounds_seconds={"load_page": bounds_seconds, "find_next_page": bounds_seconds},
+    )
+
+
+def test_initial_timeout_until_enough_samples():
+    timeouts = _make_timeouts()
+    for _ in range(2):
+        with timeouts.wait("load_page") as timeout_ms:
+            assert timeout_ms == INITIAL_TIMEOUT_SECONDS["load_page"] * 1000
+    assert timeouts.get("load_page") == INITIAL_TIMEOUT_SECONDS["load_page"]
+
+
+def test_adapts_to_fast_operations_within_bounds():
+    timeouts = _make_timeouts(bounds_seconds=(0.5, 60))
+    for _ in range(3):
+        with timeouts.wait("load_page"):
+            pass
+    assert timeouts.get("load_page") == 0.5  # twice the (tiny) 90th percentile, but no less than the lower bound
+    stats = timeouts.get_stats()["load_page"]
+    assert stats.n_samples == 3
+    assert stats.n_timeouts == 0
+
+
+def test_timeouts_raise_page_timeout_error_and_count():
+    timeouts = _make_timeouts()
+    for _ in range(3):
+        with pytest.raises(PageTimeoutError) as raised, timeouts.wait("load_page"):
+            raise AssertionError("not visible")
+        assert isinstance(raised.value.__cause__, AssertionError)
+    stats = timeouts.get_stats()["load_page"]
+    assert stats.n_timeouts == 3
+    # timed out at the initial timeout each time, so it stays there (up to the upper bound)
+    assert timeouts.get("load_page") == 60
+
+
+def test_expected_timeouts_are_raised_as_is_and_not_counted():
+    timeouts = _make_timeouts()
+    with pytest.raises(AssertionError), timeouts.wait("find_next_page", timeout_is_expected=True):
+        raise AssertionError("no next page")
+    stats = timeouts.get_stats()["find_next_page"]
+    assert stats.n_timeouts == 0
+    assert stats.n_samples == 0
+
+
+def test_expected_timeouts_never_fall():
+    timeouts = _make_timeouts()
+    for _ in range(5):
+        with timeouts.wait("find_next_page", timeout_is_expected=True):
+            pass
+    # fast whenever there was a next page; so a slow next page mustn't be mistaken for the end of results
+    assert timeouts.get("find_next_page") == INITIAL_TIMEOUT_SECONDS["find_next_page"]
+
+
+def test_unknown_operation_without_bounds_is_rejected():
+    with pytest.raises(ValueError, match="unknown"), _make_timeouts().wait("unknown"):
+        pass